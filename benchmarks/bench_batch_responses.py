@@ -0,0 +1,57 @@
+"""
+Throughput of RAGChatbot.generate_responses against serial generate_response
+Both runs answer the same prompts for the same sessions and the results are
+checked to be identical.
+
+Usage: python benchmarks/bench_batch_responses.py [--prompts N] [--sessions S]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_chatbot import RAGChatbot  # noqa: E402
+
+PROMPTS = [
+    "How do I ask for more money?",
+    "Tips for a technical interview with coding rounds",
+    "How should I format my resume for ATS?",
+    "I'm a senior engineer looking for remote work",
+    "How can I grow my network on LinkedIn?",
+    "What certifications help with career growth?",
+    "I'm an intern in Bangalore, how do I prepare?",
+    "How do I negotiate my salary offer?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--prompts", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    batch = [(f"session-{rng.randrange(args.sessions)}", rng.choice(PROMPTS)) for _ in range(args.prompts)]
+
+    serial_bot = RAGChatbot()
+    start = time.perf_counter()
+    serial = [serial_bot.generate_response(query, session_id) for session_id, query in batch]
+    serial_seconds = time.perf_counter() - start
+
+    batch_bot = RAGChatbot()
+    start = time.perf_counter()
+    batched = batch_bot.generate_responses(batch)
+    batch_seconds = time.perf_counter() - start
+
+    assert batched == serial, "batch results differ from the serial path"
+    print(f"prompts={args.prompts} sessions={args.sessions}")
+    print(f"serial generate_response : {args.prompts / serial_seconds:8.0f} prompts/s")
+    print(f"generate_responses       : {args.prompts / batch_seconds:8.0f} prompts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Memory footprint of ChatMemory sessions
+Compares bytes per session of the compact ChatMemory storage with the
+previous list-of-dicts representation.
+
+Usage: python benchmarks/bench_chat_memory.py [--sessions N] [--messages M]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_chatbot import ChatMemory  # noqa: E402
+
+
+class ListOfDictsMemory:
+    """The previous storage scheme, kept here as the baseline"""
+
+    def __init__(self, max_messages=10):
+        self.max_messages = max_messages
+        self.conversations = {}
+
+    def add_message(self, session_id, role, content, metadata=None):
+        if session_id not in self.conversations:
+            self.conversations[session_id] = []
+        self.conversations[session_id].append({
+            "id": str(uuid.uuid4()),
+            "role": role,
+            "content": content,
+            "timestamp": datetime.now().isoformat(),
+            "metadata": metadata or {}
+        })
+        if len(self.conversations[session_id]) > self.max_messages:
+            self.conversations[session_id] = self.conversations[session_id][-self.max_messages:]
+
+
+def measure(memory_factory, sessions: int, messages: int, contents) -> float:
+    """Bytes allocated per session after filling every session"""
+    gc.collect()
+    tracemalloc.start()
+    memory = memory_factory()
+    for session in range(sessions):
+        session_id = f"session-{session}"
+        for turn in range(messages):
+            role = "user" if turn % 2 == 0 else "assistant"
+            memory.add_message(session_id, role, contents[turn % len(contents)])
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Session id strings are the same for both schemes and are not counted separately
+    return current / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--messages", type=int, default=14, help="messages added per session (cap is 10)")
+    args = parser.parse_args()
+
+    # Shared content strings, so the numbers reflect storage overhead rather than text
+    contents = [f"message body {i}" for i in range(32)]
+
+    baseline = measure(ListOfDictsMemory, args.sessions, args.messages, contents)
+    compact = measure(ChatMemory, args.sessions, args.messages, contents)
+
+    print(f"sessions={args.sessions} messages/session={args.messages}")
+    print(f"list of dicts : {baseline:10.0f} bytes/session")
+    print(f"ChatMemory    : {compact:10.0f} bytes/session")
+    print(f"reduction     : {100 * (1 - compact / baseline):9.1f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Cost of single knowledge writes as the corpus grows
+Times upserts and deletes on an InMemoryKnowledgeBackend at several corpus
+sizes; with pending changes layered over the shared index the per-write
+time should stay about the same at every size.
+
+Usage: python benchmarks/bench_knowledge_writes.py [--sizes 2000,20000,100000] [--writes N]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_store import InMemoryKnowledgeBackend  # noqa: E402
+
+WORDS = [f"w{i}" for i in range(5000)] + ["resume", "salary", "the", "interview", "remote"]
+
+
+def make_entry(number: int, rng: random.Random) -> dict:
+    return {
+        "id": f"e{number}",
+        "category": f"c{number % 7}",
+        "content": " ".join(rng.choice(WORDS) for _ in range(40)),
+        "keywords": [rng.choice(WORDS), f"k{number}"],
+    }
+
+
+def measure(size: int, writes: int):
+    """Median and worst milliseconds per upsert and per delete"""
+    rng = random.Random(size)
+    backend = InMemoryKnowledgeBackend({"all": [make_entry(i, rng) for i in range(size)]})
+    upserts, deletes = [], []
+    for _ in range(writes):
+        started = time.perf_counter()
+        backend.upsert(make_entry(rng.randrange(size), rng))
+        upserts.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        backend.delete(f"e{rng.randrange(size)}")
+        deletes.append(time.perf_counter() - started)
+    return [(1000 * statistics.median(times), 1000 * max(times)) for times in (upserts, deletes)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="2000,20000,100000", help="comma separated corpus sizes")
+    parser.add_argument("--writes", type=int, default=500, help="upserts and deletes timed per size")
+    args = parser.parse_args()
+
+    print(f"{'entries':>8} {'upsert median':>14} {'upsert max':>11} {'delete median':>14} {'delete max':>11}")
+    for size in (int(size) for size in args.sizes.split(",")):
+        (upsert, upsert_max), (delete, delete_max) = measure(size, args.writes)
+        print(f"{size:>8} {upsert:>11.3f} ms {upsert_max:>8.1f} ms {delete:>11.3f} ms {delete_max:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
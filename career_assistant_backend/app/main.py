@@ -1,12 +1,36 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 from app.routers import auth, resume, job_match, interview, query as query_router, chat, job
 from fastapi.middleware.cors import CORSMiddleware
+from app.services.job_catalog import offline_catalog
+from app.services.history_archive import HISTORY_COMPACTION_INTERVAL, run_compaction_periodically
+from app.services.history_writer import history_writer
+from app.services.job_service import close_http_client, job_cache
+from app.utils.concurrency import get_executor, shutdown_executor
+from app.utils.metrics import MetricsMiddleware, metrics
 
 # Load environment variables from .env at startup
 load_dotenv()
 
-app = FastAPI(title="Career Assistant API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Index the offline job catalog in the background, before the first fallback needs it
+    get_executor().submit(offline_catalog.ensure_loaded)
+    # Move old chat history into the compressed archive on a timer
+    compaction = asyncio.create_task(run_compaction_periodically()) if HISTORY_COMPACTION_INTERVAL > 0 else None
+    yield
+    if compaction is not None:
+        compaction.cancel()
+    # Release pooled connections and worker threads on shutdown
+    await close_http_client()
+    shutdown_executor()
+    history_writer.close()
+
+
+app = FastAPI(title="Career Assistant API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -16,6 +40,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Time every request as the "total" stage of its route
+app.add_middleware(MetricsMiddleware, registry=metrics)
+metrics.register_cache("job_search", job_cache.stats)
+metrics.register_cache("answer", query_router.answer_cache.stats)
 
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
@@ -42,6 +70,11 @@ def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage latency histograms and counters in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/test")
 def test_endpoint():
     return {"message": "Test endpoint is working!"}
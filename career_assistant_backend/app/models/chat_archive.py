@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, Index
+from app.database import Base
+
+class ChatHistoryArchive(Base):
+    """A run of consecutive chat_history rows of one session, zstd-compressed into one blob"""
+    __tablename__ = "chat_history_archive"
+    __table_args__ = (
+        Index("ix_chat_history_archive_session_last", "session_id", "last_timestamp", "last_id"),
+        {"sqlite_autoincrement": True},  # ids are never reused, so decompressed chunks can be cached by id
+    )
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, nullable=False)
+    first_id = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    first_timestamp = Column(DateTime(timezone=True), nullable=False)
+    last_timestamp = Column(DateTime(timezone=True), nullable=False)
+    message_count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)  # zstd(JSON [[id, role, message, timestamp], ...])
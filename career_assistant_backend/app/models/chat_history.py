@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
+    # Serves a session's messages in time order straight from the index
+    __table_args__ = (
+        Index("ix_chat_history_session_timestamp_id", "session_id", "timestamp", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String, index=True)
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ConversationSummary(Base):
+    __tablename__ = "conversation_summaries"
+
+    session_id = Column(String, primary_key=True, index=True)
+    summary = Column(Text, nullable=False, default="")
+    summarized_through = Column(Integer, nullable=False, default=0)  # last chat_history.id folded in
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
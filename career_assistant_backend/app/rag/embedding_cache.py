@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are only serialized within one process
+    fcntl = None
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache")
+# Texts per embeddings API request, and requests in flight at once
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+
+KEY_SIZE = 32  # sha256 digest
+INITIAL_CAPACITY = 1024  # rows preallocated in a new vectors file
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Text as the cache sees it: NFC, whitespace runs collapsed, trimmed."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Embeddings of one model on disk, keyed by normalized text hash.
+
+    Vectors live in a float32 file that is memory-mapped and grown by
+    doubling; keys.bin holds one 32-byte key per row, in row order. A row's
+    vector is written before its key, so a key on disk always has a
+    complete vector, and a torn trailing key from a crash is ignored and
+    overwritten. Several processes can share a cache: writes take a file
+    lock and first pick up rows other processes appended.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, model: str = "default"):
+        self.model = model
+        self.directory = os.path.join(path, re.sub(r"[^\w.-]", "_", model))
+        os.makedirs(self.directory, exist_ok=True)
+        self._keys_path = os.path.join(self.directory, "keys.bin")
+        self._vectors_path = os.path.join(self.directory, "vectors.f32")
+        self._meta_path = os.path.join(self.directory, "meta.json")
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._count = 0
+        self._dim: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        with self._lock:
+            self._refresh()
+
+    def __len__(self):
+        return self._count
+
+    def _refresh(self):
+        """Pick up rows appended since the last refresh, by this or another process."""
+        try:
+            with open(self._keys_path, "rb") as f:
+                f.seek(self._count * KEY_SIZE)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        complete = len(data) // KEY_SIZE
+        if not complete:
+            return
+        if self._dim is None:
+            with open(self._meta_path, "r") as f:
+                self._dim = json.load(f)["dim"]
+        for i in range(complete):
+            self._index.setdefault(data[i * KEY_SIZE:(i + 1) * KEY_SIZE], self._count + i)
+        self._count += complete
+        if self._vectors is None or len(self._vectors) < self._count:
+            self._map()
+
+    def _map(self):
+        capacity = os.path.getsize(self._vectors_path) // (4 * self._dim)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+
+    def _stale(self) -> bool:
+        try:
+            return os.path.getsize(self._keys_path) >= (self._count + 1) * KEY_SIZE
+        except FileNotFoundError:
+            return False
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[List[float]]]:
+        """Cached vector for each key, or None."""
+        with self._lock:
+            if any(key not in self._index for key in keys) and self._stale():
+                self._refresh()
+            rows = [self._index.get(key) for key in keys]
+            return [self._vectors[row].tolist() if row is not None else None for row in rows]
+
+    def put_many(self, keys: Sequence[bytes], vectors: Sequence[Sequence[float]]):
+        with self._lock, open(self._keys_path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._refresh()
+            fresh: Dict[bytes, Sequence[float]] = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._index:
+                    fresh.setdefault(key, vector)
+            if not fresh:
+                return
+
+            matrix = np.asarray(list(fresh.values()), dtype=np.float32)
+            if self._dim is None:
+                self._dim = matrix.shape[1]
+                with open(self._meta_path, "w") as f:
+                    json.dump({"model": self.model, "dim": self._dim}, f)
+            elif matrix.shape[1] != self._dim:
+                raise ValueError(f"Embedding size {matrix.shape[1]} does not match the cache's {self._dim}")
+
+            start, end = self._count, self._count + len(fresh)
+            if self._vectors is None or len(self._vectors) < end:
+                size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+                rows = size // (4 * self._dim)
+                if rows < end:
+                    # Another process may have grown the file already; never shrink it
+                    capacity = max(end, 2 * rows, INITIAL_CAPACITY)
+                    with open(self._vectors_path, "ab") as f:
+                        f.truncate(capacity * 4 * self._dim)
+                self._map()
+            self._vectors[start:end] = matrix
+            self._vectors.flush()
+
+            with open(self._keys_path, "ab") as f:
+                f.truncate(start * KEY_SIZE)  # drop a torn key left by a crashed writer
+                f.write(b"".join(fresh))
+            for row, key in enumerate(fresh, start):
+                self._index[key] = row
+            self._count = end
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings client that only sends texts missing from an EmbeddingCache upstream.
+
+    Misses are deduplicated, sent in batches of `batch_size` with up to
+    `concurrency` requests in flight, and cached as each batch returns, so
+    an interrupted run keeps what it paid for. Queries pass straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache,
+                 batch_size: int = EMBEDDING_BATCH_SIZE, concurrency: int = EMBEDDING_CONCURRENCY):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self._stats_lock = threading.Lock()
+        self._stats = dict.fromkeys(("hits", "misses", "requests"), 0)
+
+    def _lookup(self, texts: List[str]) -> Tuple[List[bytes], List[Optional[List[float]]], List[List[Tuple[bytes, str]]]]:
+        """(keys, cached vectors or None, batches of missing (key, text))"""
+        keys = [text_key(text) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing: Dict[bytes, str] = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        items = list(missing.items())
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        with self._stats_lock:
+            self._stats["hits"] += len(texts) - sum(v is None for v in vectors)
+            self._stats["misses"] += len(items)
+            self._stats["requests"] += len(batches)
+        return keys, vectors, batches
+
+    @staticmethod
+    def _fill(keys, vectors, fetched: Dict[bytes, List[float]]) -> List[List[float]]:
+        return [vector if vector is not None else fetched[key] for key, vector in zip(keys, vectors)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, batches = self._lookup(texts)
+        fetched: Dict[bytes, List[float]] = {}
+
+        def embed(batch):
+            result = self.embeddings.embed_documents([text for _, text in batch])
+            self.cache.put_many([key for key, _ in batch], result)
+            return result
+
+        if batches:
+            with ThreadPoolExecutor(min(self.concurrency, len(batches))) as pool:
+                for batch, result in zip(batches, pool.map(embed, batches)):
+                    fetched.update(zip((key for key, _ in batch), result))
+        return self._fill(keys, vectors, fetched)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, batches = await asyncio.to_thread(self._lookup, texts)
+        fetched: Dict[bytes, List[float]] = {}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def embed(batch):
+            async with semaphore:
+                result = await self.embeddings.aembed_documents([text for _, text in batch])
+            await asyncio.to_thread(self.cache.put_many, [key for key, _ in batch], result)
+            fetched.update(zip((key for key, _ in batch), result))
+
+        await asyncio.gather(*(embed(batch) for batch in batches))
+        return self._fill(keys, vectors, fetched)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {**self._stats, "cached_vectors": len(self.cache)}
@@ -1,53 +1,359 @@
+import hashlib
+import json
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
+
+from app.rag.embedding_cache import EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY, CachedEmbeddings
+from app.rag.vector_index import IndexUpdate
+from app.rag.vectorstore import EMBEDDING_MODEL, VECTORSTORE_PATH, get_document_embeddings
 
 DATA_PATH = "app/data"
-DB_PATH = "app/rag/db"
+MANIFEST_PATH = os.path.join(VECTORSTORE_PATH, "ingest_manifest.json")
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# Chunks sent to the vectorstore per call: enough for every concurrent embedding request
+ADD_BATCH_SIZE = EMBEDDING_BATCH_SIZE * EMBEDDING_CONCURRENCY
+# Processes loading and splitting files; 1 parses in this process
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
 
-def load_documents():
-    documents = []
-    for root, _, files in os.walk(DATA_PATH):
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _chunk_ids(relpath: str, chunks) -> List[str]:
+    """Content-addressed ids: a chunk keeps its id, and its vector, while its text is unchanged."""
+    ids, seen = [], {}
+    for chunk in chunks:
+        key = f"{relpath}\0{chunk.metadata.get('page', '')}\0{chunk.page_content}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        # Repeated text in one file (headers, boilerplate) gets distinct ids
+        n = seen.get(digest, 0)
+        seen[digest] = n + 1
+        ids.append(digest if n == 0 else f"{digest}-{n}")
+    return ids
+
+
+class IngestManifest:
+    """Files and chunk ids already in the vectorstore.
+
+    Kept as a JSON snapshot plus an append-only journal with one line per
+    file change, so progress is recorded after every file without rewriting
+    the whole manifest, and an interrupted run resumes where it stopped.
+    `compact` folds the journal into the snapshot at the end of a run.
+
+    A store that only publishes changes on commit loses an interrupted run's
+    writes, so its journal is not replayed; `index_version` records which
+    committed version the snapshot describes.
+    """
+
+    def __init__(self, path: str, settings: Dict[str, Any], replay_journal: bool = True):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.settings = settings
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.index_version: Optional[str] = None
+        self.settings_changed = False
+        self.exists = os.path.exists(path) or (replay_journal and os.path.exists(self.journal_path))
+
+        try:
+            with open(path, "r") as f:
+                snapshot = json.load(f)
+            self.files = snapshot.get("files", {})
+            self.index_version = snapshot.get("index_version")
+            self.settings_changed = snapshot.get("settings") != settings
+        except FileNotFoundError:
+            pass
+        if not replay_journal:
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            return
+        try:
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        change = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn last line from a crash
+                    if change["entry"] is None:
+                        self.files.pop(change["file"], None)
+                    else:
+                        self.files[change["file"]] = change["entry"]
+        except FileNotFoundError:
+            pass
+
+    def record(self, relpath: str, entry: Optional[Dict[str, Any]]):
+        """Set (or with None, remove) a file's entry and append the change to the journal."""
+        if entry is None:
+            self.files.pop(relpath, None)
+        else:
+            self.files[relpath] = entry
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.journal_path, "a") as f:
+            f.write(json.dumps({"file": relpath, "entry": entry}) + "\n")
+
+    def compact(self, index_version: Optional[str] = None):
+        if index_version is not None:
+            self.index_version = index_version
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w") as f:
+            json.dump({"settings": self.settings, "index_version": self.index_version, "files": self.files}, f)
+        os.replace(self.path + ".tmp", self.path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.settings_changed = False
+
+
+def load_file(file_path: str):
+    """Load one file with the loader for its type, or None if the type is not supported."""
+    if file_path.endswith(".pdf"):
+        loader = PyPDFLoader(file_path)
+    elif file_path.endswith(".txt"):
+        loader = TextLoader(file_path, encoding="utf-8")
+    else:
+        return None
+
+    # Load + add metadata
+    docs = loader.load()
+    root, file = os.path.split(file_path)
+    for d in docs:
+        d.metadata.update({
+            "source": root.split(os.sep)[-1],   # e.g. resumes / jobs / faqs
+            "filename": file                    # actual filename
+        })
+    return docs
+
+
+def scan_files(data_path: str = DATA_PATH) -> Dict[str, str]:
+    """Supported files under data_path, relative path -> path."""
+    found = {}
+    for root, _, files in os.walk(data_path):
         for file in files:
-            file_path = os.path.join(root, file)
-
-            # Pick loader based on file type
-            if file.endswith(".pdf"):
-                loader = PyPDFLoader(file_path)
-            elif file.endswith(".txt"):
-                loader = TextLoader(file_path, encoding="utf-8")
-            else:
-                continue  # skip unsupported files
-
-            # Load + add metadata
-            docs = loader.load()
-            for d in docs:
-                d.metadata.update({
-                    "source": root.split(os.sep)[-1],   # e.g. resumes / jobs / faqs
-                    "filename": file                    # actual filename
-                })
-            documents.extend(docs)
+            if file.endswith((".pdf", ".txt")):
+                file_path = os.path.join(root, file)
+                found[os.path.relpath(file_path, data_path)] = file_path
+    return found
+
 
+def load_documents(data_path: str = DATA_PATH):
+    documents = []
+    for _, file_path in sorted(scan_files(data_path).items()):
+        documents.extend(load_file(file_path))
     return documents
 
-def ingest():
-    print("📂 Loading documents...")
-    documents = load_documents()
 
-    print("✂️ Splitting into chunks...")
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    docs = text_splitter.split_documents(documents)
+# (relpath, file_path, hash in the manifest, chunk_size, chunk_overlap)
+ParseTask = Tuple[str, str, Optional[str], int, int]
+
+
+class ParsedFile(NamedTuple):
+    relpath: str
+    file_hash: Optional[str]
+    chunks: Optional[list]  # None when the hash matched the manifest or parsing failed
+    ids: Optional[List[str]]
+    error: Optional[str] = None
+
+
+@lru_cache(maxsize=None)
+def _splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def _parse_file(relpath: str, file_path: str, known_hash: Optional[str],
+                chunk_size: int, chunk_overlap: int) -> ParsedFile:
+    """Hash, load and split one file; runs in a worker process and never raises."""
+    try:
+        file_hash = _file_hash(file_path)
+        if file_hash == known_hash:
+            return ParsedFile(relpath, file_hash, None, None)
+        chunks = _splitter(chunk_size, chunk_overlap).split_documents(load_file(file_path))
+        return ParsedFile(relpath, file_hash, chunks, _chunk_ids(relpath, chunks))
+    except Exception as e:
+        return ParsedFile(relpath, None, None, None, f"{type(e).__name__}: {e}")
+
+
+def _parse_isolated(task: ParseTask) -> ParsedFile:
+    """Parse in a process of its own, so a file that kills its worker only fails itself."""
+    try:
+        with ProcessPoolExecutor(1) as pool:
+            return pool.submit(_parse_file, *task).result()
+    except BrokenProcessPool:
+        return ParsedFile(task[0], None, None, None, "worker process died while parsing")
+
+
+def parse_files(tasks: Iterable[ParseTask], workers: int = INGEST_WORKERS) -> Iterator[ParsedFile]:
+    """Load and split files across `workers` processes, yielding results in task order.
+
+    At most 2 * workers files are in flight, so chunks stream through instead
+    of piling up in memory. A file that fails is yielded with its error.
+    """
+    if workers <= 1:
+        for task in tasks:
+            yield _parse_file(*task)
+        return
+
+    tasks = iter(tasks)
+    pool = ProcessPoolExecutor(workers)
+    in_flight = deque((task, pool.submit(_parse_file, *task)) for task in islice(tasks, 2 * workers))
+    try:
+        while in_flight:
+            task, future = in_flight.popleft()
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                # A worker died (e.g. a parser crash); retry the unfinished files one by one
+                pool.shutdown(cancel_futures=True)
+                for retry in [task] + [queued for queued, _ in in_flight]:
+                    yield _parse_isolated(retry)
+                pool = ProcessPoolExecutor(workers)
+                in_flight = deque((task, pool.submit(_parse_file, *task)) for task in islice(tasks, 2 * workers))
+                continue
+            for task in islice(tasks, 1):
+                in_flight.append((task, pool.submit(_parse_file, *task)))
+            yield result
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def ingest(vectorstore=None, data_path: str = DATA_PATH, manifest_path: str = MANIFEST_PATH,
+           workers: int = INGEST_WORKERS) -> Dict[str, int]:
+    """Bring the vectorstore in line with data_path, embedding only chunks it doesn't have yet.
+
+    A file whose size and mtime match the manifest is skipped without being
+    read; one whose content hash matches is skipped without being parsed.
+    Changed files are re-split in `workers` processes, new chunks are added
+    and chunks that no longer exist are deleted. A file that fails to load
+    keeps its previous chunks and is retried on the next run.
+
+    By default the changes go to the shared index under VECTORSTORE_PATH and
+    are published as one new version at the end, which serving processes
+    pick up without a restart.
+    """
+    if vectorstore is None:
+        vectorstore = IndexUpdate(VECTORSTORE_PATH, get_document_embeddings(), EMBEDDING_MODEL)
+    # Stores with commit() publish all changes at once; others apply each call immediately
+    transactional = hasattr(vectorstore, "commit")
+    settings = {"embedding_model": EMBEDDING_MODEL, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+    manifest = IngestManifest(manifest_path, settings, replay_journal=not transactional)
+    embeddings = getattr(vectorstore, "embeddings", None)
+    embedding_stats = embeddings.stats() if isinstance(embeddings, CachedEmbeddings) else None
+    counts = dict.fromkeys(("added", "unchanged", "deleted", "files_added", "files_updated",
+                            "files_unchanged", "files_deleted", "files_failed"), 0)
+
+    try:
+        _sync(vectorstore, manifest, data_path, workers, counts, transactional)
+        index_version = vectorstore.commit() if transactional else None
+    finally:
+        if transactional:
+            vectorstore.close()  # removes staged rows however the run ended
+    manifest.compact(index_version)
+
+    print(f"📊 Chunks: {counts['added']} added, {counts['unchanged']} unchanged, {counts['deleted']} deleted "
+          f"(files: {counts['files_added']} added, {counts['files_updated']} updated, "
+          f"{counts['files_unchanged']} unchanged, {counts['files_deleted']} deleted, "
+          f"{counts['files_failed']} failed)")
+    if embedding_stats is not None:
+        after = embeddings.stats()
+        print(f"🧠 Embedded {after['misses'] - embedding_stats['misses']} new chunks in "
+              f"{after['requests'] - embedding_stats['requests']} requests, "
+              f"{after['hits'] - embedding_stats['hits']} from cache")
+    if index_version is not None:
+        print(f"🎉 Ingestion complete! Index version {index_version} published at {VECTORSTORE_PATH}")
+    else:
+        print("🎉 Ingestion complete!")
+    return counts
+
+
+def _sync(vectorstore, manifest: IngestManifest, data_path: str, workers: int,
+          counts: Dict[str, int], transactional: bool):
+    # The index was rebuilt (or changed) by something other than ingest since the manifest was written
+    out_of_sync = transactional and manifest.exists and manifest.index_version != vectorstore.base_version
+    if not manifest.exists or out_of_sync:
+        # Chunks the manifest doesn't track, e.g. from a store ingested before it existed,
+        # would never be updated or deleted, so start from an empty store
+        if out_of_sync:
+            print("🔁 Index was rebuilt outside ingestion, re-ingesting everything...")
+            manifest.files = {}
+        untracked_ids = vectorstore.get(include=[])["ids"]
+        for start in range(0, len(untracked_ids), ADD_BATCH_SIZE):
+            vectorstore.delete(ids=untracked_ids[start:start + ADD_BATCH_SIZE])
+    elif manifest.settings_changed:
+        # Vectors from another model or chunking can't be reused
+        print("🔁 Embedding model or chunking changed, re-ingesting everything...")
+        for relpath, entry in list(manifest.files.items()):
+            if entry["chunks"]:
+                vectorstore.delete(ids=entry["chunks"])
+            manifest.record(relpath, None)
+
+    print("📂 Scanning documents...")
+    files = scan_files(data_path)
+
+    for relpath in sorted(set(manifest.files) - set(files)):
+        chunks = manifest.files[relpath]["chunks"]
+        if chunks:
+            vectorstore.delete(ids=chunks)
+        manifest.record(relpath, None)
+        counts["deleted"] += len(chunks)
+        counts["files_deleted"] += 1
+
+    stats, tasks = {}, []
+    for relpath, file_path in sorted(files.items()):
+        entry = manifest.files.get(relpath)
+        stats[relpath] = stat = os.stat(file_path)
+        if entry and entry["hash"] and (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            counts["unchanged"] += len(entry["chunks"])
+            counts["files_unchanged"] += 1
+        else:
+            tasks.append((relpath, file_path, entry["hash"] if entry else None, CHUNK_SIZE, CHUNK_OVERLAP))
+
+    if tasks:
+        print(f"✂️ Loading and splitting {len(tasks)} files with {min(workers, len(tasks))} workers...")
+    for parsed in parse_files(tasks, min(workers, len(tasks))):
+        relpath, file_hash, chunks, ids = parsed.relpath, parsed.file_hash, parsed.chunks, parsed.ids
+        entry, stat = manifest.files.get(relpath), stats[relpath]
+        if parsed.error:
+            print(f"⚠️ Skipping {relpath}: {parsed.error}")
+            counts["files_failed"] += 1
+            continue
+        if chunks is None:
+            # Touched but not changed
+            manifest.record(relpath, {**entry, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+            counts["unchanged"] += len(entry["chunks"])
+            counts["files_unchanged"] += 1
+            continue
+
+        old_ids = set(entry["chunks"]) if entry else set()
+        # An entry without a hash was claimed by an interrupted run; its chunks may not all be stored
+        stored = old_ids if entry and entry["hash"] else set()
+        new = [(chunk_id, chunk) for chunk_id, chunk in zip(ids, chunks) if chunk_id not in stored]
+        removed = sorted(old_ids - set(ids))
 
-    print(f"✅ Loaded {len(documents)} documents, split into {len(docs)} chunks.")
+        # Claim old and new ids before writing, so a crash here leaves nothing untracked
+        manifest.record(relpath, {"hash": None, "size": None, "mtime_ns": None, "chunks": sorted(old_ids | set(ids))})
+        for start in range(0, len(new), ADD_BATCH_SIZE):
+            batch = new[start:start + ADD_BATCH_SIZE]
+            vectorstore.add_documents([chunk for _, chunk in batch], ids=[chunk_id for chunk_id, _ in batch])
+        if removed:
+            vectorstore.delete(ids=removed)
+        manifest.record(relpath, {"hash": file_hash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "chunks": ids})
 
-    print("🧠 Creating embeddings and storing in Chroma...")
-    embeddings = OpenAIEmbeddings()
-    vectorstore = Chroma.from_documents(docs, embeddings, persist_directory=DB_PATH)
-    vectorstore.persist()
+        counts["added"] += len(new)
+        counts["unchanged"] += len(ids) - len(new)
+        counts["deleted"] += len(removed)
+        counts["files_updated" if entry else "files_added"] += 1
 
-    print(f"🎉 Ingestion complete! Database saved at {DB_PATH}")
 
 if __name__ == "__main__":
     ingest()
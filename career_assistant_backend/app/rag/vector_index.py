@@ -0,0 +1,465 @@
+import json
+import mmap
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+INDEX_FORMAT = "career-assistant-mmap-index"
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.json"
+IDS_FILE = "ids.json"
+
+# flat scans every vector; ivf groups vectors by nearest centroid and scans a few groups.
+# auto picks ivf from IVF_MIN_ROWS vectors up.
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "auto")
+IVF_MIN_ROWS = int(os.getenv("VECTOR_INDEX_IVF_MIN_ROWS", "100000"))
+# Groups scanned per IVF query; 0 uses the default stored with the index
+IVF_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "0"))
+# Rows per block when scoring, assigning or copying vectors
+BLOCK_ROWS = 65536
+# Rows sampled to train IVF centroids, and the fewest sampled rows per centroid
+IVF_TRAIN_ROWS = 65536
+IVF_MIN_ROWS_PER_LIST = 32
+# Built versions kept on disk: the current one and the one before, for readers still mapping it
+KEEP_VERSIONS = 2
+# Seconds after which an untouched build or staging directory is taken to be left by a crash
+STALE_BUILD_AGE = 24 * 3600
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _encode_record(chunk_id: str, text: str, metadata: Dict[str, Any]) -> bytes:
+    return json.dumps({"id": chunk_id, "text": text, "metadata": metadata}, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+class IndexWriter:
+    """Streams rows into a version directory; `finish` writes the final layout.
+
+    Vectors are unit-normalized float32 rows in vectors.f32, records are
+    JSON lines in records.jsonl located through the uint64 offsets.u64
+    table, and ids.json lists the row ids so they can be read without
+    parsing records. In ivf mode rows are reordered so each centroid's group is
+    contiguous, and ivf_centroids.f32 / ivf_offsets.u64 describe the groups.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory)
+        self.directory = directory
+        self.count = 0
+        self.dim: Optional[int] = None
+        self._ids: List[str] = []
+        self._offsets = [0]
+        self._vectors = open(os.path.join(directory, "vectors.f32"), "wb")
+        self._records = open(os.path.join(directory, "records.jsonl"), "wb")
+
+    def add(self, ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[Dict[str, Any]], vectors):
+        records = [_encode_record(i, t, m) for i, t, m in zip(ids, texts, metadatas)]
+        self.add_encoded(ids, records, _unit_rows(vectors))
+
+    def add_encoded(self, ids: Sequence[str], records: Sequence[bytes], unit_vectors: np.ndarray):
+        """Add rows whose records are already encoded and vectors already normalized."""
+        if not records:
+            return
+        if self.dim is None:
+            self.dim = unit_vectors.shape[1]
+        elif unit_vectors.shape[1] != self.dim:
+            raise ValueError(f"Vector size {unit_vectors.shape[1]} does not match the index's {self.dim}")
+        self._vectors.write(np.ascontiguousarray(unit_vectors, dtype=np.float32).tobytes())
+        for record in records:
+            self._records.write(record)
+            self._offsets.append(self._offsets[-1] + len(record))
+        self._ids.extend(ids)
+        self.count += len(records)
+
+    def staged(self) -> Tuple[np.ndarray, mmap.mmap, np.ndarray]:
+        """(vectors, records, offsets) written so far, for reading back before `finish`."""
+        self._vectors.flush()
+        self._records.flush()
+        vectors = np.memmap(self._vectors.name, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        with open(self._records.name, "rb") as f:
+            records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return vectors, records, np.asarray(self._offsets, dtype=np.uint64)
+
+    def close(self):
+        self._vectors.close()
+        self._records.close()
+
+    def finish(self, mode: str = VECTOR_INDEX_MODE, embedding_model: Optional[str] = None) -> Dict[str, Any]:
+        self.close()
+        info = {"format": INDEX_FORMAT, "format_version": FORMAT_VERSION, "count": self.count,
+                "dim": self.dim or 0, "metric": "cosine", "embedding_model": embedding_model, "ivf": None}
+        offsets = np.asarray(self._offsets, dtype=np.uint64)
+        use_ivf = mode == "ivf" or (mode == "auto" and self.count >= IVF_MIN_ROWS)
+        if use_ivf and self.count:
+            info["ivf"] = self._reorder_into_groups(offsets)
+        else:
+            offsets.tofile(os.path.join(self.directory, "offsets.u64"))
+        with open(os.path.join(self.directory, IDS_FILE), "w") as f:
+            json.dump(self._ids, f)
+        with open(os.path.join(self.directory, INDEX_FILE), "w") as f:
+            json.dump(info, f)
+        return info
+
+    def _reorder_into_groups(self, offsets: np.ndarray) -> Dict[str, int]:
+        path = lambda name: os.path.join(self.directory, name)  # noqa: E731
+        vectors = np.memmap(path("vectors.f32"), dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        nlist = max(1, min(self.count, int(4 * np.sqrt(self.count)), IVF_TRAIN_ROWS // IVF_MIN_ROWS_PER_LIST))
+        centroids = _train_centroids(vectors, nlist)
+        labels = np.empty(self.count, dtype=np.int32)
+        for start in range(0, self.count, BLOCK_ROWS):
+            labels[start:start + BLOCK_ROWS] = np.argmax(vectors[start:start + BLOCK_ROWS] @ centroids.T, axis=1)
+        order = np.argsort(labels, kind="stable")
+        self._ids = [self._ids[row] for row in order]
+
+        new_offsets = [0]
+        with open(path("records.jsonl"), "rb") as f, open(path("records.ivf"), "wb") as records_out, \
+                open(path("vectors.ivf"), "wb") as vectors_out, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as records:
+            for start in range(0, self.count, BLOCK_ROWS):
+                rows = order[start:start + BLOCK_ROWS]
+                vectors_out.write(np.ascontiguousarray(vectors[rows]).tobytes())
+                for row in rows:
+                    record = records[offsets[row]:offsets[row + 1]]
+                    records_out.write(record)
+                    new_offsets.append(new_offsets[-1] + len(record))
+        del vectors  # unmap before replacing the file
+        os.replace(path("vectors.ivf"), path("vectors.f32"))
+        os.replace(path("records.ivf"), path("records.jsonl"))
+        np.asarray(new_offsets, dtype=np.uint64).tofile(path("offsets.u64"))
+        centroids.astype(np.float32).tofile(path("ivf_centroids.f32"))
+        group_offsets = np.zeros(nlist + 1, dtype=np.uint64)
+        group_offsets[1:] = np.cumsum(np.bincount(labels, minlength=nlist))
+        group_offsets.tofile(path("ivf_offsets.u64"))
+        return {"nlist": nlist, "nprobe": max(8, nlist // 50)}
+
+
+def _train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of at most IVF_TRAIN_ROWS rows."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample = np.sort(rng.choice(n, size=min(n, IVF_TRAIN_ROWS), replace=False))
+    x = np.asarray(vectors[sample])
+    centroids = x[rng.choice(len(x), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+        empty = np.bincount(labels, minlength=nlist) == 0
+        # Reseed empty groups from random rows
+        sums[empty] = x[rng.choice(len(x), size=int(empty.sum()))]
+        centroids = _unit_rows(sums)
+    return centroids
+
+
+class MmapVectorIndex(VectorStore):
+    """Read-only view of one index version, memory-mapped.
+
+    Nothing is loaded up front: vectors and records are read through the
+    page cache, so worker processes serving the same version share one
+    copy and opening it takes as long as reading index.json.
+    """
+
+    def __init__(self, directory: str, embedding: Embeddings):
+        with open(os.path.join(directory, INDEX_FILE), "r") as f:
+            self.info = json.load(f)
+        if self.info.get("format") != INDEX_FORMAT or self.info.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format in {directory}: {self.info.get('format')} "
+                             f"v{self.info.get('format_version')}")
+        self.directory = directory
+        self._embedding = embedding
+        count, dim = self.info["count"], self.info["dim"]
+        path = lambda name: os.path.join(directory, name)  # noqa: E731
+
+        self._offsets = np.memmap(path("offsets.u64"), dtype=np.uint64, mode="r", shape=(count + 1,))
+        if count:
+            self._vectors = np.memmap(path("vectors.f32"), dtype=np.float32, mode="r", shape=(count, dim))
+            with open(path("records.jsonl"), "rb") as f:
+                self._records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._vectors = np.zeros((0, dim), dtype=np.float32)
+            self._records = b""
+        self._centroids = self._groups = None
+        if self.info["ivf"]:
+            nlist = self.info["ivf"]["nlist"]
+            self._centroids = np.memmap(path("ivf_centroids.f32"), dtype=np.float32, mode="r", shape=(nlist, dim))
+            self._groups = np.memmap(path("ivf_offsets.u64"), dtype=np.uint64, mode="r", shape=(nlist + 1,))
+
+    def __len__(self):
+        return self.info["count"]
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def raw_record(self, row: int) -> bytes:
+        return self._records[int(self._offsets[row]):int(self._offsets[row + 1])]
+
+    def document(self, row: int) -> Document:
+        record = json.loads(self.raw_record(row))
+        return Document(id=record["id"], page_content=record["text"], metadata=record["metadata"])
+
+    def ids(self) -> List[str]:
+        try:
+            with open(os.path.join(self.directory, IDS_FILE), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:  # versions built before ids.json
+            return [json.loads(self.raw_record(row))["id"] for row in range(len(self))]
+
+    def _candidates(self, query: np.ndarray, fetch: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, scores) of the best `fetch` rows, best first."""
+        if self._centroids is not None:
+            nprobe = min(nprobe or IVF_NPROBE or self.info["ivf"]["nprobe"], len(self._centroids))
+            groups = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+            ranges = [(int(self._groups[g]), int(self._groups[g + 1])) for g in groups]
+        else:
+            ranges = [(start, min(start + BLOCK_ROWS, len(self))) for start in range(0, len(self), BLOCK_ROWS)]
+
+        best_rows, best_scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        for start, end in ranges:
+            if start == end:
+                continue
+            scores = self._vectors[start:end] @ query
+            top = np.argpartition(-scores, fetch - 1)[:fetch] if len(scores) > fetch else np.arange(len(scores))
+            best_rows = np.concatenate([best_rows, top + start])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_rows) > fetch:
+                keep = np.argpartition(-best_scores, fetch - 1)[:fetch]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+        order = np.argsort(-best_scores, kind="stable")
+        return best_rows[order], best_scores[order]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict[str, Any]] = None, fetch_k: int = 20,
+                                               nprobe: int = 0, **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Top k documents by cosine similarity; `filter` matches metadata values among `fetch_k` candidates."""
+        if not len(self) or k <= 0:
+            return []
+        query = _unit_rows([embedding])[0]
+        rows, scores = self._candidates(query, max(k, fetch_k) if filter else k, nprobe)
+        results = []
+        for row, score in zip(rows, scores):
+            doc = self.document(int(row))
+            if filter and any(doc.metadata.get(key) != value for key, value in filter.items()):
+                continue
+            results.append((doc, float(score)))
+            if len(results) == k:
+                break
+        return results
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return lambda score: (score + 1) / 2  # cosine similarity onto [0, 1]
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        """Publish a new version holding the current one plus texts; returns their ids.
+
+        This view keeps serving its own version; open_index (or the next
+        reload in a serving process) sees the new one.
+        """
+        texts = list(texts)
+        ids = ids or [uuid.uuid4().hex for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        with IndexUpdate(os.path.dirname(self.directory), self._embedding, self.info.get("embedding_model")) as update:
+            update.add_documents([Document(page_content=text, metadata=metadata)
+                                  for text, metadata in zip(texts, metadatas)], ids=ids)
+            update.commit()
+        return ids
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, path: Optional[str] = None, **kwargs: Any) -> "MmapVectorIndex":
+        """Embed texts, publish them as a new version under `path` and open it."""
+        if path is None:
+            raise ValueError("from_texts needs the index root `path`")
+        vectors = embedding.embed_documents(list(texts))
+        ids = ids or [uuid.uuid4().hex for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+
+        def rows(writer: IndexWriter):
+            for start in range(0, len(texts), BLOCK_ROWS):
+                end = start + BLOCK_ROWS
+                writer.add(ids[start:end], texts[start:end], metadatas[start:end], vectors[start:end])
+
+        version = write_index(path, rows, **kwargs)
+        return cls(os.path.join(path, version), embedding)
+
+
+def read_manifest(root: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(root, MANIFEST_FILE), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def current_version(root: str) -> Optional[str]:
+    """Version of the published mmap index under root, or None."""
+    manifest = read_manifest(root)
+    if manifest and manifest.get("format") == INDEX_FORMAT:
+        return manifest["version"]
+    return None
+
+
+def open_index(root: str, embedding: Embeddings) -> Optional[MmapVectorIndex]:
+    version = current_version(root)
+    return MmapVectorIndex(os.path.join(root, version), embedding) if version else None
+
+
+def write_index(root: str, fill: Callable[[IndexWriter], None], mode: str = VECTOR_INDEX_MODE,
+                embedding_model: Optional[str] = None) -> str:
+    """Build a version with `fill(writer)` and publish it; returns the version.
+
+    The version directory is complete before manifest.json points at it, so
+    readers only ever open finished builds.
+    """
+    version = uuid.uuid4().hex
+    os.makedirs(root, exist_ok=True)
+    building = os.path.join(root, f".{version}.building")
+    writer = IndexWriter(building)
+    try:
+        fill(writer)
+        info = writer.finish(mode, embedding_model)
+    except BaseException:
+        writer.close()
+        shutil.rmtree(building, ignore_errors=True)
+        raise
+    os.rename(building, os.path.join(root, version))
+
+    manifest_path = os.path.join(root, MANIFEST_FILE)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump({"format": INDEX_FORMAT, "version": version, "built_at": time.time(), "chunks": info["count"],
+                   "embedding_model": embedding_model, "ivf": info["ivf"]}, f)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    _prune_versions(root, version)
+    return version
+
+
+def _last_modified(directory: str) -> float:
+    with os.scandir(directory) as entries:
+        return max([os.path.getmtime(directory)] + [entry.stat().st_mtime for entry in entries])
+
+
+def _prune_versions(root: str, current: str):
+    """Delete all but the newest KEEP_VERSIONS builds, and builds or staged
+    updates a crashed process left behind; open mappings of deleted files stay valid."""
+    versions = []
+    stale_before = time.time() - STALE_BUILD_AGE
+    for name in os.listdir(root):
+        directory = os.path.join(root, name)
+        info_path = os.path.join(directory, INDEX_FILE)
+        if name.endswith((".staging", ".building")):
+            try:
+                if _last_modified(directory) < stale_before:
+                    shutil.rmtree(directory, ignore_errors=True)
+            except FileNotFoundError:  # finished or cleaned up meanwhile
+                pass
+        elif name != current and os.path.exists(info_path):
+            versions.append((os.path.getmtime(info_path), name))
+    for _, name in sorted(versions, reverse=True)[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+class IndexUpdate:
+    """Changes to the published index, committed as a new version.
+
+    Offers the vectorstore calls ingest makes (add_documents, delete, get).
+    Added chunks are embedded and staged on disk as they arrive; `commit`
+    writes a version holding the staged rows plus the current version's
+    rows that were neither deleted nor replaced, copying their vectors
+    instead of embedding them again. Use it as a context manager, or call
+    `commit` or `close`, so the staged rows are removed from disk.
+    """
+
+    def __init__(self, root: str, embeddings: Embeddings, embedding_model: Optional[str] = None,
+                 mode: str = VECTOR_INDEX_MODE):
+        self.root = root
+        self.embeddings = embeddings
+        self.embedding_model = embedding_model
+        self.mode = mode
+        self.base = open_index(root, embeddings)
+        self.base_version = current_version(root)
+        self._base_ids = self.base.ids() if self.base is not None else []  # ids.json, not the records
+        os.makedirs(root, exist_ok=True)
+        self._staging_dir = os.path.join(root, f".{uuid.uuid4().hex}.staging")
+        self._staging = IndexWriter(self._staging_dir)
+        self._added: Dict[str, int] = {}  # id -> staged row
+        self._deleted: set = set()
+
+    def add_documents(self, documents: List[Document], ids: List[str]):
+        vectors = self.embeddings.embed_documents([doc.page_content for doc in documents])
+        start = self._staging.count
+        self._staging.add(ids, [doc.page_content for doc in documents], [doc.metadata for doc in documents], vectors)
+        for row, chunk_id in enumerate(ids, start):
+            self._added[chunk_id] = row
+            self._deleted.discard(chunk_id)
+
+    def delete(self, ids: List[str]):
+        for chunk_id in ids:
+            self._added.pop(chunk_id, None)
+            self._deleted.add(chunk_id)
+
+    def get(self, include=None) -> Dict[str, List[str]]:
+        kept = [chunk_id for chunk_id in self._base_ids if chunk_id not in self._deleted and chunk_id not in self._added]
+        return {"ids": kept + list(self._added)}
+
+    def commit(self) -> Optional[str]:
+        """Publish the changes as a new version and return it; the current version if nothing changed."""
+        if not self._added and not self._deleted.intersection(self._base_ids) and self.base is not None:
+            self.close()
+            return self.base_version
+
+        def fill(writer: IndexWriter):
+            if self.base is not None:
+                keep = [row for row, chunk_id in enumerate(self._base_ids)
+                        if chunk_id not in self._deleted and chunk_id not in self._added]
+                for start in range(0, len(keep), BLOCK_ROWS):
+                    rows = keep[start:start + BLOCK_ROWS]
+                    writer.add_encoded([self._base_ids[row] for row in rows],
+                                       [self.base.raw_record(row) for row in rows], self.base._vectors[rows])
+            if self._added:
+                vectors, records, offsets = self._staging.staged()
+                rows = sorted(self._added.values())
+                for start in range(0, len(rows), BLOCK_ROWS):
+                    block = rows[start:start + BLOCK_ROWS]
+                    writer.add_encoded([self._staging._ids[r] for r in block],
+                                       [records[int(offsets[r]):int(offsets[r + 1])] for r in block], vectors[block])
+
+        try:
+            version = write_index(self.root, fill, self.mode, self.embedding_model)
+        finally:
+            self.close()
+        self.base_version = version
+        return version
+
+    def close(self):
+        """Drop staged rows without publishing them; safe to call more than once."""
+        self._staging.close()
+        shutil.rmtree(self._staging_dir, ignore_errors=True)
+
+    def __enter__(self) -> "IndexUpdate":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,9 +1,86 @@
+import json
 import os
+import threading
+import time
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
+from langchain_core.vectorstores import VectorStore
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from app.rag.embedding_cache import EMBEDDING_CACHE_PATH, CachedEmbeddings, EmbeddingCache
+from app.rag.vector_index import MANIFEST_FILE, MmapVectorIndex, open_index
+
+# Root of the versioned mmap index, shared by ingest, rebuilds and every worker
+VECTORSTORE_PATH = os.getenv("VECTORSTORE_PATH", "vectorstore_index")
+EMBEDDING_MODEL = "text-embedding-3-small"
+CHAT_MODEL = "gpt-4o-mini"
+
+# How often a request may stat the manifest to look for a rebuilt index
+RELOAD_CHECK_INTERVAL = 5.0
+# Token-count inputs client-side before embedding; needs tiktoken's encoding files,
+# so OpenAI-compatible stand-ins without them can turn it off
+EMBEDDING_CHECK_CTX_LENGTH = os.getenv("EMBEDDING_CHECK_CTX_LENGTH", "1") != "0"
+
+
+class LoadedVectorstore(NamedTuple):
+    vectorstore: VectorStore
+    signature: tuple  # manifest identity the index was loaded for
+    version: str
+
+
+# The current snapshot; readers take one reference to it and never lock
+_loaded: Optional[LoadedVectorstore] = None
+_next_check = 0.0
+_reload_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_embeddings() -> OpenAIEmbeddings:
+    """Process-wide embeddings client, used as is for query embeddings."""
+    return OpenAIEmbeddings(model=EMBEDDING_MODEL, check_embedding_ctx_length=EMBEDDING_CHECK_CTX_LENGTH)
+
+
+def get_document_embeddings() -> CachedEmbeddings:
+    """Embeddings for indexing documents: the shared client behind the on-disk cache.
+
+    Built on demand, so only processes that index open and load the cache.
+    """
+    return CachedEmbeddings(get_embeddings(), EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_MODEL))
+
+
+@lru_cache(maxsize=None)
+def get_llm() -> ChatOpenAI:
+    """Process-wide chat model client."""
+    return ChatOpenAI(model=CHAT_MODEL, temperature=0)
+
+
+def _manifest_signature() -> Optional[tuple]:
+    """Identity of the index on disk: the manifest, or the FAISS files of older builds."""
+    for name in (MANIFEST_FILE, "index.faiss"):
+        try:
+            stat = os.stat(os.path.join(VECTORSTORE_PATH, name))
+        except FileNotFoundError:
+            continue
+        return name, stat.st_mtime_ns, stat.st_size
+    return None
+
+
+def _read_version(signature: tuple) -> str:
+    try:
+        with open(os.path.join(VECTORSTORE_PATH, MANIFEST_FILE), "r") as f:
+            return json.load(f)["version"]
+    except (FileNotFoundError, KeyError, json.JSONDecodeError):
+        return f"{signature[1]}-{signature[2]}"
+
+
+def _publish(vectorstore: VectorStore, signature: tuple, version: str) -> VectorStore:
+    global _loaded, _next_check
+    _loaded = LoadedVectorstore(vectorstore, signature, version)
+    _next_check = time.monotonic() + RELOAD_CHECK_INTERVAL
+    return vectorstore
 
-VECTORSTORE_PATH = "vectorstore_index"
 
 def build_vectorstore_from_text(text: str):
     # 1. Split text into chunks
@@ -14,21 +91,67 @@ def build_vectorstore_from_text(text: str):
     chunks = text_splitter.split_text(text)
 
     # 2. Create embeddings
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+    embeddings = get_document_embeddings()
 
-    # 3. Build vectorstore
-    vectorstore = FAISS.from_texts(chunks, embedding=embeddings)
+    # 3. Build and publish a new index version; only chunks missing from the
+    #    embedding cache are sent to the API, and the manifest is written last
+    #    so readers only see complete builds
+    before = embeddings.stats()
+    built = MmapVectorIndex.from_texts(chunks, embeddings, path=VECTORSTORE_PATH,
+                                       embedding_model=EMBEDDING_MODEL)
+    after = embeddings.stats()
+    print(f"🧠 Embedded {after['misses'] - before['misses']} new chunks in {after['requests'] - before['requests']} "
+          f"requests, {after['hits'] - before['hits']} from cache")
 
-    # 4. Save locally
-    vectorstore.save_local(VECTORSTORE_PATH)
+    # Served with the plain client, so query embeddings skip the cache
+    vectorstore = MmapVectorIndex(built.directory, get_embeddings())
+    return _publish(vectorstore, _manifest_signature(), os.path.basename(built.directory))
+
+
+def _load() -> VectorStore:
+    vectorstore = open_index(VECTORSTORE_PATH, get_embeddings())
+    if vectorstore is not None:
+        return vectorstore
+    # Index saved before the mmap format: a pickled FAISS store, served until rebuilt
+    from langchain_community.vectorstores import FAISS
+    print(f"⚠️ Loading legacy FAISS index from {VECTORSTORE_PATH}; rebuild it to switch to the shared mmap format")
+    return FAISS.load_local(VECTORSTORE_PATH, get_embeddings(), allow_dangerous_deserialization=True)
 
-    return vectorstore
 
 def get_vectorstore():
-    """Load vectorstore if it exists, otherwise build a new one."""
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+    """Return the shared vectorstore, loading it on first use and after a rebuild.
+
+    The manifest is checked at most every RELOAD_CHECK_INTERVAL seconds. A
+    changed index is loaded by one thread while others keep serving the
+    previous snapshot, then swapped in with a single assignment.
+    """
+    loaded = _loaded
+    if loaded is not None and time.monotonic() < _next_check:
+        return loaded.vectorstore
+
+    signature = _manifest_signature()
+    if loaded is not None and signature == loaded.signature:
+        _publish(loaded.vectorstore, loaded.signature, loaded.version)
+        return loaded.vectorstore
 
-    if os.path.exists(VECTORSTORE_PATH):
-        return FAISS.load_local(VECTORSTORE_PATH, embeddings, allow_dangerous_deserialization=True)
-    else:
+    if signature is None:
+        if loaded is not None:
+            return loaded.vectorstore
         raise ValueError("Vectorstore not found. Please build it first.")
+
+    # Only the first load waits; later reloads happen behind the current snapshot
+    if not _reload_lock.acquire(blocking=loaded is None):
+        return loaded.vectorstore
+    try:
+        current = _loaded
+        if current is not None and current.signature == signature:
+            return current.vectorstore
+        return _publish(_load(), signature, _read_version(signature))
+    finally:
+        _reload_lock.release()
+
+
+def get_vectorstore_version() -> Optional[str]:
+    """Version of the vectorstore currently served, or None before the first load."""
+    loaded = _loaded
+    return loaded.version if loaded is not None else None
@@ -1,27 +1,41 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-from langchain_openai import ChatOpenAI
 from langchain.chains import RetrievalQA
-from ..rag.vectorstore import get_vectorstore
+from ..rag.vectorstore import get_llm, get_vectorstore
 from ..rag.prompt import chat_prompt
+from ..utils.concurrency import run_blocking
+from ..utils.metrics import metrics
 
 router = APIRouter()
 
 class QueryRequest(BaseModel):
     question: str
 
-@router.post("/")
-async def chat_endpoint(req: QueryRequest):
+# (vectorstore, chain) for the snapshot the chain was built on
+_qa_chain = (None, None)
+
+
+def get_qa_chain():
+    """Return the shared QA chain, rebuilt only when the vectorstore is reloaded."""
+    global _qa_chain
     vectorstore = get_vectorstore()
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+    built_for, qa_chain = _qa_chain
+    if built_for is not vectorstore:
+        retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+        qa_chain = RetrievalQA.from_chain_type(
+            llm=get_llm(),
+            retriever=retriever,
+            chain_type="stuff",
+            chain_type_kwargs={"prompt": chat_prompt}
+        )
+        _qa_chain = (vectorstore, qa_chain)
+    return qa_chain
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        retriever=retriever,
-        chain_type="stuff",
-        chain_type_kwargs={"prompt": chat_prompt}
-    )
 
-    response = qa_chain.run(req.question)
-    return {"answer": response}
+@router.post("/")
+async def chat_endpoint(req: QueryRequest):
+    with metrics.span("/chat/", "vectorstore"):
+        qa_chain = await run_blocking(get_qa_chain)
+    with metrics.span("/chat/", "llm", upstream="openai"):
+        response = await qa_chain.ainvoke({"query": req.question})
+    return {"answer": response["result"]}
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from app.services.job_service import search_jobs_adzuna
+from app.services.job_service import job_cache, search_jobs_adzuna
+from app.utils.metrics import metrics
 
 router = APIRouter()
 
@@ -12,11 +13,17 @@ class JobSearchRequest(BaseModel):
 @router.post("/jobs/search")
 async def search_jobs(request: JobSearchRequest):
     try:
-        jobs = search_jobs_adzuna(
-            role=request.role,
-            location=request.location,
-            results_per_page=request.results_per_page
-        )
+        with metrics.span("/job/jobs/search", "job_search"):
+            jobs = await search_jobs_adzuna(
+                role=request.role,
+                location=request.location,
+                results_per_page=request.results_per_page
+            )
         return {"results": jobs}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/jobs/cache/stats")
+async def job_cache_stats():
+    return job_cache.stats()
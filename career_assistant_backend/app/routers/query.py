@@ -1,20 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
-import json
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from typing import Tuple, List, Dict, Any
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from langchain_openai import ChatOpenAI
 from langchain.chains import ConversationalRetrievalChain
 from langchain.prompts import PromptTemplate
-from langchain.memory import ConversationSummaryMemory
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_buffer_string
 
 from app.database import get_db
-from app.rag.vectorstore import get_vectorstore
-from app.services.chat_services import save_message, get_messages, clear_messages
+from app.rag.vectorstore import get_embeddings, get_llm, get_vectorstore, get_vectorstore_version
+from app.services.answer_cache import SemanticAnswerCache, document_key
+from app.services.chat_services import save_message, clear_messages, get_messages_page, encode_cursor, decode_cursor
+from app.services.summary_service import get_conversation_context, update_summary_in_background, clear_summary
+from app.services.job_catalog import offline_catalog
 from app.services.job_service import search_jobs_adzuna
+from app.utils.concurrency import run_blocking
+from app.utils.keyword_matcher import KeywordMatcher
+from app.utils.metrics import metrics
 
 router = APIRouter()
 
+# Route label of the spans timed inside /query
+QUERY_ROUTE = "/query/query"
+
 # Request models
 class QueryRequest(BaseModel):
     question: str
@@ -44,42 +51,71 @@ QA_PROMPT = PromptTemplate(
 )  
 
 
+# Whole words, so every form the old substring check caught is listed
+JOB_QUERY_MATCHER = KeywordMatcher({
+    "job": [
+        "job", "jobs", "career", "careers", "position", "positions", "opening", "openings",
+        "vacancy", "vacancies", "employment", "hiring", "recruit", "recruits", "recruited",
+        "recruiter", "recruiters", "recruiting", "recruitment", "work", "works", "worked",
+        "working", "workplace", "workforce", "role", "roles"
+    ]
+})
+
+
 def is_job_query(question: str) -> bool:
     """Check if the question is asking for job-related information."""
-    job_keywords = [
- "job", "jobs", "career", "position", "opening", "vacancy",
-        "employment", "hiring", "recruit", "work", "role"
+    return JOB_QUERY_MATCHER.search(question)
+
+
+# Words that point back at the conversation ("tell me more about that")
+FOLLOW_UP_MATCHER = KeywordMatcher({
+    "follow_up": [
+        "it", "its", "that", "this", "these", "those", "them", "they", "above", "previous",
+        "earlier", "again", "elaborate", "tell me more", "more about", "you said", "you mentioned",
+        "last answer", "the same", "what about", "how about"
     ]
-    question_lower = question.lower()
-    return any(keyword in question_lower for keyword in job_keywords)
+})
 
+# Answers to standalone questions, shared by every session in the process
+answer_cache = SemanticAnswerCache.from_env()
 
-def get_chain(db: Session, session_id: str):
-    """Conversational chain with hybrid memory (DB + summarization)."""
-    vectorstore = get_vectorstore()
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
 
-    # Summary memory for long chats
-    summary_memory = ConversationSummaryMemory(
-        llm=llm,
-        memory_key="chat_history",
-        return_messages=True
-    )
+def depends_on_history(question: str, chat_history: list) -> bool:
+    """A follow-up in an ongoing conversation can't be answered from another session's answer."""
+    return bool(chat_history) and FOLLOW_UP_MATCHER.search(question)
+
 
-    # Preload past history from DB
-    history = get_messages(db, session_id)
-    for m in history:
+def get_chat_history(db: Session, session_id: str, question: str) -> list:
+    """Stored rolling summary plus the recent raw messages, as chat messages."""
+    summary, recent = get_conversation_context(db, session_id)
+    # The current question has already been saved; it is asked, not history
+    if recent and str(recent[-1].role) == "user" and str(recent[-1].message) == question:
+        recent = recent[:-1]
+
+    chat_history = []
+    if summary:
+        chat_history.append(SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+    for m in recent:
         message: str = str(m.message)
         if str(m.role) == "user":
-            summary_memory.chat_memory.add_user_message(message)
+            chat_history.append(HumanMessage(content=message))
         else:
-            summary_memory.chat_memory.add_ai_message(message)
+            chat_history.append(AIMessage(content=message))
+    return chat_history
+
+
+def get_chain():
+    """Conversational retrieval chain; chat history is passed in with each call.
+
+    The vectorstore and LLM client are shared by the whole process.
+    """
+    vectorstore = get_vectorstore()
+    retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+    llm = get_llm()
 
     return ConversationalRetrievalChain.from_llm(
         llm=llm,
         retriever=retriever,
-        memory=summary_memory,
         combine_docs_chain_kwargs={"prompt": QA_PROMPT}
     )
 
@@ -106,44 +142,38 @@ def _parse_job_query(question: str) -> Tuple[str, str]:
 def _format_job_results(jobs: List[Dict[str, Any]], source: str) -> str:
     """Formats a list of job dictionaries into a readable string."""
     if source == "api":
+        # search_jobs_adzuna has already flattened the provider's nested fields
         return "\n\n".join(
-            [f"**{job.get('title', 'N/A')}** at {job.get('company', {}).get('display_name', 'N/A')} "
-             f"({job.get('location', {}).get('display_name', 'N/A')})\n"
-             f"Salary: {job.get('salary_min', 'N/A')} - {job.get('salary_max', 'N/A')}\n"
-             f"[Apply Here]({job.get('redirect_url', '#')})"
+            [f"**{job.get('title', 'N/A')}** at {job.get('company', 'N/A')} "
+             f"({job.get('location', 'N/A')})\n"
+             f"Salary: {job.get('salary', 'N/A')}\n"
+             f"[Apply Here]({job.get('url', '#')})"
              for job in jobs]
         )
-    # Fallback for local JSON structure
-    return "\n\n".join(
-        [f"**{job.get('title', 'Unknown')}** at {job.get('company', 'Unknown')}\n"
-         f"Matched Skills: {', '.join(job.get('matched_skills', []))}"
-         for job in jobs]
-    )
+    # Fallback for local catalog structure
+    return "\n\n".join(_format_local_job(job) for job in jobs)
 
 
-def _handle_offline_job_search(role: str) -> str:
-    """Handles job search using the local JSON file as a fallback."""
-    print("⚠️ API failed or returned no results, using offline data.")
-    try:
-        with open("app/routers/matched_jobs.json", "r") as f:
-            offline_jobs = json.load(f)["matched_jobs"]
-        
-        # Filter offline jobs by role (simple substring match)
-        if role and role.lower() != 'any':
-            offline_jobs = [
-                j for j in offline_jobs 
-                if role.lower() in j.get("title", "").lower()
-            ]
+def _format_local_job(job: Dict[str, Any]) -> str:
+    """Formats one offline catalog job: seed entries list skills, written-back API jobs a link."""
+    header = f"**{job.get('title', 'Unknown')}** at {job.get('company', 'Unknown')}"
+    if job.get("location"):
+        header += f" ({job['location']})"
+    if job.get("matched_skills"):
+        return f"{header}\nMatched Skills: {', '.join(job['matched_skills'])}"
+    return f"{header}\n[Apply Here]({job.get('url') or '#'})"
 
-        if not offline_jobs:
-            return f"We couldn't find any jobs for *{role}* right now, and our offline cache is empty or doesn't have a match."
 
-        formatted_jobs = _format_job_results(offline_jobs, source="local")
-        return f"We're having trouble reaching our job provider, but here are some popular jobs for *{role}* from our local cache:\n\n{formatted_jobs}"
+def _handle_offline_job_search(role: str, location: str = None) -> str:
+    """Handles job search using the in-memory offline catalog as a fallback."""
+    print("⚠️ API failed or returned no results, using offline data.")
+    offline_jobs = offline_catalog.search(role, location, limit=5)
+
+    if not offline_jobs:
+        return f"We couldn't find any jobs for *{role}* right now, and our offline cache is empty or doesn't have a match."
 
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print(f"🚨 Error reading offline jobs cache: {e}")
-        return f"We couldn't find any jobs for *{role}* right now, and our offline cache is currently unavailable."
+    formatted_jobs = _format_job_results(offline_jobs, source="local")
+    return f"We're having trouble reaching our job provider, but here are some popular jobs for *{role}* from our local cache:\n\n{formatted_jobs}"
 
 
 async def _handle_job_query(question: str) -> str:
@@ -152,11 +182,13 @@ async def _handle_job_query(question: str) -> str:
     role, location = _parse_job_query(question)
 
     # Fetch jobs from Adzuna
-    jobs = search_jobs_adzuna(role, location, results_per_page=3)
+    with metrics.span(QUERY_ROUTE, "job_search"):
+        jobs = await search_jobs_adzuna(role, location, results_per_page=3)
     print(f"📊 Adzuna API returned {len(jobs)} jobs")
 
     if not jobs:
-        return _handle_offline_job_search(role)
+        with metrics.span(QUERY_ROUTE, "offline_catalog"):
+            return await run_blocking(_handle_offline_job_search, role, location)
     
     formatted_jobs = _format_job_results(jobs, source="api")
     return f"Here are some job openings for *{role}* in *{location}*:\n\n{formatted_jobs}"
@@ -165,9 +197,43 @@ async def _handle_job_query(question: str) -> str:
 async def _handle_rag_query(question: str, session_id: str, db: Session) -> Dict[str, Any]:
     """Handles a general query using the RAG chain."""
     print("🟡 Query is NOT job related → sending to RAG")
-    chain = get_chain(db, session_id)
-    result = chain.invoke({"question": question})
-    
+    with metrics.span(QUERY_ROUTE, "chat_history"):
+        chat_history = await run_blocking(get_chat_history, db, session_id, question)
+
+    cacheable = not depends_on_history(question, chat_history)
+    if cacheable:
+        # Key on the question embedding and the documents it retrieves
+        with metrics.span(QUERY_ROUTE, "vectorstore"):
+            vectorstore = await run_blocking(get_vectorstore)
+        version = get_vectorstore_version()
+        with metrics.span(QUERY_ROUTE, "embedding", upstream="openai"):
+            embedding = await get_embeddings().aembed_query(question)
+        with metrics.span(QUERY_ROUTE, "retrieval"):
+            docs = await run_blocking(vectorstore.similarity_search_by_vector, embedding, k=3)
+        doc_ids = tuple(document_key(doc) for doc in docs)
+        with metrics.span(QUERY_ROUTE, "answer_cache"):
+            cached = answer_cache.lookup(embedding, doc_ids, version)
+        if cached is not None:
+            print("⚡ Answer cache hit")
+            return cached
+    else:
+        answer_cache.record_skip()
+
+    chain = await run_blocking(get_chain)
+    if cacheable:
+        # A standalone question needs no rephrasing, and its documents were
+        # retrieved for the cache key above, so only the answer step runs
+        with metrics.span(QUERY_ROUTE, "llm", upstream="openai"):
+            output = await chain.combine_docs_chain.ainvoke({
+                "input_documents": docs,
+                "question": question,
+                "chat_history": get_buffer_string(chat_history, ai_prefix="Assistant"),
+            })
+        result = {"answer": output[chain.combine_docs_chain.output_key], "source_documents": docs}
+    else:
+        with metrics.span(QUERY_ROUTE, "llm", upstream="openai"):
+            result = await chain.ainvoke({"question": question, "chat_history": chat_history})
+
     sources = []
     if "source_documents" in result:
         for doc in result["source_documents"]:
@@ -175,14 +241,19 @@ async def _handle_rag_query(question: str, session_id: str, db: Session) -> Dict
             fname = doc.metadata.get("filename", "unknown")
             sources.append(f"{src} / {fname}")
 
-    return {"answer": result["answer"], "sources": list(set(sources))}
+    response = {"answer": result["answer"], "sources": list(set(sources))}
+    if cacheable:
+        answer_cache.store(embedding, doc_ids, response, version)
+    return response
 
 
 @router.post("/query")
-async def query(request: QueryRequest, db: Session = Depends(get_db)):
+async def query(request: QueryRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     try:
         print(f"\n🟢 Incoming question: {request.question}")
-        save_message(db, request.session_id, "user", request.question)
+        # Only queues the message for the history writer, so no thread hop is needed
+        with metrics.span(QUERY_ROUTE, "save_message"):
+            save_message(db, request.session_id, "user", request.question)
 
         if is_job_query(request.question):
             answer = await _handle_job_query(request.question)
@@ -190,7 +261,10 @@ async def query(request: QueryRequest, db: Session = Depends(get_db)):
         else:
             response_data = await _handle_rag_query(request.question, request.session_id, db)
         
-        save_message(db, request.session_id, "assistant", response_data["answer"])
+        with metrics.span(QUERY_ROUTE, "save_message"):
+            save_message(db, request.session_id, "assistant", response_data["answer"])
+        # Fold turns that left the recent window into the stored summary after responding
+        background_tasks.add_task(update_summary_in_background, request.session_id)
         return response_data
 
     except Exception as e:
@@ -200,10 +274,39 @@ async def query(request: QueryRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="An unexpected error occurred.")
 
 
+@router.get("/history/{session_id}")
+async def history(
+    session_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    before: str | None = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db),
+):
+    """Newest messages first page; pass next_cursor as `before` to load older ones."""
+    try:
+        cursor = decode_cursor(before) if before else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    messages, next_cursor = await run_blocking(get_messages_page, db, session_id, limit, cursor)
+    return {
+        "messages": [
+            {"id": m.id, "role": m.role, "message": m.message, "timestamp": m.timestamp.isoformat()}
+            for m in messages
+        ],
+        "next_cursor": encode_cursor(next_cursor) if next_cursor else None,
+    }
+
+
+@router.get("/cache/stats")
+async def answer_cache_stats():
+    return answer_cache.stats()
+
+
 @router.delete("/reset/{session_id}")
 async def reset(session_id: str, db: Session = Depends(get_db)):
     try:
-        clear_messages(db, session_id)
+        await run_blocking(clear_messages, db, session_id)
+        await run_blocking(clear_summary, db, session_id)
         return {"message": f"Chat history for session {session_id} has been cleared."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
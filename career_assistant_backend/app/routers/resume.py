@@ -10,9 +10,11 @@ from app.models.job_match import JobMatchResult
 from app.services.resume_parser import parse_resume
 from app.services.skill_extractor import extract_skills
 from app.services.job_matcher import get_matched_jobs
+from app.utils.metrics import metrics
 
 router = APIRouter()
 UPLOAD_DIR = "temp_resumes"
+ANALYZE_ROUTE = "/resume/analyze/"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
@@ -35,17 +37,19 @@ async def analyze_resume(file: UploadFile = File(...), db: Session = Depends(get
 
     try:
         # Save the uploaded file
-        with open(file_path, "wb") as f:
+        with metrics.span(ANALYZE_ROUTE, "save_upload"), open(file_path, "wb") as f:
             shutil.copyfileobj(file.file, f)
 
         # Parse resume
-        parsed = parse_resume(file_path)
+        with metrics.span(ANALYZE_ROUTE, "parse"):
+            parsed = parse_resume(file_path)
         text = parsed.get("text", "")
         entities = parsed.get("entities", [])
 
         # Extract skills
         skill_pool = ["Python", "Django", "FastAPI", "SQL", "Java", "React", "Pandas", "Docker"]
-        extracted_skills = extract_skills(text, skill_pool)
+        with metrics.span(ANALYZE_ROUTE, "extract_skills"):
+            extracted_skills = extract_skills(text, skill_pool)
 
         # Example job listings (replace with DB later)
         job_listings = [
@@ -54,18 +58,20 @@ async def analyze_resume(file: UploadFile = File(...), db: Session = Depends(get
             {"title": "Data Analyst", "company": "Analytics Inc", "skills": ["Python", "Pandas", "Excel"]},
         ]
 
-        matched = get_matched_jobs(extracted_skills, job_listings)
+        with metrics.span(ANALYZE_ROUTE, "match_jobs"):
+            matched = get_matched_jobs(extracted_skills, job_listings)
 
-        # Save resume in DB
-        resume_record = Resume(text=text, entities=json.dumps(entities), user_id=None)
-        db.add(resume_record)
-        db.commit()
-        db.refresh(resume_record)
+        with metrics.span(ANALYZE_ROUTE, "db_write"):
+            # Save resume in DB
+            resume_record = Resume(text=text, entities=json.dumps(entities), user_id=None)
+            db.add(resume_record)
+            db.commit()
+            db.refresh(resume_record)
 
-        # Save matched jobs
-        match_record = JobMatchResult(resume_id=resume_record.id, matched_jobs=json.dumps(matched))
-        db.add(match_record)
-        db.commit()
+            # Save matched jobs
+            match_record = JobMatchResult(resume_id=resume_record.id, matched_jobs=json.dumps(matched))
+            db.add(match_record)
+            db.commit()
 
         # Return response
         return {
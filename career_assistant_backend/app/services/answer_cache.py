@@ -0,0 +1,127 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+__all__ = [
+    "SemanticAnswerCache",
+    "document_key",
+]
+
+DocIds = Tuple[str, ...]
+
+
+class CachedAnswer(NamedTuple):
+    slot: int  # row of the embedding in the matrix
+    doc_ids: DocIds
+    response: Dict[str, Any]
+
+
+def document_key(doc) -> str:
+    """Stable identity of a retrieved document: its docstore id, else a content hash."""
+    return getattr(doc, "id", None) or hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class SemanticAnswerCache:
+    """Cache of RAG answers keyed on question embeddings.
+
+    A lookup hits when a cached question's cosine similarity to the new one
+    is at least `threshold` and retrieval returned the same documents, so a
+    near-duplicate phrasing is answered from the cache only when it would
+    see the same context. Embeddings are kept in one preallocated matrix and
+    compared with a single matrix-vector product. The cache empties itself
+    when the vectorstore version changes and keeps at most `max_entries`
+    answers, least recently used first out.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 512):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()  # slot -> answer, LRU order
+        self._free: List[int] = []
+        self._metrics = dict.fromkeys(("hits", "misses", "skipped", "evictions", "invalidations"), 0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self, version: Optional[str]):
+        if version != self._version:
+            if self._entries:
+                self._metrics["invalidations"] += 1
+            self._entries.clear()
+            self._free = list(range(self.max_entries - 1, -1, -1))
+            if self._matrix is not None:
+                self._matrix[:] = 0.0
+            self._version = version
+
+    def lookup(self, embedding: Sequence[float], doc_ids: DocIds, version: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return a cached response for a similar question with the same documents, or None."""
+        vector = self._unit(embedding)
+        with self._lock:
+            self._check_version(version)
+            if not self._entries or self._matrix is None or self._matrix.shape[1] != len(vector):
+                self._metrics["misses"] += 1
+                return None
+            # Free slots hold zeros, so they never clear the threshold
+            scores = self._matrix @ vector
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for slot in candidates[np.argsort(-scores[candidates])]:
+                entry = self._entries.get(int(slot))
+                if entry is not None and entry.doc_ids == doc_ids:
+                    self._entries.move_to_end(entry.slot)
+                    self._metrics["hits"] += 1
+                    return {**entry.response, "sources": list(entry.response.get("sources", []))}
+            self._metrics["misses"] += 1
+            return None
+
+    def store(self, embedding: Sequence[float], doc_ids: DocIds, response: Dict[str, Any], version: Optional[str]):
+        vector = self._unit(embedding)
+        with self._lock:
+            self._check_version(version)
+            if self._matrix is None or self._matrix.shape[1] != len(vector):
+                # First answer, or a new embedding model: start over at the new width
+                self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                self._entries.clear()
+                self._free = list(range(self.max_entries - 1, -1, -1))
+            if not self._free:
+                _, evicted = self._entries.popitem(last=False)
+                self._matrix[evicted.slot] = 0.0
+                self._free.append(evicted.slot)
+                self._metrics["evictions"] += 1
+            slot = self._free.pop()
+            self._matrix[slot] = vector
+            self._entries[slot] = CachedAnswer(slot, tuple(doc_ids), response)
+
+    def record_skip(self):
+        """Count a question that bypassed the cache because it depends on the conversation."""
+        with self._lock:
+            self._metrics["skipped"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._metrics["hits"] + self._metrics["misses"]
+        return {
+            **self._metrics,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hit_rate": round(self._metrics["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "SemanticAnswerCache":
+        return cls(
+            threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92")),
+            max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512")),
+        )
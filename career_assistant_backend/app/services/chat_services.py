@@ -1,38 +1,114 @@
+import base64
+import binascii
+from datetime import datetime
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
 from app.models.chat_history import ChatHistory
+from app.services.history_archive import delete_archived, read_archived
+from app.services.history_writer import MessageRow, history_writer, merge_pending, message_sort_key
 
 __all__ = [
     "save_message",
     "get_messages",
+    "get_recent_messages",
+    "get_messages_page",
+    "encode_cursor",
+    "decode_cursor",
     "clear_messages",
     "handle_chat",
 ]
 
+# Columns read back as plain row tuples instead of ORM instances
+MESSAGE_COLUMNS = (ChatHistory.id, ChatHistory.session_id, ChatHistory.role, ChatHistory.message, ChatHistory.timestamp)
 
-def save_message(db: Session, session_id: str, role: str, message: str) -> ChatHistory:
-    chat = ChatHistory(session_id=session_id, role=role, message=message)
-    db.add(chat)
-    db.commit()
-    db.refresh(chat)
-    return chat
+Cursor = tuple[datetime, int]
 
 
-def get_messages(db: Session, session_id: str) -> list[ChatHistory]:
-    return (
-        db.query(ChatHistory)
-        .filter(ChatHistory.session_id == session_id)
-        .order_by(ChatHistory.timestamp.asc())
-        .all()
-    )
+def save_message(db: Session, session_id: str, role: str, message: str) -> MessageRow:
+    """Queue a message for the write-behind history writer.
+
+    Returns a MessageRow rather than the ChatHistory instance this used to
+    add and commit: it has the same fields, but is not attached to `db` and
+    its id is None because the row is not written yet. Reads through
+    get_messages see it right away.
+    """
+    return history_writer.enqueue(session_id, role, message).to_row()
+
+
+def get_messages(db: Session, session_id: str) -> list[MessageRow]:
+    """Every message of a session, archived ones included, oldest first."""
+    pending = history_writer.pending(session_id)
+    rows = db.execute(
+        select(*MESSAGE_COLUMNS)
+        .where(ChatHistory.session_id == session_id)
+        .order_by(ChatHistory.timestamp.asc(), ChatHistory.id.asc())
+    ).all()
+    archived = read_archived(db, session_id)
+    return merge_pending(archived + [MessageRow._make(row) for row in rows], pending)
+
+
+def get_messages_page(db: Session, session_id: str, limit: int = 50,
+                      before: Cursor | None = None) -> tuple[list[MessageRow], Cursor | None]:
+    """Return up to `limit` messages older than `before`, oldest first, and the cursor of the next page.
+
+    Keyset pagination on (timestamp, id): each page is one index range scan,
+    however deep into the history it is. Once the page reaches past the live
+    table it continues into the archive, decompressing only the chunks it
+    needs. The cursor is None on the last page.
+    """
+    pending = history_writer.pending(session_id)
+    query = select(*MESSAGE_COLUMNS).where(ChatHistory.session_id == session_id)
+    if before is not None:
+        query = query.where(tuple_(ChatHistory.timestamp, ChatHistory.id) < before)
+        pending = [p for p in pending if message_sort_key(p.to_row()) < before]
+    rows = db.execute(
+        query.order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc()).limit(limit + 1)
+    ).all()
+    rows = [MessageRow._make(row) for row in reversed(rows)]
+    if len(rows) <= limit:
+        # Archived messages are all older than the live ones of their session
+        older_than = message_sort_key(rows[0]) if rows else before
+        rows = read_archived(db, session_id, older_than, limit + 1 - len(rows)) + rows
+
+    messages = merge_pending(rows, pending)
+    if len(messages) <= limit:
+        return messages, None
+    page = messages[-limit:]
+    oldest = page[0]
+    # A queued message has no id yet; 0 keeps the next page strictly older than it
+    return page, (oldest.timestamp, oldest.id or 0)
+
+
+def get_recent_messages(db: Session, session_id: str, limit: int) -> list[MessageRow]:
+    """The last `limit` messages of a session, oldest first, reading only the tail."""
+    return get_messages_page(db, session_id, limit)[0]
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    timestamp, message_id = cursor
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{message_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Parse a cursor from encode_cursor; raises ValueError if it is malformed."""
+    try:
+        timestamp, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except (UnicodeDecodeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
 
 def clear_messages(db: Session, session_id: str) -> int:
-    deleted = (
-        db.query(ChatHistory)
-        .filter(ChatHistory.session_id == session_id)
-        .delete(synchronize_session=False)
-    )
-    db.commit()
+    # Hold back flushes so queued messages can't land after the delete
+    with history_writer.hold_flushes():
+        deleted = history_writer.discard(session_id)
+        deleted += (
+            db.query(ChatHistory)
+            .filter(ChatHistory.session_id == session_id)
+            .delete(synchronize_session=False)
+        )
+        deleted += delete_archived(db, session_id)
+        db.commit()
     return deleted
 
 
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import zstandard as zstd
+from sqlalchemy import delete, func, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.chat_archive import ChatHistoryArchive
+from app.models.chat_history import ChatHistory
+from app.models.conversation_summary import ConversationSummary
+from app.services.history_writer import MessageRow, message_sort_key
+from app.utils.concurrency import run_blocking
+
+__all__ = [
+    "compact_history",
+    "compact_history_in_background",
+    "run_compaction_periodically",
+    "read_archived",
+    "delete_archived",
+]
+
+# Retention: rows older than this, or beyond the newest HISTORY_KEEP_RECENT of a session, are archived
+HISTORY_RETENTION_DAYS = float(os.getenv("HISTORY_RETENTION_DAYS", "30"))
+HISTORY_KEEP_RECENT = int(os.getenv("HISTORY_KEEP_RECENT", "200"))
+HISTORY_COMPACTION_INTERVAL = float(os.getenv("HISTORY_COMPACTION_INTERVAL", "3600"))  # seconds; 0 disables
+ARCHIVE_CHUNK_SIZE = int(os.getenv("ARCHIVE_CHUNK_SIZE", "500"))
+ARCHIVE_COMPRESSION_LEVEL = 9
+# Decompressed chunks kept in memory for paging back through archived history
+ARCHIVE_CACHE_CHUNKS = 64
+
+Cursor = Tuple[datetime, int]
+
+_chunk_cache: "OrderedDict[int, List[MessageRow]]" = OrderedDict()
+_chunk_cache_lock = threading.Lock()
+
+
+def _compress(rows: List[MessageRow]) -> bytes:
+    payload = [[row.id, row.role, row.message, row.timestamp.isoformat()] for row in rows]
+    return zstd.ZstdCompressor(level=ARCHIVE_COMPRESSION_LEVEL).compress(json.dumps(payload).encode("utf-8"))
+
+
+def _decompress(session_id: str, data: bytes) -> List[MessageRow]:
+    payload = json.loads(zstd.ZstdDecompressor().decompress(data))
+    return [
+        MessageRow(message_id, session_id, role, message, datetime.fromisoformat(timestamp))
+        for message_id, role, message, timestamp in payload
+    ]
+
+
+def _chunk_rows(db: Session, chunk_id: int, session_id: str) -> List[MessageRow]:
+    """Rows of one archive chunk, decompressed on first use and then served from a small LRU."""
+    with _chunk_cache_lock:
+        rows = _chunk_cache.get(chunk_id)
+        if rows is not None:
+            _chunk_cache.move_to_end(chunk_id)
+            return rows
+    data = db.execute(select(ChatHistoryArchive.data).where(ChatHistoryArchive.id == chunk_id)).scalar_one()
+    rows = _decompress(session_id, data)
+    with _chunk_cache_lock:
+        _chunk_cache[chunk_id] = rows
+        while len(_chunk_cache) > ARCHIVE_CACHE_CHUNKS:
+            _chunk_cache.popitem(last=False)
+    return rows
+
+
+def read_archived(db: Session, session_id: str, before: Optional[Cursor] = None,
+                  limit: Optional[int] = None) -> List[MessageRow]:
+    """Archived messages of a session older than `before`, oldest first; the newest `limit` if given.
+
+    Chunks are decompressed newest first and only until `limit` messages are found.
+    """
+    query = select(ChatHistoryArchive.id).where(ChatHistoryArchive.session_id == session_id)
+    if before is not None:
+        query = query.where(tuple_(ChatHistoryArchive.first_timestamp, ChatHistoryArchive.first_id) < before)
+    chunk_ids = db.execute(
+        query.order_by(ChatHistoryArchive.last_timestamp.desc(), ChatHistoryArchive.last_id.desc())
+    ).scalars().all()
+
+    collected: List[MessageRow] = []
+    for chunk_id in chunk_ids:
+        rows = _chunk_rows(db, chunk_id, session_id)
+        if before is not None:
+            rows = [row for row in rows if message_sort_key(row) < before]
+        collected = rows + collected
+        if limit is not None and len(collected) >= limit:
+            return collected[-limit:]
+    return collected
+
+
+def delete_archived(db: Session, session_id: str) -> int:
+    """Delete a session's archived messages; the caller commits."""
+    counts = db.execute(
+        select(ChatHistoryArchive.message_count).where(ChatHistoryArchive.session_id == session_id)
+    ).scalars().all()
+    db.execute(delete(ChatHistoryArchive).where(ChatHistoryArchive.session_id == session_id))
+    return sum(counts)
+
+
+def _archive_boundary(db: Session, session_id: str, cutoff: datetime, keep_recent: int) -> Optional[Cursor]:
+    """Newest (timestamp, id) to archive: each rule selects a prefix of the session in time order.
+
+    Trimming to `keep_recent` stops at the last message folded into the
+    session's summary, so an active conversation never loses a turn from both
+    the summary and the recent window. Rows past the retention cutoff are
+    archived either way, so short, idle or never-summarized sessions age out too.
+    """
+    newest_first = (ChatHistory.timestamp.desc(), ChatHistory.id.desc())
+    key = select(ChatHistory.timestamp, ChatHistory.id).where(ChatHistory.session_id == session_id)
+    by_age = db.execute(key.where(ChatHistory.timestamp < cutoff).order_by(*newest_first).limit(1)).first()
+
+    by_count = db.execute(key.order_by(*newest_first).offset(keep_recent).limit(1)).first()
+    summarized_through = db.execute(
+        select(ConversationSummary.summarized_through).where(ConversationSummary.session_id == session_id)
+    ).scalar()
+    if by_count is not None and summarized_through:
+        by_summary = db.execute(
+            key.where(ChatHistory.id <= summarized_through).order_by(*newest_first).limit(1)
+        ).first()
+        by_count = min(tuple(by_count), tuple(by_summary)) if by_summary is not None else None
+    else:
+        by_count = None
+
+    boundaries = [tuple(row) for row in (by_count, by_age) if row is not None]
+    return max(boundaries) if boundaries else None
+
+
+def _archive_session(db: Session, session_id: str, boundary: Cursor, chunk_size: int) -> int:
+    archived = 0
+    columns = (ChatHistory.id, ChatHistory.session_id, ChatHistory.role, ChatHistory.message, ChatHistory.timestamp)
+    while True:
+        # Top up the session's newest chunk first so chunks stay full across runs
+        tail = db.execute(
+            select(ChatHistoryArchive.id, ChatHistoryArchive.data)
+            .where(ChatHistoryArchive.session_id == session_id, ChatHistoryArchive.message_count < chunk_size)
+            .order_by(ChatHistoryArchive.last_timestamp.desc(), ChatHistoryArchive.last_id.desc())
+            .limit(1)
+        ).first()
+        carried = _decompress(session_id, tail.data) if tail else []
+
+        rows = [MessageRow._make(row) for row in db.execute(
+            select(*columns)
+            .where(ChatHistory.session_id == session_id, tuple_(ChatHistory.timestamp, ChatHistory.id) <= boundary)
+            .order_by(ChatHistory.timestamp.asc(), ChatHistory.id.asc())
+            .limit(chunk_size - len(carried))
+        ).all()]
+        if not rows:
+            return archived
+
+        chunk = carried + rows
+        deleted = db.execute(delete(ChatHistory).where(ChatHistory.id.in_([row.id for row in rows]))).rowcount
+        if deleted != len(rows):
+            # The session was cleared meanwhile; don't resurrect its messages in the archive
+            db.rollback()
+            return archived
+        if tail:
+            # Replaced rather than updated, so a cached decompressed chunk is never stale
+            db.execute(delete(ChatHistoryArchive).where(ChatHistoryArchive.id == tail.id))
+        db.add(ChatHistoryArchive(
+            session_id=session_id,
+            first_id=chunk[0].id,
+            last_id=chunk[-1].id,
+            first_timestamp=chunk[0].timestamp,
+            last_timestamp=chunk[-1].timestamp,
+            message_count=len(chunk),
+            data=_compress(chunk),
+        ))
+        db.commit()
+        archived += len(rows)
+
+
+def compact_history(db: Session, retention_days: float = HISTORY_RETENTION_DAYS,
+                    keep_recent: int = HISTORY_KEEP_RECENT, chunk_size: int = ARCHIVE_CHUNK_SIZE,
+                    now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Move old chat_history rows into zstd chunks in chat_history_archive.
+
+    A row is archived when it is older than `retention_days` or not among the
+    newest `keep_recent` messages of its session; the latter only once the
+    session's rolling summary has folded it in. Each chunk holds up to
+    `chunk_size` consecutive messages of one session and is written in the
+    same transaction that deletes its rows from chat_history.
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)  # naive UTC, like stored timestamps
+    cutoff = now - timedelta(days=retention_days)
+    sessions = db.execute(
+        select(ChatHistory.session_id)
+        .group_by(ChatHistory.session_id)
+        .having(or_(func.count() > keep_recent, func.min(ChatHistory.timestamp) < cutoff))
+    ).scalars().all()
+
+    archived = 0
+    for session_id in sessions:
+        boundary = _archive_boundary(db, session_id, cutoff, keep_recent)
+        if boundary is not None:
+            archived += _archive_session(db, session_id, boundary, chunk_size)
+    return {"sessions": len(sessions), "archived_messages": archived}
+
+
+def compact_history_in_background() -> Dict[str, Any]:
+    """compact_history with its own DB session."""
+    db = SessionLocal()
+    try:
+        stats = compact_history(db)
+        if stats["archived_messages"]:
+            print(f"🗜️ Archived {stats['archived_messages']} chat messages from {stats['sessions']} sessions")
+        return stats
+    finally:
+        db.close()
+
+
+async def run_compaction_periodically(interval: float = HISTORY_COMPACTION_INTERVAL):
+    """Run compaction every `interval` seconds until cancelled."""
+    while True:
+        try:
+            await run_blocking(compact_history_in_background)
+        except Exception as e:
+            print(f"⚠️ Chat history compaction failed: {e}")
+        await asyncio.sleep(interval)
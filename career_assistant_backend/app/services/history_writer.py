@@ -0,0 +1,236 @@
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.chat_history import ChatHistory
+
+__all__ = [
+    "HistoryWriter",
+    "MessageRow",
+    "history_writer",
+    "merge_pending",
+    "message_sort_key",
+]
+
+
+class MessageRow(NamedTuple):
+    """A chat_history row on the read path; id is None while the message is still queued"""
+    id: Optional[int]
+    session_id: str
+    role: str
+    message: str
+    timestamp: datetime
+
+
+# Queued messages sort after committed rows with the same timestamp
+_UNFLUSHED_ID = 2 ** 63 - 1
+
+
+def message_sort_key(row: MessageRow) -> Tuple[datetime, int]:
+    return row.timestamp, row.id if row.id is not None else _UNFLUSHED_ID
+
+
+class PendingMessage(NamedTuple):
+    session_id: str
+    role: str
+    message: str
+    timestamp: datetime  # naive UTC, as SQLite stores func.now()
+
+    def to_row(self) -> MessageRow:
+        return MessageRow(None, self.session_id, self.role, self.message, self.timestamp)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class HistoryWriter:
+    """Write-behind queue for chat history.
+
+    Messages are queued in memory and written by a background thread in one
+    multi-row INSERT per flush. A flush runs once `flush_batch` messages are
+    waiting or `flush_interval` seconds after the oldest one was queued,
+    whichever comes first. Queued messages stay readable through `pending`
+    until their flush has committed, and `close` flushes whatever is left.
+
+    A batch that fails because the database is locked or unreachable is
+    retried as a whole. Any other failure is blamed on the rows: they are
+    retried one by one, and a row that still fails is logged and dropped
+    so it cannot hold up the messages queued behind it.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal,
+                 flush_interval: float = 0.2, flush_batch: int = 256):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._queue: List[PendingMessage] = []
+        self._by_session: Dict[str, List[PendingMessage]] = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.RLock()  # held while a batch is being written
+        self._oldest = 0.0
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self.dropped = 0  # rows given up on because they could not be written
+
+    def enqueue(self, session_id: str, role: str, message: str) -> PendingMessage:
+        pending = PendingMessage(session_id, role, message, _utcnow())
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("History writer is closed")
+            if not self._queue:
+                self._oldest = time.monotonic()
+            self._queue.append(pending)
+            self._by_session.setdefault(session_id, []).append(pending)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self._thread.start()
+            if len(self._queue) >= self.flush_batch:
+                self._cond.notify()
+        return pending
+
+    def pending(self, session_id: str) -> List[PendingMessage]:
+        """Messages of a session not yet committed, oldest first."""
+        with self._cond:
+            return list(self._by_session.get(session_id, ()))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if len(self._queue) >= self.flush_batch:
+                        break
+                    if self._queue:
+                        remaining = self._oldest + self.flush_interval - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._closed and not self._queue:
+                    return
+            if not self.flush():
+                if self._closed:
+                    print(f"🚨 Dropping {len(self._queue)} unwritten chat messages on shutdown")
+                    return
+                time.sleep(self.flush_interval)  # database busy or down; retry later
+
+    def flush(self) -> bool:
+        """Write up to flush_batch queued messages in one transaction; True when none are left to retry."""
+        with self._flush_lock:
+            with self._cond:
+                batch = self._queue[:self.flush_batch]
+            if not batch:
+                return True
+            try:
+                self._write(batch)
+                settled = batch
+            except OperationalError as e:
+                print(f"⚠️ Failed to write {len(batch)} chat messages, will retry: {e}")
+                return False
+            except Exception as e:
+                print(f"⚠️ Failed to write {len(batch)} chat messages, writing them one at a time: {e}")
+                settled = self._write_each(batch)
+            self._remove(settled)
+            return len(settled) == len(batch)
+
+    def _write(self, batch: Sequence[PendingMessage]):
+        db = self.session_factory()
+        try:
+            db.execute(insert(ChatHistory), [pending._asdict() for pending in batch])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write_each(self, batch: Sequence[PendingMessage]) -> List[PendingMessage]:
+        """Write rows separately, dropping bad ones; returns the leading rows that are settled."""
+        for done, pending in enumerate(batch):
+            try:
+                self._write([pending])
+            except OperationalError as e:
+                print(f"⚠️ Failed to write chat messages, will retry: {e}")
+                return list(batch[:done])
+            except Exception as e:
+                self.dropped += 1
+                print(f"🚨 Dropping chat message of session {pending.session_id} that cannot be written: {e}")
+        return list(batch)
+
+    def _remove(self, settled: Sequence[PendingMessage]):
+        """Take messages that were written or dropped off the head of the queue."""
+        with self._cond:
+            del self._queue[:len(settled)]
+            for pending in settled:
+                session = self._by_session.get(pending.session_id)
+                if session and session[0] is pending:
+                    session.pop(0)
+                    if not session:
+                        del self._by_session[pending.session_id]
+            if self._queue:
+                self._oldest = time.monotonic()
+
+    @contextmanager
+    def hold_flushes(self):
+        """Keep the writer from committing while the caller rewrites a session's rows."""
+        with self._flush_lock:
+            yield
+
+    def discard(self, session_id: str) -> int:
+        """Drop a session's queued messages."""
+        with self._flush_lock, self._cond:
+            dropped = self._by_session.pop(session_id, [])
+            if dropped:
+                self._queue = [pending for pending in self._queue if pending.session_id != session_id]
+            return len(dropped)
+
+    def close(self):
+        """Flush every queued message and stop the background thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        else:
+            self.flush()
+
+    @classmethod
+    def from_env(cls) -> "HistoryWriter":
+        return cls(
+            flush_interval=float(os.getenv("HISTORY_FLUSH_INTERVAL", "0.2")),
+            flush_batch=int(os.getenv("HISTORY_FLUSH_BATCH", "256")),
+        )
+
+
+def merge_pending(rows: Sequence[MessageRow], pending: Sequence[PendingMessage]) -> List[MessageRow]:
+    """Append queued messages to rows read from the database, skipping ones already committed.
+
+    Take the pending snapshot before querying the database: a message leaves
+    the queue only after its flush commits, so it is then in at least one of
+    the two.
+    """
+    if not pending:
+        return list(rows)
+    committed = {(row.timestamp, row.role, row.message) for row in rows}
+    merged = list(rows)
+    merged.extend(p.to_row() for p in pending if (p.timestamp, p.role, p.message) not in committed)
+    merged.sort(key=message_sort_key)
+    return merged
+
+
+# Shared by every request in the process
+history_writer = HistoryWriter.from_env()
+atexit.register(history_writer.close)
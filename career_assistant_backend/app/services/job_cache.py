@@ -0,0 +1,141 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Tuple
+
+__all__ = [
+    "JobSearchCache",
+    "normalize_job_query",
+]
+
+JobList = List[Dict[str, Any]]
+CacheKey = Tuple[str, str, int]
+
+
+class CacheEntry(NamedTuple):
+    jobs: JobList
+    expires_at: float   # fresh until
+    stale_until: float  # may be served while a refresh runs until
+
+
+def normalize_job_query(role: str, location: str, results_per_page: int) -> CacheKey:
+    """Cache key that ignores case and spacing differences between identical searches."""
+    return " ".join(role.lower().split()), " ".join(location.lower().split()), int(results_per_page)
+
+
+class JobSearchCache:
+    """TTL cache for job search results with stale-while-revalidate.
+
+    - Fresh entries are served directly.
+    - Expired entries are served while one background refresh runs, until
+      they pass `stale_ttl`.
+    - Empty results are cached for `negative_ttl` only.
+    - Failed fetches are never cached: the error reaches the waiting callers,
+      and a failed background refresh is logged while the expired entry keeps
+      being served.
+    - Concurrent misses for the same key share one upstream call.
+    - At most `max_entries` keys are kept, least recently used first out.
+    """
+
+    def __init__(self, ttl: float = 600, stale_ttl: float = 3600, negative_ttl: float = 60,
+                 max_entries: int = 1024, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Task] = {}
+        self._metrics = dict.fromkeys(
+            ("hits", "stale_hits", "negative_hits", "misses", "coalesced", "refreshes", "failures", "evictions"), 0
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key: CacheKey, fetch: Callable[[], Awaitable[JobList]]) -> JobList:
+        """Return cached jobs for key, calling fetch() upstream only when needed."""
+        now = self._clock()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now < entry.expires_at:
+                self._entries.move_to_end(key)
+                self._metrics["negative_hits" if not entry.jobs else "hits"] += 1
+                return entry.jobs
+            if now < entry.stale_until:
+                self._entries.move_to_end(key)
+                self._metrics["stale_hits"] += 1
+                if key not in self._inflight:
+                    self._metrics["refreshes"] += 1
+                    self._start_fetch(key, fetch)
+                return entry.jobs
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._metrics["coalesced"] += 1
+        else:
+            self._metrics["misses"] += 1
+            task = self._start_fetch(key, fetch)
+        # Shielded so a cancelled caller does not cancel the call others are waiting on
+        return await asyncio.shield(task)
+
+    def _start_fetch(self, key: CacheKey, fetch: Callable[[], Awaitable[JobList]]) -> asyncio.Task:
+        async def run() -> JobList:
+            try:
+                jobs = await fetch()
+                self._store(key, jobs)
+                return jobs
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.ensure_future(run())
+        task.add_done_callback(lambda done: self._record_failure(key, done))
+        self._inflight[key] = task
+        return task
+
+    def _record_failure(self, key: CacheKey, task: asyncio.Task):
+        # Also marks the exception retrieved when no caller is left to await it
+        if task.cancelled() or task.exception() is None:
+            return
+        self._metrics["failures"] += 1
+        print(f"⚠️ Job search for {key} failed, nothing cached: {task.exception()!r}")
+
+    def _store(self, key: CacheKey, jobs: JobList):
+        now = self._clock()
+        if jobs:
+            entry = CacheEntry(jobs, now + self.ttl, now + self.ttl + self.stale_ttl)
+        else:
+            entry = CacheEntry(jobs, now + self.negative_ttl, now + self.negative_ttl)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._metrics["evictions"] += 1
+
+    def invalidate(self, key: CacheKey = None):
+        """Drop one key, or every key when none is given."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._metrics["hits"] + self._metrics["stale_hits"] + self._metrics["negative_hits"] \
+            + self._metrics["misses"] + self._metrics["coalesced"]
+        served_from_cache = lookups - self._metrics["misses"]
+        return {
+            **self._metrics,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_rate": round(served_from_cache / lookups, 4) if lookups else 0.0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "JobSearchCache":
+        return cls(
+            ttl=float(os.getenv("JOB_CACHE_TTL", "600")),
+            stale_ttl=float(os.getenv("JOB_CACHE_STALE_TTL", "3600")),
+            negative_ttl=float(os.getenv("JOB_CACHE_NEGATIVE_TTL", "60")),
+            max_entries=int(os.getenv("JOB_CACHE_MAX_ENTRIES", "1024")),
+        )
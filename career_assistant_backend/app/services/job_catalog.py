@@ -0,0 +1,256 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+__all__ = [
+    "JobCatalog",
+    "offline_catalog",
+]
+
+# Seed catalog shipped with the app, and the write-back log of jobs seen from the API
+OFFLINE_JOBS_PATH = os.getenv("OFFLINE_JOBS_PATH", "app/routers/matched_jobs.json")
+CACHED_JOBS_PATH = os.getenv("CACHED_JOBS_PATH", "app/routers/cached_jobs.jsonl")
+
+# How often a lookup may stat the catalog files for outside changes
+RELOAD_CHECK_INTERVAL = 5.0
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9+#]+")
+STOP_WORDS = {"a", "an", "and", "or", "the", "of", "for", "in", "at", "job", "jobs", "role", "roles"}
+
+TITLE_WEIGHT = 2.0
+SKILL_WEIGHT = 1.0
+LOCATION_WEIGHT = 3.0
+
+JobKey = Tuple[str, str, str]
+
+# Everything a reload replaces in one swap
+_INDEX_FIELDS = ("jobs", "_ids", "_title_index", "_skill_index", "_location_index", "_job_skills", "_arrays")
+
+
+@lru_cache(maxsize=65536)
+def _tokens(text: str) -> FrozenSet[str]:
+    # Titles and locations repeat heavily across jobs, hence the cache
+    return frozenset(t for t in TOKEN_PATTERN.findall((text or "").lower()) if t not in STOP_WORDS)
+
+
+def _normalize(job: Dict[str, Any]) -> Dict[str, Any]:
+    """One record shape for seed entries (matched_skills) and API results (location, url)."""
+    return {
+        "title": job.get("title") or "Unknown",
+        "company": job.get("company") or "Unknown",
+        "location": job.get("location") or "",
+        "matched_skills": list(job.get("matched_skills") or job.get("skills") or []),
+        "salary": job.get("salary"),
+        "url": job.get("url"),
+    }
+
+
+def _job_key(job: Dict[str, Any]) -> JobKey:
+    return job["title"].lower(), job["company"].lower(), job["location"].lower()
+
+
+class JobCatalog:
+    """Offline job catalog kept in memory with inverted indexes.
+
+    Jobs come from the seed JSON file and from a JSONL log of jobs written
+    back after successful API calls. Title, skill and location tokens each
+    have their own postings, so a lookup only touches jobs sharing a token
+    with the query. Both files are reloaded when their mtime changes.
+    """
+
+    def __init__(self, seed_path: str = OFFLINE_JOBS_PATH, cache_path: str = CACHED_JOBS_PATH):
+        self.seed_path = seed_path
+        self.cache_path = cache_path
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._signature: Optional[tuple] = None
+        self._next_check = 0.0
+        self._reset()
+
+    def _reset(self):
+        self.jobs: List[Dict[str, Any]] = []
+        self._ids: Dict[JobKey, int] = {}
+        self._title_index: Dict[str, Set[int]] = {}
+        self._skill_index: Dict[str, Set[int]] = {}
+        self._location_index: Dict[str, Set[int]] = {}
+        self._job_skills: List[FrozenSet[str]] = []
+        # Postings frozen into arrays for vectorized scoring, rebuilt when a token changes
+        self._arrays: Dict[Tuple[int, str], np.ndarray] = {}
+
+    def __len__(self):
+        self.ensure_loaded()
+        return len(self.jobs)
+
+    def _file_signature(self) -> tuple:
+        signature = []
+        for path in (self.seed_path, self.cache_path):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def ensure_loaded(self):
+        """(Re)load the catalog if a file changed since the last load, checking at most every few seconds.
+
+        A reload builds a new index off to the side and swaps it in, so
+        lookups keep using the current one meanwhile. Only the first load
+        makes callers wait.
+        """
+        now = time.monotonic()
+        if self._signature is not None and now < self._next_check:
+            return
+        if not self._reload_lock.acquire(blocking=self._signature is None):
+            return
+        try:
+            signature = self._file_signature()
+            self._next_check = now + RELOAD_CHECK_INTERVAL
+            if signature == self._signature:
+                return
+            fresh = JobCatalog(self.seed_path, self.cache_path)
+            fresh._load_seed()
+            fresh._load_cache()
+            with self._lock:
+                for field in _INDEX_FIELDS:
+                    setattr(self, field, getattr(fresh, field))
+                self._signature = signature
+            print(f"📂 Loaded offline job catalog: {len(self.jobs)} jobs")
+        finally:
+            self._reload_lock.release()
+
+    def _load_seed(self):
+        try:
+            with open(self.seed_path, "r") as f:
+                seed = json.load(f).get("matched_jobs", [])
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"🚨 Error reading offline jobs cache: {e}")
+            return
+        for job in seed:
+            self._upsert(_normalize(job))
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        self._upsert(_normalize(json.loads(line)))
+                    except json.JSONDecodeError:
+                        continue  # a torn last line from an interrupted write
+        except FileNotFoundError:
+            pass
+
+    def _upsert(self, job: Dict[str, Any]) -> bool:
+        """Insert or replace a job; returns False if an identical record is already indexed."""
+        key = _job_key(job)
+        job_id = self._ids.get(key)
+        skills = frozenset().union(*map(_tokens, job["matched_skills"]))
+        arrays = self._arrays
+
+        if job_id is not None:
+            if self.jobs[job_id] == job:
+                return False
+            # Title and location are part of the key, so only skill postings can change
+            for token in self._job_skills[job_id] - skills:
+                self._skill_index[token].discard(job_id)
+                arrays.pop((id(self._skill_index), token), None)
+            self.jobs[job_id] = job
+        else:
+            job_id = len(self.jobs)
+            self._ids[key] = job_id
+            self.jobs.append(job)
+            self._job_skills.append(skills)
+            for index, field in ((self._title_index, "title"), (self._location_index, "location")):
+                for token in _tokens(job[field]):
+                    index.setdefault(token, set()).add(job_id)
+                    if arrays:
+                        arrays.pop((id(index), token), None)
+
+        for token in skills:
+            self._skill_index.setdefault(token, set()).add(job_id)
+            if arrays:
+                arrays.pop((id(self._skill_index), token), None)
+        self._job_skills[job_id] = skills
+        return True
+
+    def add_jobs(self, jobs: Iterable[Dict[str, Any]]) -> int:
+        """Index jobs returned by the API and append new or changed ones to the write-back log."""
+        self.ensure_loaded()
+        with self._lock:
+            changed = [job for job in map(_normalize, jobs) if self._upsert(job)]
+            if not changed:
+                return 0
+            directory = os.path.dirname(self.cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.cache_path, "a") as f:
+                f.write("".join(json.dumps(job) + "\n" for job in changed))
+            # Our own append is already indexed; do not treat it as an outside change
+            self._signature = self._file_signature()
+            return len(changed)
+
+    def _postings(self, index: Dict[str, Set[int]], token: str) -> Optional[np.ndarray]:
+        postings = index.get(token)
+        if not postings:
+            return None
+        key = (id(index), token)
+        array = self._arrays.get(key)
+        if array is None:
+            array = self._arrays[key] = np.fromiter(postings, dtype=np.int64, count=len(postings))
+        return array
+
+    def search(self, role: str, location: str = None, limit: int = 5) -> List[Dict[str, Any]]:
+        """Return up to `limit` jobs ranked by role match, with matching locations first.
+
+        Role tokens are scored against titles and skills, weighted by rarity.
+        An empty role or "any" matches every job. Ties go to the most recently
+        added job.
+        """
+        self.ensure_loaded()
+        role_tokens = _tokens(role) if role and role.lower() != "any" else frozenset()
+        location_tokens = _tokens(location or "")
+
+        with self._lock:
+            n_jobs = len(self.jobs)
+            if not n_jobs or limit <= 0:
+                return []
+            scores = np.zeros(n_jobs, dtype=np.float64)
+            for token in role_tokens:
+                for index, weight in ((self._title_index, TITLE_WEIGHT), (self._skill_index, SKILL_WEIGHT)):
+                    postings = self._postings(index, token)
+                    if postings is not None:
+                        scores[postings] += weight * math.log(1 + n_jobs / (1 + len(postings)))
+
+            candidates = np.flatnonzero(scores) if role_tokens else np.arange(n_jobs)
+            if not len(candidates):
+                return []
+
+            for token in location_tokens:
+                postings = self._postings(self._location_index, token)
+                if postings is not None:
+                    matched = postings[scores[postings] > 0] if role_tokens else postings
+                    scores[matched] += LOCATION_WEIGHT / len(location_tokens)
+
+            candidate_scores = scores[candidates]
+            if len(candidates) > limit:
+                # Keep everything above the limit-th best score, then the newest of the ties
+                kth = np.partition(candidate_scores, len(candidates) - limit)[len(candidates) - limit]
+                above = candidates[candidate_scores > kth]
+                tied = candidates[candidate_scores == kth]
+                candidates = np.concatenate([above, tied[len(tied) - (limit - len(above)):]])
+            order = np.lexsort((-candidates, -scores[candidates]))
+            return [self.jobs[job_id] for job_id in candidates[order]]
+
+
+# Shared by every request in the process
+offline_catalog = JobCatalog()
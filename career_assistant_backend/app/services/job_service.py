@@ -1,16 +1,61 @@
-import requests
+import os
+
+import httpx
+
+from app.services.job_cache import JobSearchCache, normalize_job_query
+from app.services.job_catalog import offline_catalog
+from app.utils.concurrency import run_blocking
+from app.utils.metrics import metrics
 
 # ✅ Your Adzuna credentials
-ADZUNA_APP_ID = "9de4b82d"
-ADZUNA_APP_KEY = "731f10318302f79cc2b5c6d56fa62c1c"
+ADZUNA_APP_ID = os.getenv("ADZUNA_APP_ID", "9de4b82d")
+ADZUNA_APP_KEY = os.getenv("ADZUNA_APP_KEY", "731f10318302f79cc2b5c6d56fa62c1c")
 
 # ✅ Base URL for India jobs (you can switch "in" → "us" / "gb" / etc.)
-ADZUNA_API_URL = "https://api.adzuna.com/v1/api/jobs/in/search/1"
+ADZUNA_API_URL = os.getenv("ADZUNA_API_URL", "https://api.adzuna.com/v1/api/jobs/in/search/1")
+
+# Shared connection pool; keep-alive avoids a TCP + TLS handshake per search
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+HTTP_TIMEOUT = httpx.Timeout(8.0)
+
+_http_client: httpx.AsyncClient | None = None
+
+# Shared by every job search in the process; configured from JOB_CACHE_* variables
+job_cache = JobSearchCache.from_env()
 
 
-def search_jobs_adzuna(role: str, location: str = "India", results_per_page: int = 5):
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide async HTTP client, created on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def search_jobs_adzuna(role: str, location: str = "India", results_per_page: int = 5):
+    """
+    Search jobs for a role and location, served from the job cache when possible.
+    Returns an empty list when the provider cannot be reached; that failure is not cached.
+    """
+    key = normalize_job_query(role, location, results_per_page)
+    try:
+        return await job_cache.get(key, lambda: fetch_jobs_adzuna(role, location, results_per_page))
+    except Exception:
+        # Already logged and counted by fetch_jobs_adzuna
+        return []
+
+
+async def fetch_jobs_adzuna(role: str, location: str = "India", results_per_page: int = 5):
     """
     Fetch jobs from Adzuna API for a given role and location.
+    Raises on request or parsing errors so they are never mistaken for "no jobs".
     """
 
     params = {
@@ -23,8 +68,8 @@ def search_jobs_adzuna(role: str, location: str = "India", results_per_page: int
     }
 
     try:
-        print(f"🌍 Calling Adzuna API with params: {params}")
-        r = requests.get(ADZUNA_API_URL, params=params, timeout=8)
+        print(f"🌍 Calling Adzuna API for role='{role}', location='{location}'")
+        r = await get_http_client().get(ADZUNA_API_URL, params=params)
 
         # Check for errors
         r.raise_for_status()
@@ -42,13 +87,21 @@ def search_jobs_adzuna(role: str, location: str = "India", results_per_page: int
                 "url": j.get("redirect_url", "#")
             })
 
-        print(f"✅ Parsed {len(jobs)} jobs")
-        return jobs
-
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print("❌ Request error:", str(e))
-        return []
+        metrics.inc("upstream_errors_total", upstream="adzuna")
+        raise
 
     except Exception as e:
         print("❌ Unexpected error:", str(e))
-        return []
+        metrics.inc("upstream_errors_total", upstream="adzuna")
+        raise
+
+    print(f"✅ Parsed {len(jobs)} jobs")
+    if jobs:
+        # Keep the offline catalog warm for when the provider is unreachable
+        try:
+            await run_blocking(offline_catalog.add_jobs, jobs)
+        except OSError as e:
+            print(f"⚠️ Could not write jobs to the offline catalog: {e}")
+    return jobs
@@ -0,0 +1,119 @@
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from langchain.memory.prompt import SUMMARY_PROMPT
+
+from app.database import SessionLocal
+from app.rag.vectorstore import get_llm
+from app.models.chat_history import ChatHistory
+from app.models.conversation_summary import ConversationSummary
+from app.services.chat_services import MESSAGE_COLUMNS
+from app.services.history_writer import MessageRow, history_writer, merge_pending
+
+__all__ = [
+    "RECENT_MESSAGES",
+    "get_conversation_context",
+    "update_summary",
+    "update_summary_in_background",
+    "clear_summary",
+]
+
+# Raw messages kept verbatim after the summary (three user/assistant turns)
+RECENT_MESSAGES = 6
+# Upper bound on unsummarized messages loaded if summarization falls behind
+MAX_UNSUMMARIZED = 4 * RECENT_MESSAGES
+
+
+def _get_summary(db: Session, session_id: str) -> ConversationSummary | None:
+    return db.query(ConversationSummary).filter(ConversationSummary.session_id == session_id).first()
+
+
+def get_conversation_context(db: Session, session_id: str) -> tuple[str, list[MessageRow]]:
+    """Return the stored summary and the messages not yet folded into it, oldest first.
+
+    Includes messages still queued in the history writer.
+    """
+    pending = history_writer.pending(session_id)
+    record = _get_summary(db, session_id)
+    summary = record.summary if record else ""
+    summarized_through = record.summarized_through if record else 0
+
+    recent = [MessageRow._make(row) for row in db.execute(
+        select(*MESSAGE_COLUMNS)
+        .where(ChatHistory.session_id == session_id, ChatHistory.id > summarized_through)
+        .order_by(ChatHistory.id.desc())
+        .limit(MAX_UNSUMMARIZED)
+    ).all()]
+    recent.reverse()
+    return summary, merge_pending(recent, pending)
+
+
+def update_summary(db: Session, session_id: str, llm) -> bool:
+    """Fold messages that have left the recent window into the stored summary.
+
+    Only the new messages are sent to the LLM, so the cost of an update does
+    not grow with the length of the conversation. Returns True if the summary
+    changed.
+    """
+    record = _get_summary(db, session_id)
+    summary = record.summary if record else ""
+    summarized_through = record.summarized_through if record else 0
+
+    pending = db.execute(
+        select(*MESSAGE_COLUMNS)
+        .where(ChatHistory.session_id == session_id, ChatHistory.id > summarized_through)
+        .order_by(ChatHistory.id.asc())
+    ).all()
+    to_fold = pending[:-RECENT_MESSAGES]
+    if not to_fold:
+        return False
+
+    new_lines = "\n".join(
+        f"{'Human' if str(m.role) == 'user' else 'AI'}: {m.message}" for m in to_fold
+    )
+    result = llm.invoke(SUMMARY_PROMPT.format(summary=summary, new_lines=new_lines))
+    new_summary = str(getattr(result, "content", result)).strip()
+    new_through = to_fold[-1].id
+
+    # Conditional write, so concurrent updates never fold the same messages twice
+    try:
+        if record is None:
+            db.add(ConversationSummary(
+                session_id=session_id, summary=new_summary, summarized_through=new_through
+            ))
+            db.commit()
+            return True
+        updated = (
+            db.query(ConversationSummary)
+            .filter(
+                ConversationSummary.session_id == session_id,
+                ConversationSummary.summarized_through == summarized_through,
+            )
+            .update({"summary": new_summary, "summarized_through": new_through}, synchronize_session=False)
+        )
+        db.commit()
+        return bool(updated)
+    except IntegrityError:
+        db.rollback()
+        return False
+
+
+def update_summary_in_background(session_id: str, llm=None) -> None:
+    """update_summary with its own DB session, for use as a FastAPI background task."""
+    db = SessionLocal()
+    try:
+        update_summary(db, session_id, llm or get_llm())
+    except Exception as e:
+        print(f"⚠️ Failed to update conversation summary for {session_id}: {e}")
+    finally:
+        db.close()
+
+
+def clear_summary(db: Session, session_id: str) -> int:
+    deleted = (
+        db.query(ConversationSummary)
+        .filter(ConversationSummary.session_id == session_id)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
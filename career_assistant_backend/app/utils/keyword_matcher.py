@@ -0,0 +1,43 @@
+"""
+Single-pass keyword matching for intent and preference detection
+"""
+
+import re
+from typing import Dict, Iterable, Set
+
+
+class KeywordMatcher:
+    """Find labelled keywords in text with one compiled regex.
+
+    Keywords match whole words only ("hi" does not match "hiring") and are
+    case-insensitive, so inflected forms ("worked", "working") have to be
+    listed. Matches may overlap; at any one position the longest keyword
+    wins. Shared by the backend and the root app.
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable[str]]):
+        self._labels: Dict[str, Set[str]] = {}  # keyword -> labels
+        for label, phrases in keywords.items():
+            for phrase in phrases:
+                self._labels.setdefault(phrase.lower(), set()).add(label)
+
+        # Without keywords nothing matches; an empty alternation would match everywhere
+        self._pattern = None
+        phrases = sorted((phrase for phrase in self._labels if phrase), key=len, reverse=True)
+        if phrases:
+            alternation = "|".join(re.escape(phrase) for phrase in phrases)
+            # The lookahead lets the scan find matches that overlap a previous one
+            self._pattern = re.compile(rf"(?=(?<!\w)({alternation})(?!\w))")
+
+    def matches(self, text: str) -> Set[str]:
+        """Return the labels of every keyword found in text"""
+        labels: Set[str] = set()
+        if not text or self._pattern is None:
+            return labels
+        for match in self._pattern.finditer(text.lower()):
+            labels |= self._labels[match.group(1)]
+        return labels
+
+    def search(self, text: str) -> bool:
+        """Return True if any keyword occurs in text"""
+        return bool(text) and self._pattern is not None and self._pattern.search(text.lower()) is not None
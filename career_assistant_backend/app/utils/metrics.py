@@ -0,0 +1,181 @@
+"""
+In-process latency histograms and counters in the Prometheus text format
+Stages of a request are timed with `metrics.span(route, stage)`; the
+registry is rendered by a /metrics endpoint
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds in seconds, from a fast cache hit to a slow LLM completion
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Counters a cache's stats() may report, exported as cache_events_total{cache, event}
+CACHE_EVENTS = ("hits", "stale_hits", "negative_hits", "misses", "coalesced", "refreshes",
+                "evictions", "skipped", "invalidations")
+
+Labels = Tuple[Tuple[str, str], ...]
+# A collector returns (metric name, labels, value) samples when the registry is rendered
+Collector = Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * (n_buckets + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """Stage-latency histograms and labelled counters kept in process memory.
+
+    Recording a sample is a bisect and three additions under a lock, cheap
+    enough to wrap every stage of every request.
+    """
+
+    def __init__(self, namespace: str = "career_assistant", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], _Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._collectors: List[Collector] = []
+
+    def observe(self, route: str, stage: str, seconds: float):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get((route, stage))
+            if histogram is None:
+                histogram = self._histograms[(route, stage)] = _Histogram(len(self.buckets))
+            histogram.counts[index] += 1
+            histogram.total += seconds
+            histogram.count += 1
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    @contextmanager
+    def span(self, route: str, stage: str, upstream: Optional[str] = None):
+        """Time a block as one stage of a route; errors are counted, and re-raised.
+
+        With `upstream`, an error also counts as a failure of that external service.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("stage_errors_total", route=route, stage=stage)
+            if upstream:
+                self.inc("upstream_errors_total", upstream=upstream)
+            raise
+        finally:
+            self.observe(route, stage, time.perf_counter() - start)
+
+    def register_collector(self, collector: Collector):
+        """Add samples computed at render time, e.g. from a component's own stats."""
+        self._collectors.append(collector)
+
+    def register_cache(self, cache: str, stats: Callable[[], Dict]):
+        """Export a cache's stats() as cache_events_total and cache_entries."""
+        def collect():
+            current = stats()
+            for event in CACHE_EVENTS:
+                if event in current:
+                    yield "cache_events_total", {"cache": cache, "event": event}, current[event]
+            if "size" in current:
+                yield "cache_entries", {"cache": cache}, current["size"]
+        self.register_collector(collect)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        ns = self.namespace
+        lines: List[str] = []
+        with self._lock:
+            histograms = sorted(
+                (key, list(h.counts), h.total, h.count) for key, h in self._histograms.items()
+            )
+            counters = sorted(self._counters.items())
+
+        name = f"{ns}_stage_duration_seconds"
+        lines += [f"# HELP {name} Time spent in each stage of a request.", f"# TYPE {name} histogram"]
+        for (route, stage), counts, total, count in histograms:
+            base = (("route", route), ("stage", stage))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(base + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(base)} {total}")
+            lines.append(f"{name}_count{_format_labels(base)} {count}")
+
+        samples: Dict[str, List[Tuple[Labels, float]]] = {}
+        for (counter, labels), value in counters:
+            samples.setdefault(counter, []).append((labels, value))
+        for collector in self._collectors:
+            try:
+                for sample_name, labels, value in collector():
+                    samples.setdefault(sample_name, []).append((tuple(sorted(labels.items())), value))
+            except Exception as e:
+                print(f"⚠️ Metrics collector failed: {e}")
+
+        for sample_name in sorted(samples):
+            full_name = f"{ns}_{sample_name}"
+            kind = "counter" if sample_name.endswith("_total") else "gauge"
+            lines.append(f"# TYPE {full_name} {kind}")
+            for labels, value in samples[sample_name]:
+                lines.append(f"{full_name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing whole requests as the "total" stage of their route.
+
+    The route label is the matched path template (/query/history/{session_id}),
+    so label cardinality stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app, registry: "MetricsRegistry" = None):
+        self.app = app
+        self.registry = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.registry.observe(route, "total", time.perf_counter() - start)
+            self.registry.inc("http_requests_total", route=route, method=scope["method"], status=str(status))
+
+
+# Shared by every module of the process
+metrics = MetricsRegistry()
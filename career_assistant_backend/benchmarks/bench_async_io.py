@@ -0,0 +1,142 @@
+"""
+Concurrency of the /job/jobs/search endpoint against a slow job provider
+Runs a local stub of the Adzuna API that answers after a fixed delay, then
+fires concurrent requests at the app, once through the async httpx client and
+once through the previous blocking `requests.get` implementation. Also
+reports the worst event-loop stall seen while each run was in flight.
+
+Usage: python benchmarks/bench_async_io.py [--requests N] [--delay SECONDS]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STUB_JOBS = {
+    "results": [
+        {
+            "title": f"Cloud Engineer {i}",
+            "company": {"display_name": "Stub Corp"},
+            "location": {"display_name": "Bangalore"},
+            "salary_min": 1000000,
+            "salary_max": 2000000,
+            "redirect_url": "https://example.com/job",
+        }
+        for i in range(5)
+    ]
+}
+
+
+def start_stub_adzuna(delay: float) -> ThreadingHTTPServer:
+    body = json.dumps(STUB_JOBS).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def blocking_app():
+    """The endpoint as it was before: async def calling the blocking requests client"""
+    import requests
+    from fastapi import FastAPI
+    from app.routers.job import JobSearchRequest
+    from app.services import job_service
+
+    app = FastAPI()
+
+    @app.post("/job/jobs/search")
+    async def search_jobs(request: JobSearchRequest):
+        r = requests.get(job_service.ADZUNA_API_URL, params={"what": request.role}, timeout=8)
+        return {"results": r.json().get("results", [])}
+
+    return app
+
+
+async def run(app, n_requests: int):
+    """Return (wall seconds, worst event-loop stall seconds) for n concurrent requests"""
+    import httpx
+
+    stall = 0.0
+    done = asyncio.Event()
+
+    async def heartbeat():
+        nonlocal stall
+        interval = 0.005
+        while not done.is_set():
+            before = time.perf_counter()
+            await asyncio.sleep(interval)
+            stall = max(stall, time.perf_counter() - before - interval)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm up: lazy imports and the pooled client's setup are not what is measured
+        await client.post("/job/jobs/search", json={"role": "warmup"})
+        monitor = asyncio.create_task(heartbeat())
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            # Distinct roles, so the job cache does not answer for the provider
+            client.post("/job/jobs/search", json={"role": f"cloud engineer {i}", "location": "Bangalore"})
+            for i in range(n_requests)
+        ])
+        elapsed = time.perf_counter() - start
+        done.set()
+        await monitor
+
+    assert all(r.status_code == 200 and len(r.json()["results"]) == 5 for r in responses)
+    return elapsed, stall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.2, help="stub provider latency in seconds")
+    args = parser.parse_args()
+
+    server = start_stub_adzuna(args.delay)
+    os.environ["ADZUNA_API_URL"] = f"http://127.0.0.1:{server.server_port}/v1/api/jobs/in/search/1"
+    # Stub results must not land in the real offline catalog
+    os.environ["CACHED_JOBS_PATH"] = os.path.join(tempfile.mkdtemp(), "cached_jobs.jsonl")
+
+    from app.main import app
+    from app.services.job_service import close_http_client
+
+    async def bench():
+        blocking = await run(blocking_app(), args.requests)
+        non_blocking = await run(app, args.requests)
+        await close_http_client()
+        return blocking, non_blocking
+
+    (b_time, b_stall), (a_time, a_stall) = asyncio.run(bench())
+    server.shutdown()
+
+    print(f"requests={args.requests} provider latency={args.delay * 1000:.0f} ms")
+    print(f"blocking requests.get : {b_time:7.2f} s  {args.requests / b_time:8.1f} req/s  worst loop stall {b_stall * 1000:7.1f} ms")
+    print(f"async httpx client    : {a_time:7.2f} s  {args.requests / a_time:8.1f} req/s  worst loop stall {a_stall * 1000:7.1f} ms")
+    print(f"speedup               : {b_time / a_time:7.1f} x")
+
+
+if __name__ == "__main__":
+    main()
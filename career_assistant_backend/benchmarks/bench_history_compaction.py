@@ -0,0 +1,127 @@
+"""
+Hot chat_history size and read latency before and after compaction
+Fills a scratch SQLite database with synthetic conversations, measures the
+live table and the history reads, runs compact_history, and measures again,
+including reads that page back into the compressed archive.
+
+Usage: python benchmarks/bench_history_compaction.py [--sessions N] [--messages M] [--keep K]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.database import Base  # noqa: E402
+from app.models.chat_archive import ChatHistoryArchive  # noqa: E402
+from app.models.chat_history import ChatHistory  # noqa: E402
+from app.services import chat_services  # noqa: E402
+from app.services.history_archive import compact_history  # noqa: E402
+
+WORDS = ("resume interview salary offer skills python cloud manager remote team growth "
+         "negotiate network project experience role company feedback learning").split()
+
+
+def populate(engine, sessions: int, messages: int):
+    rng = random.Random(3)
+    start = datetime(2026, 1, 1)
+    rows = []
+    for s in range(sessions):
+        for m in range(messages):
+            rows.append({
+                "session_id": f"session-{s}",
+                "role": "user" if m % 2 == 0 else "assistant",
+                "message": " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 60))),
+                "timestamp": start + timedelta(minutes=m, seconds=s),
+            })
+    with engine.begin() as conn:
+        conn.execute(insert(ChatHistory), rows)
+
+
+def table_bytes(engine, table: str) -> int:
+    """Bytes used by a table and its indexes, from the dbstat virtual table"""
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT COALESCE(SUM(pgsize), 0) FROM dbstat "
+            "WHERE name = :table OR name IN (SELECT name FROM sqlite_master WHERE tbl_name = :table)"
+        ), {"table": table}).scalar()
+
+
+def timed(fn, repeats: int) -> float:
+    """Mean milliseconds per call"""
+    start = time.perf_counter()
+    for i in range(repeats):
+        fn(i)
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def measure(engine, Session, sessions: int, repeats: int) -> dict:
+    db = Session()
+    rng = random.Random(5)
+    session_ids = [f"session-{rng.randrange(sessions)}" for _ in range(repeats)]
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT COUNT(*) FROM chat_history")).scalar()
+
+    def deep_page(i):
+        # Walk five pages back from the newest message
+        cursor = None
+        for _ in range(5):
+            _, cursor = chat_services.get_messages_page(db, session_ids[i], 20, cursor)
+            if cursor is None:
+                break
+
+    result = {
+        "hot rows": rows,
+        "hot table MB": table_bytes(engine, "chat_history") / 1e6,
+        "archive MB": table_bytes(engine, "chat_history_archive") / 1e6,
+        "recent 20 ms": timed(lambda i: chat_services.get_recent_messages(db, session_ids[i], 20), repeats),
+        "5 pages back ms": timed(deep_page, repeats),
+        "full history ms": timed(lambda i: chat_services.get_messages(db, session_ids[i]), max(repeats // 10, 1)),
+    }
+    db.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--messages", type=int, default=300, help="messages per session")
+    parser.add_argument("--keep", type=int, default=50, help="newest messages kept live per session")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_history.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine, tables=[ChatHistory.__table__, ChatHistoryArchive.__table__])
+    Session = sessionmaker(bind=engine)
+    populate(engine, args.sessions, args.messages)
+
+    before = measure(engine, Session, args.sessions, args.repeats)
+
+    db = Session()
+    start = time.perf_counter()
+    stats = compact_history(db, retention_days=3650, keep_recent=args.keep, now=datetime(2026, 2, 1))
+    compaction_s = time.perf_counter() - start
+    db.close()
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+
+    after = measure(engine, Session, args.sessions, args.repeats)
+
+    print(f"sessions={args.sessions} messages/session={args.messages} keep={args.keep}")
+    print(f"compaction: {stats['archived_messages']} messages archived in {compaction_s:.2f} s")
+    print(f"{'':18}{'before':>12}{'after':>12}")
+    for key in before:
+        print(f"{key:18}{before[key]:12.2f}{after[key]:12.2f}")
+
+
+if __name__ == "__main__":
+    main()
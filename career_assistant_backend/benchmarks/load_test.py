@@ -0,0 +1,396 @@
+"""
+Open-loop load test of the apps against local OpenAI and Adzuna stand-ins
+Starts the stub upstreams from stubs.py, prepares a scratch working directory
+(SQLite database and a vectorstore embedded by the stub), serves the app
+there with uvicorn, and sends a weighted mix of requests at a target rate.
+Latency is measured from each request's scheduled send time, so a server
+that falls behind is charged for the queueing it causes. Reports p50, p95,
+p99 latency and throughput per route, the per-stage means scraped from
+/metrics, and writes everything as JSON; --compare prints the change
+against an earlier result file.
+
+Usage: python benchmarks/load_test.py [--target backend|simple] [--rps R] [--duration S]
+                                      [--mix query=4,chat=2,jobs=2] [--output PATH] [--compare OLD.json]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from stubs import add_stub_arguments, stubs_from_args  # noqa: E402
+
+TOPICS = ("resume", "interview", "salary negotiation", "career change", "networking", "cover letter",
+          "python developer", "data analyst", "cloud engineer", "product manager", "remote work", "internship")
+ROLES = ("python developer", "data analyst", "cloud engineer", "frontend developer", "devops engineer")
+CITIES = ("Bangalore", "Pune", "Hyderabad", "Chennai", "Delhi")
+QUESTION_TEMPLATES = ("How do I improve my {}?", "What are good tips for {}?",
+                      "Can you give me advice on {}?", "What should I know about {}?")
+
+
+class Scenario(NamedTuple):
+    method: str
+    path: str
+    payload: Callable[[random.Random], Optional[dict]]
+
+
+def _question(rng: random.Random) -> str:
+    # A small pool, so repeated and near-duplicate questions occur as they do in real traffic
+    return rng.choice(QUESTION_TEMPLATES).format(rng.choice(TOPICS))
+
+
+SCENARIOS: Dict[str, Dict[str, Scenario]] = {
+    "backend": {
+        "query": Scenario("POST", "/query/query", lambda rng: {
+            "question": _question(rng), "session_id": f"load-{rng.randrange(50)}"}),
+        "query_jobs": Scenario("POST", "/query/query", lambda rng: {
+            "question": f"jobs for {rng.choice(ROLES)} in {rng.choice(CITIES)}", "session_id": f"load-{rng.randrange(50)}"}),
+        "chat": Scenario("POST", "/chat/", lambda rng: {"question": _question(rng)}),
+        "jobs": Scenario("POST", "/job/jobs/search", lambda rng: {
+            "role": rng.choice(ROLES), "location": rng.choice(CITIES), "results_per_page": 5}),
+    },
+    "simple": {
+        "chatbot": Scenario("POST", "/chatbot/message", lambda rng: {
+            "message": rng.choice(("hi", "show me jobs", "thanks", "what is cloud computing?"))}),
+        "jobs_search": Scenario("POST", "/jobs/search", lambda rng: {"query": rng.choice(("cloud", "python", "data"))}),
+        "jobs_available": Scenario("GET", "/jobs/available", lambda rng: None),
+    },
+}
+DEFAULT_MIX = {"backend": "query=4,query_jobs=1,chat=2,jobs=2", "simple": "chatbot=2,jobs_search=1,jobs_available=1"}
+
+
+class Sample(NamedTuple):
+    scenario: str
+    latency: float  # seconds from scheduled send to response
+    status: Optional[int]  # None when the request raised
+
+
+def parse_mix(mix: str, target: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS[target]:
+            raise SystemExit(f"Unknown scenario {name!r} for {target}; choose from {', '.join(SCENARIOS[target])}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def _corpus(paragraphs: int = 400) -> str:
+    """Synthetic career-advice text for the vectorstore"""
+    rng = random.Random(11)
+    verbs = ("highlight", "quantify", "practice", "research", "tailor", "negotiate", "prepare", "review")
+    return "\n\n".join(
+        f"{topic.title()} advice {i}: {rng.choice(verbs)} your {rng.choice(TOPICS)} before applying for "
+        f"{rng.choice(ROLES)} roles in {rng.choice(CITIES)}. " * 4
+        for i, topic in ((i, rng.choice(TOPICS)) for i in range(paragraphs))
+    )
+
+
+def prepare_workdir(workdir: str, env: Dict[str, str]):
+    """Create the database and build a vectorstore through the stub embeddings, in a child process."""
+    script = (
+        "import create_db\n"
+        "from app.rag.vectorstore import build_vectorstore_from_text\n"
+        "import sys\n"
+        "build_vectorstore_from_text(sys.stdin.read())\n"
+    )
+    subprocess.run([sys.executable, "-c", script], input=_corpus(), text=True, cwd=workdir, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(target: str, workdir: str, env: Dict[str, str], workers: int) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    module = "app.main:app" if target == "backend" else "simple_backend:app"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 180
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"Server exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{url}/ping", timeout=1).status_code == 200:
+                return server, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    server.terminate()
+    raise SystemExit("Server did not become ready")
+
+
+async def drive(client: httpx.AsyncClient, scenarios: Dict[str, Scenario], weights: Dict[str, float],
+                rps: float, duration: float, poisson: bool, max_inflight: int,
+                rng: random.Random) -> Tuple[List[Sample], Dict[str, int], float]:
+    """Send requests at `rps` for `duration` seconds; (samples, dropped per scenario, elapsed seconds)"""
+    loop = asyncio.get_running_loop()
+    names, mix = list(weights), list(weights.values())
+    samples: List[Sample] = []
+    dropped: Dict[str, int] = defaultdict(int)
+    inflight = 0
+    tasks = []
+
+    async def one(name: str, scheduled: float, payload: Optional[dict]):
+        nonlocal inflight
+        scenario = scenarios[name]
+        try:
+            response = await client.request(scenario.method, scenario.path, json=payload)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = None
+        finally:
+            inflight -= 1
+        samples.append(Sample(name, loop.time() - scheduled, status))
+
+    start = loop.time()
+    offset = 0.0
+    while offset < duration:
+        scheduled = start + offset
+        await asyncio.sleep(max(0.0, scheduled - loop.time()))
+        name = rng.choices(names, mix)[0]
+        if inflight >= max_inflight:
+            dropped[name] += 1
+        else:
+            inflight += 1
+            tasks.append(asyncio.create_task(one(name, scheduled, scenarios[name].payload(rng))))
+        offset += rng.expovariate(rps) if poisson else 1.0 / rps
+    await asyncio.gather(*tasks)
+    return samples, dict(dropped), loop.time() - start
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile; None without samples"""
+    if not sorted_values:
+        return None
+    return round(sorted_values[max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)], 2)
+
+
+def summarize(samples: List[Sample], dropped: Dict[str, int], elapsed: float,
+              scenarios: Dict[str, Scenario]) -> Dict[str, Dict]:
+    groups: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in samples:
+        groups[sample.scenario].append(sample)
+        groups["all"].append(sample)
+
+    routes = {}
+    for name in sorted(groups, key=lambda n: (n == "all", n)):
+        group = groups[name]
+        ok = [s.latency * 1000 for s in group if s.status is not None and 200 <= s.status < 300]
+        ok.sort()
+        errors = len(group) - len(ok)
+        routes[name] = {
+            "route": "*" if name == "all" else f"{scenarios[name].method} {scenarios[name].path}",
+            "requests": len(group),
+            "errors": errors,
+            "dropped": sum(dropped.values()) if name == "all" else dropped.get(name, 0),
+            "error_rate": round(errors / len(group), 4) if group else 0.0,
+            "throughput_rps": round(len(ok) / elapsed, 2),
+            "latency_ms": {
+                "p50": percentile(ok, 50),
+                "p95": percentile(ok, 95),
+                "p99": percentile(ok, 99),
+                "max": percentile(ok, 100),
+                "mean": round(sum(ok) / len(ok), 2) if ok else None,
+            },
+        }
+    return routes
+
+
+_STAGE_LINE = re.compile(r'^\w+_stage_duration_seconds_(sum|count)\{route="([^"]*)",stage="([^"]*)"\} (\S+)$')
+
+
+def scrape_stages(client_url: str) -> Dict[Tuple[str, str], List[float]]:
+    """(route, stage) -> [sum seconds, count] from the app's /metrics"""
+    try:
+        text = httpx.get(f"{client_url}/metrics", timeout=10).text
+    except httpx.HTTPError:
+        return {}
+    stages: Dict[Tuple[str, str], List[float]] = defaultdict(lambda: [0.0, 0.0])
+    for line in text.splitlines():
+        match = _STAGE_LINE.match(line)
+        if match:
+            kind, route, stage, value = match.groups()
+            stages[(route, stage)][0 if kind == "sum" else 1] = float(value)
+    return stages
+
+
+def stage_means(before: Dict, after: Dict) -> Dict[str, Dict[str, Dict]]:
+    """Per-stage request count and mean latency between two scrapes"""
+    result: Dict[str, Dict[str, Dict]] = defaultdict(dict)
+    for (route, stage), (total, count) in sorted(after.items()):
+        prev_total, prev_count = before.get((route, stage), (0.0, 0.0))
+        n = count - prev_count
+        if n > 0:
+            result[route][stage] = {"count": int(n), "mean_ms": round((total - prev_total) / n * 1000, 2)}
+    return dict(result)
+
+
+def _ms(value: Optional[float], width: int) -> str:
+    return f"{value:{width}.1f}" if value is not None else f"{'-':>{width}}"
+
+
+def print_report(result: Dict):
+    config = result["config"]
+    print(f"target={config['target']} rps={config['rps']} duration={config['duration_s']}s "
+          f"arrival={config['arrival']} openai={config['stubs']['openai']['latency']} "
+          f"adzuna={config['stubs']['adzuna']['latency']}")
+    print(f"{'route':16}{'reqs':>7}{'errors':>8}{'drop':>6}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, route in result["routes"].items():
+        latency = route["latency_ms"]
+        print(f"{name:16}{route['requests']:7}{route['errors']:8}{route['dropped']:6}{route['throughput_rps']:8.1f}"
+              f"{_ms(latency['p50'], 10)}{_ms(latency['p95'], 10)}{_ms(latency['p99'], 10)}")
+    if result["stages"]:
+        print("\nmean ms per stage (from /metrics)")
+        for route, stages in result["stages"].items():
+            print(f"  {route}: " + ", ".join(f"{stage} {s['mean_ms']:.1f}" for stage, s in stages.items()))
+
+
+def print_comparison(baseline: Dict, result: Dict):
+    print(f"\nchange against {baseline['config'].get('started_at', 'baseline')}")
+    print(f"{'route':16}{'metric':>10}{'before':>11}{'after':>11}{'change':>9}")
+    for name, route in result["routes"].items():
+        old = baseline["routes"].get(name)
+        if old is None:
+            continue
+        rows = [(k, old["latency_ms"][k], route["latency_ms"][k]) for k in ("p50", "p95", "p99")]
+        rows.append(("rps", old["throughput_rps"], route["throughput_rps"]))
+        for metric, before, after in rows:
+            change = f"{(after - before) / before * 100:+.1f}%" if before and after is not None else "n/a"
+            print(f"{name:16}{metric:>10}{_ms(before, 11)}{_ms(after, 11)}{change:>9}")
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", choices=sorted(SCENARIOS), default="backend")
+    parser.add_argument("--url", help="load an already running server instead of starting one")
+    parser.add_argument("--rps", type=float, default=20.0, help="offered requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before the run")
+    parser.add_argument("--arrival", choices=("poisson", "constant"), default="poisson")
+    parser.add_argument("--mix", help="scenario=weight list (default: %s)" % "; ".join(
+        f"{t}: {m}" for t, m in DEFAULT_MIX.items()))
+    parser.add_argument("--max-inflight", type=int, default=256, help="requests beyond this are dropped")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result JSON path (default: benchmarks/results/load_<target>_<time>.json)")
+    parser.add_argument("--compare", help="earlier result JSON to compare against")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = SCENARIOS[args.target]
+    weights = parse_mix(args.mix or DEFAULT_MIX[args.target], args.target)
+    stubs = stubs_from_args(args).start()
+    server = None
+    started_at = datetime.now()
+    try:
+        if args.url:
+            url = args.url.rstrip("/")
+            print("Point the server at the stubs with:\n" + "\n".join(f"  {k}={v}" for k, v in stubs.env().items()))
+        else:
+            workdir = tempfile.mkdtemp(prefix="career-load-")
+            env = {
+                **os.environ,
+                **stubs.env(),
+                "PYTHONPATH": BACKEND_DIR if args.target == "backend" else REPO_DIR,
+                # Stub jobs must not land in the real offline catalog
+                "CACHED_JOBS_PATH": os.path.join(workdir, "cached_jobs.jsonl"),
+                "HISTORY_COMPACTION_INTERVAL": "0",
+            }
+            if args.target == "backend":
+                print(f"Preparing {workdir} ...")
+                prepare_workdir(workdir, env)
+            server, url = start_server(args.target, workdir, env, args.workers)
+
+        async def run():
+            limits = httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight)
+            async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+                poisson = args.arrival == "poisson"
+                if args.warmup > 0:
+                    await drive(client, scenarios, weights, args.rps, args.warmup, poisson, args.max_inflight,
+                                random.Random(args.seed + 1))
+                before = await asyncio.to_thread(scrape_stages, url)
+                measured = await drive(client, scenarios, weights, args.rps, args.duration, poisson,
+                                       args.max_inflight, random.Random(args.seed))
+                after = await asyncio.to_thread(scrape_stages, url)
+            return measured, stage_means(before, after)
+
+        (samples, dropped, elapsed), stages = asyncio.run(run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        stubs.stop()
+
+    result = {
+        "config": {
+            "target": args.target,
+            "url": args.url,
+            "rps": args.rps,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "arrival": args.arrival,
+            "mix": weights,
+            "workers": args.workers,
+            "max_inflight": args.max_inflight,
+            "seed": args.seed,
+            "stubs": {"openai": stubs.openai.to_dict(), "adzuna": stubs.adzuna.to_dict()},
+            "git_revision": _git_revision(),
+            "started_at": started_at.isoformat(timespec="seconds"),
+        },
+        "elapsed_s": round(elapsed, 3),
+        "routes": summarize(samples, dropped, elapsed, scenarios),
+        # With several workers this is the scraped worker's share only
+        "stages": stages,
+        "upstream_calls": stubs.stats,
+    }
+
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"load_{args.target}_{started_at:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print_report(result)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), result)
+    print(f"\nSaved {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Local stand-ins for the OpenAI and Adzuna APIs
+Serves /v1/chat/completions, /v1/embeddings and the Adzuna search path from
+one threaded HTTP server, each answering after a delay drawn from a
+configurable distribution and failing at a configurable rate. Embeddings are
+deterministic hashed bags of words, so similar texts get similar vectors and
+retrieval behaves plausibly.
+
+Latency specs: fixed:MS, uniform:LOW_MS:HIGH_MS, normal:MEAN_MS:SD_MS,
+lognormal:MEDIAN_MS:SIGMA
+
+Usage: python benchmarks/stubs.py [--openai-latency SPEC] [--adzuna-latency SPEC] [--error-rate P]
+Prints the environment to point a manually started server at the stubs.
+"""
+
+import argparse
+import base64
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+EMBEDDING_DIM = 1536  # text-embedding-3-small
+_TOKEN = re.compile(r"\w+")
+
+
+class Latency:
+    """Delay distribution parsed from a spec like "lognormal:200:0.5"."""
+
+    def __init__(self, spec: str):
+        kind, *params = spec.split(":")
+        values = [float(p) for p in params]
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if expected.get(kind) != len(values):
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+        self.spec = spec
+        self.kind = kind
+        self.values = values
+
+    def sample(self, rng: random.Random) -> float:
+        """One delay in seconds."""
+        if self.kind == "fixed":
+            ms = self.values[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(*self.values)
+        elif self.kind == "normal":
+            ms = rng.gauss(*self.values)
+        else:
+            median, sigma = self.values
+            ms = rng.lognormvariate(math.log(median), sigma)
+        return max(ms, 0.0) / 1000
+
+
+class UpstreamConfig:
+    def __init__(self, latency: str, error_rate: float = 0.0, error_status: int = 500):
+        self.latency = Latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def to_dict(self) -> Dict:
+        return {"latency": self.latency.spec, "error_rate": self.error_rate, "error_status": self.error_status}
+
+
+def embed_text(text, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Unit vector of signed word hashes; token id lists are hashed the same way."""
+    tokens = [str(t) for t in text] if isinstance(text, list) else _TOKEN.findall(text.lower())
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in tokens:
+        h = zlib.crc32(token.encode("utf-8"))
+        vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    if not norm:
+        vector[0] = 1.0
+        return vector
+    return vector / norm
+
+
+def _stub_jobs(role: str, location: str, count: int):
+    return [
+        {
+            "title": f"{role.title() or 'Engineer'} {i + 1}",
+            "company": {"display_name": f"Stub Corp {i + 1}"},
+            "location": {"display_name": location or "India"},
+            "salary_min": 1000000 + 50000 * i,
+            "salary_max": 2000000 + 50000 * i,
+            "redirect_url": f"https://example.com/jobs/{i + 1}",
+        }
+        for i in range(count)
+    ]
+
+
+class StubUpstreams:
+    """One threaded server answering for OpenAI and Adzuna; see the module docstring."""
+
+    def __init__(self, openai: UpstreamConfig, adzuna: UpstreamConfig, port: int = 0,
+                 dim: int = EMBEDDING_DIM, seed: int = 7):
+        self.openai = openai
+        self.adzuna = adzuna
+        self.dim = dim
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {
+            name: {"requests": 0, "injected_errors": 0} for name in ("chat", "embeddings", "adzuna")
+        }
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_port
+
+    def env(self) -> Dict[str, str]:
+        """Environment pointing the apps at this server."""
+        base = f"http://127.0.0.1:{self.port}"
+        return {
+            "OPENAI_API_KEY": "stub-key",
+            "OPENAI_BASE_URL": f"{base}/v1",
+            "OPENAI_API_BASE": f"{base}/v1",
+            "ADZUNA_API_URL": f"{base}/v1/api/jobs/in/search/1",
+            # The stub takes raw text; client-side token counting needs tiktoken's downloaded encodings
+            "EMBEDDING_CHECK_CTX_LENGTH": "0",
+        }
+
+    def start(self) -> "StubUpstreams":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-upstreams", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _draw(self, config: UpstreamConfig):
+        """(delay seconds, whether to fail) for one request"""
+        with self._rng_lock:
+            return config.latency.sample(self._rng), self._rng.random() < config.error_rate
+
+    def _count(self, name: str, failed: bool):
+        with self._stats_lock:
+            self.stats[name]["requests"] += 1
+            self.stats[name]["injected_errors"] += int(failed)
+
+    def _chat(self, body: Dict) -> Dict:
+        messages = body.get("messages", [])
+        prompt = " ".join(str(m.get("content", "")) for m in messages)
+        question = str(messages[-1].get("content", "")) if messages else ""
+        answer = f"Stub answer for: {question[-200:]}"
+        prompt_tokens, completion_tokens = len(prompt.split()), len(answer.split())
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def _embeddings(self, body: Dict) -> Dict:
+        inputs = body.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        for i, text in enumerate(inputs):
+            vector = embed_text(text, self.dim)
+            embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode() if as_base64 else vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(t) if isinstance(t, list) else len(t.split()) for t in inputs)
+        return {"object": "list", "data": data, "model": body.get("model", "stub"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    def _handler(self):
+        stubs = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status: int, payload: Dict):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _serve(self, name: str, config: UpstreamConfig, respond):
+                delay, failed = stubs._draw(config)
+                stubs._count(name, failed)
+                time.sleep(delay)
+                if failed:
+                    self._reply(config.error_status, {"error": {"message": "Injected stub error",
+                                                                "type": "server_error"}})
+                else:
+                    self._reply(200, respond())
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                path = urlparse(self.path).path
+                if path.endswith("/chat/completions"):
+                    self._serve("chat", stubs.openai, lambda: stubs._chat(body))
+                elif path.endswith("/embeddings"):
+                    self._serve("embeddings", stubs.openai, lambda: stubs._embeddings(body))
+                else:
+                    self._reply(404, {"error": {"message": f"Unknown path {path}"}})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if "/jobs/" not in url.path:
+                    self._reply(404, {"error": {"message": f"Unknown path {url.path}"}})
+                    return
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                count = int(query.get("results_per_page", 5))
+                self._serve("adzuna", stubs.adzuna,
+                            lambda: {"results": _stub_jobs(query.get("what", ""), query.get("where", ""), count)})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--openai-latency", default="lognormal:400:0.4",
+                        help="chat and embedding latency spec (default: %(default)s)")
+    parser.add_argument("--adzuna-latency", default="lognormal:250:0.5",
+                        help="job search latency spec (default: %(default)s)")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--adzuna-error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected errors")
+
+
+def stubs_from_args(args, port: int = 0) -> StubUpstreams:
+    return StubUpstreams(
+        openai=UpstreamConfig(args.openai_latency, args.openai_error_rate, args.error_status),
+        adzuna=UpstreamConfig(args.adzuna_latency, args.adzuna_error_rate, args.error_status),
+        port=port,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_stub_arguments(parser)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    stubs = stubs_from_args(args, args.port).start()
+    print(f"Stub upstreams listening on 127.0.0.1:{stubs.port}; start the app with:")
+    for key, value in stubs.env().items():
+        print(f"export {key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stubs.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,13 @@ from app.models.user import User
 from app.models.resume import Resume
 from app.models.job_match import JobMatchResult  # ✅ must be imported
 from app.models.chat_history import ChatHistory
+from app.models.conversation_summary import ConversationSummary
+from app.models.chat_archive import ChatHistoryArchive
 
 print("Creating database tables...")
 Base.metadata.create_all(bind=engine)
+
+# create_all skips indexes added to tables that already exist
+for index in ChatHistory.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
 print(" Done! career.db should now exist.")
@@ -1,10 +1,12 @@
+import asyncio
+
 from app.services.job_service import search_jobs_adzuna
 
 if __name__ == "__main__":
     print("🔎 Testing Adzuna Job API...\n")
 
     # Example queries
-    jobs = search_jobs_adzuna("cloud engineer", "Bangalore", 3)
+    jobs = asyncio.run(search_jobs_adzuna("cloud engineer", "Bangalore", 3))
 
     if jobs:
         print(f"✅ Found {len(jobs)} jobs\n")
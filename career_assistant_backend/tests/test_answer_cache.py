@@ -0,0 +1,27 @@
+import numpy as np
+
+from app.services.answer_cache import SemanticAnswerCache
+
+
+def test_hits_on_similar_question_with_same_documents_only():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=2)
+    resume = np.array([1.0, 0.1, 0.0])
+    response = {"answer": "Keep it to one page.", "sources": ["guides / resume.pdf"]}
+    cache.store(resume, ("d1", "d2"), response, "v1")
+
+    near_duplicate = np.array([1.0, 0.15, 0.02])
+    assert cache.lookup(near_duplicate, ("d1", "d2"), "v1") == response
+    assert cache.lookup(near_duplicate, ("d1", "d3"), "v1") is None
+    assert cache.lookup(np.array([0.0, 1.0, 0.0]), ("d1", "d2"), "v1") is None
+
+    # Least recently used answers go first once the cache is full
+    cache.store(np.array([0.0, 1.0, 0.0]), ("d4",), {"answer": "b"}, "v1")
+    cache.lookup(resume, ("d1", "d2"), "v1")
+    cache.store(np.array([0.0, 0.0, 1.0]), ("d5",), {"answer": "c"}, "v1")
+    assert cache.lookup(np.array([0.0, 1.0, 0.0]), ("d4",), "v1") is None
+    assert cache.lookup(resume, ("d1", "d2"), "v1") == response
+
+    # A rebuilt vectorstore invalidates every answer
+    assert cache.lookup(resume, ("d1", "d2"), "v2") is None
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 3
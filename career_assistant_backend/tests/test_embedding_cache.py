@@ -0,0 +1,50 @@
+import asyncio
+
+from langchain_core.embeddings import Embeddings
+
+from app.rag.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text)), float(sum(map(ord, text)) % 97), 1.0] for text in texts]
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_only_misses_go_upstream_and_survive_a_restart(tmp_path):
+    upstream = CountingEmbeddings()
+    embeddings = CachedEmbeddings(upstream, EmbeddingCache(str(tmp_path), "model-a"), batch_size=2, concurrency=2)
+    texts = ["alpha", "beta", "gamma", "delta", "alpha"]
+
+    first = embeddings.embed_documents(texts)
+    assert first == upstream.embed_documents(texts)
+    # Four unique texts in batches of two; the repeat is not sent
+    assert sorted(len(batch) for batch in upstream.batches[:2]) == [2, 2]
+    upstream.batches.clear()
+
+    # A new process: same files, no upstream calls, whitespace differences ignored
+    for _ in range(1200):  # enough rows to grow the vectors file past its first allocation
+        texts.append(f"text {len(texts)}")
+    reopened = CachedEmbeddings(upstream, EmbeddingCache(str(tmp_path), "model-a"), batch_size=512, concurrency=2)
+    assert reopened.embed_documents([" alpha ", "gamma\n"]) == [first[0], first[2]]
+    assert upstream.batches == []
+    reopened.embed_documents(texts)
+    assert sum(len(batch) for batch in upstream.batches) == 1200
+    upstream.batches.clear()
+    assert asyncio.run(CachedEmbeddings(upstream, EmbeddingCache(str(tmp_path), "model-a"))
+                       .aembed_documents(texts[::-1]))[-1] == first[0]
+    assert upstream.batches == []
+
+    # Another model has its own vectors
+    other = CachedEmbeddings(upstream, EmbeddingCache(str(tmp_path), "model-b"))
+    other.embed_documents(["alpha"])
+    assert upstream.batches == [["alpha"]]
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.chat_archive import ChatHistoryArchive
+from app.models.chat_history import ChatHistory
+from app.models.conversation_summary import ConversationSummary
+from app.services import chat_services
+from app.services.history_archive import compact_history
+
+
+def make_db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[ChatHistory.__table__, ChatHistoryArchive.__table__,
+                                                  ConversationSummary.__table__])
+    return sessionmaker(bind=engine)()
+
+
+def test_compaction_archives_old_turns_and_history_still_reads_through():
+    db = make_db()
+    start = datetime(2026, 1, 1)
+    for i in range(25):
+        db.add(ChatHistory(session_id="s1", role="user", message=f"m{i}", timestamp=start + timedelta(minutes=i)))
+    db.add(ChatHistory(session_id="s2", role="user", message="old", timestamp=start))
+    db.add(ConversationSummary(session_id="s1", summary="everything", summarized_through=25))
+    db.commit()
+
+    now = start + timedelta(days=1)
+    stats = compact_history(db, retention_days=30, keep_recent=10, chunk_size=4, now=now)
+    assert stats == {"sessions": 1, "archived_messages": 15}
+    assert db.query(ChatHistory).filter(ChatHistory.session_id == "s1").count() == 10
+    assert [c.message_count for c in db.query(ChatHistoryArchive).order_by(ChatHistoryArchive.id)] == [4, 4, 4, 3]
+
+    # Age-based retention; the partial chunk is topped up instead of adding a new small one
+    stats = compact_history(db, retention_days=30, keep_recent=8, chunk_size=4, now=now)
+    assert stats["archived_messages"] == 2
+    assert sorted(c.message_count for c in db.query(ChatHistoryArchive)) == [1, 4, 4, 4, 4]
+    compact_history(db, retention_days=0.5, keep_recent=100, chunk_size=4, now=now)
+    assert db.query(ChatHistory).count() == 0
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = chat_services.get_messages_page(db, "s1", 6, cursor)
+        seen = [m.message for m in page] + seen
+        if cursor is None:
+            break
+    assert seen == [f"m{i}" for i in range(25)]
+    assert [m.message for m in chat_services.get_messages(db, "s1")] == seen
+
+    assert chat_services.clear_messages(db, "s1") == 25
+    assert db.query(ChatHistoryArchive).filter(ChatHistoryArchive.session_id == "s1").count() == 0
+
+
+def test_trimming_to_keep_recent_waits_for_the_summary():
+    db = make_db()
+    start = datetime(2026, 1, 1)
+    for i in range(20):
+        db.add(ChatHistory(session_id="s1", role="user", message=f"m{i}", timestamp=start + timedelta(minutes=i)))
+    db.commit()
+    now = start + timedelta(days=1)  # nothing is past the retention cutoff
+
+    # Never summarized: the surplus turns stay until the summary covers them
+    assert compact_history(db, retention_days=30, keep_recent=5, chunk_size=4, now=now)["archived_messages"] == 0
+
+    db.add(ConversationSummary(session_id="s1", summary="m0 to m11", summarized_through=12))
+    db.commit()
+    assert compact_history(db, retention_days=30, keep_recent=5, chunk_size=4, now=now)["archived_messages"] == 12
+    assert [r.message for r in db.query(ChatHistory).order_by(ChatHistory.id)] == [f"m{i}" for i in range(12, 20)]
+
+
+def test_short_sessions_without_a_summary_still_age_out():
+    db = make_db()
+    start = datetime(2026, 1, 1)
+    for i in range(4):
+        db.add(ChatHistory(session_id="short", role="user", message=f"m{i}", timestamp=start + timedelta(minutes=i)))
+    db.add(ChatHistory(session_id="fresh", role="user", message="new", timestamp=start + timedelta(days=59)))
+    db.commit()
+
+    stats = compact_history(db, retention_days=30, keep_recent=200, chunk_size=4, now=start + timedelta(days=60))
+    assert stats == {"sessions": 1, "archived_messages": 4}
+    assert [r.session_id for r in db.query(ChatHistory)] == ["fresh"]
+    assert [m.message for m in chat_services.get_messages(db, "short")] == [f"m{i}" for i in range(4)]
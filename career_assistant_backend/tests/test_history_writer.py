@@ -0,0 +1,83 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.chat_history import ChatHistory
+from app.services.history_writer import HistoryWriter, merge_pending
+
+
+def test_queued_messages_are_readable_and_flushed_in_one_batch():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[ChatHistory.__table__])
+    SessionLocal = sessionmaker(bind=engine)
+    writer = HistoryWriter(SessionLocal, flush_interval=60, flush_batch=1000)
+
+    for i in range(3):
+        writer.enqueue("s1", "user", f"question {i}")
+        writer.enqueue("s1", "assistant", f"answer {i}")
+    writer.enqueue("s2", "user", "other session")
+
+    db = SessionLocal()
+    pending = writer.pending("s1")
+    assert db.query(ChatHistory).count() == 0
+    assert [m.message for m in merge_pending([], pending)][:2] == ["question 0", "answer 0"]
+
+    assert writer.flush()
+    rows = db.query(ChatHistory).filter(ChatHistory.session_id == "s1").order_by(ChatHistory.id).all()
+    assert [r.message for r in rows] == [p.message for p in pending]
+    # A snapshot taken before the flush is not duplicated by the committed rows
+    assert len(merge_pending(rows, pending)) == 6
+    assert writer.pending("s1") == []
+
+    writer.enqueue("s1", "user", "after flush")
+    assert writer.discard("s1") == 1
+    writer.enqueue("s2", "assistant", "reply")
+    writer.close()
+    assert db.query(ChatHistory).filter(ChatHistory.session_id == "s2").count() == 2
+    assert db.query(ChatHistory).count() == 8
+
+
+def test_keyset_pages_walk_back_through_committed_and_queued_messages(monkeypatch):
+    from app.models.chat_archive import ChatHistoryArchive
+    from app.services import chat_services
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[ChatHistory.__table__, ChatHistoryArchive.__table__])
+    SessionLocal = sessionmaker(bind=engine)
+    writer = HistoryWriter(SessionLocal, flush_interval=60, flush_batch=1000)
+    monkeypatch.setattr(chat_services, "history_writer", writer)
+
+    for i in range(7):
+        writer.enqueue("s1", "user", f"m{i}")
+    writer.flush()
+    for i in range(7, 10):
+        writer.enqueue("s1", "user", f"m{i}")
+
+    db = SessionLocal()
+    assert [m.message for m in chat_services.get_recent_messages(db, "s1", 4)] == ["m6", "m7", "m8", "m9"]
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = chat_services.get_messages_page(db, "s1", 4, cursor)
+        seen = [m.message for m in page] + seen
+        if cursor is None:
+            break
+        cursor = chat_services.decode_cursor(chat_services.encode_cursor(cursor))
+    assert seen == [f"m{i}" for i in range(10)]
+
+
+def test_a_row_that_cannot_be_written_does_not_block_the_queue():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[ChatHistory.__table__])
+    SessionLocal = sessionmaker(bind=engine)
+    writer = HistoryWriter(SessionLocal, flush_interval=60, flush_batch=1000)
+
+    writer.enqueue("s1", "user", "before")
+    writer.enqueue("s1", "user", object())  # sqlite cannot bind it
+    writer.enqueue("s1", "assistant", "after")
+
+    assert writer.flush()
+    assert writer.dropped == 1 and writer.pending("s1") == []
+    assert [r.message for r in SessionLocal().query(ChatHistory).order_by(ChatHistory.id)] == ["before", "after"]
+    writer.close()
@@ -0,0 +1,90 @@
+import pytest
+
+from app.rag import ingest as ingest_module
+from app.rag.ingest import ingest
+
+
+class FakeVectorstore:
+    """Records what ingest sends; add_documents upserts like Chroma."""
+
+    def __init__(self, fail_after=None):
+        self.docs = {}
+        self.embedded = 0
+        self.fail_after = fail_after
+
+    def add_documents(self, docs, ids):
+        if self.fail_after is not None and self.embedded + len(ids) > self.fail_after:
+            raise RuntimeError("embedding API down")
+        self.embedded += len(ids)
+        self.docs.update(zip(ids, docs))
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.docs.pop(chunk_id, None)
+
+    def get(self, include=None):
+        return {"ids": list(self.docs)}
+
+
+def paragraphs(*topics):
+    return "\n\n".join(f"{topic} " + " ".join(f"{topic}-{i}" for i in range(60)) for topic in topics)
+
+
+def test_only_changed_chunks_are_embedded_and_runs_resume(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_module, "CHUNK_SIZE", 400)
+    monkeypatch.setattr(ingest_module, "CHUNK_OVERLAP", 0)
+    data = tmp_path / "data" / "faqs"
+    data.mkdir(parents=True)
+    (data / "a.txt").write_text(paragraphs("salary", "interview"))
+    (data / "b.txt").write_text(paragraphs("resume", "networking", "remote"))
+    manifest = str(tmp_path / "db" / "manifest.json")
+    store = FakeVectorstore()
+
+    first = ingest(store, str(tmp_path / "data"), manifest)
+    assert first["added"] == len(store.docs) == store.embedded > 0
+    assert {d.metadata["source"] for d in store.docs.values()} == {"faqs"}
+
+    # Nothing changed: nothing embedded
+    assert ingest(store, str(tmp_path / "data"), manifest)["added"] == 0
+    assert store.embedded == first["added"]
+
+    # Edit one paragraph of b, delete a, add c
+    (data / "b.txt").write_text(paragraphs("resume", "mentoring", "remote"))
+    (data / "a.txt").unlink()
+    (data / "c.txt").write_text(paragraphs("internship"))
+    before = store.embedded
+    counts = ingest(store, str(tmp_path / "data"), manifest)
+    assert (counts["files_added"], counts["files_updated"], counts["files_deleted"]) == (1, 1, 1)
+    assert counts["unchanged"] > 0 and counts["deleted"] > 0
+    assert store.embedded - before == counts["added"] < len(store.docs)
+    assert all(d.metadata["filename"] != "a.txt" for d in store.docs.values())
+
+    # A run that dies midway is finished by the next one
+    (data / "d.txt").write_text(paragraphs("offer", "negotiation"))
+    (data / "e.txt").write_text(paragraphs("portfolio"))
+    reference = FakeVectorstore()
+    ingest(reference, str(tmp_path / "data"), str(tmp_path / "reference" / "manifest.json"))
+    store.fail_after = store.embedded + 1
+    with pytest.raises(RuntimeError):
+        ingest(store, str(tmp_path / "data"), manifest)
+    store.fail_after = None
+    ingest(store, str(tmp_path / "data"), manifest)
+    assert store.docs.keys() == reference.docs.keys()
+
+
+def test_parallel_parsing_matches_serial_and_isolates_bad_files(tmp_path):
+    data = tmp_path / "data"
+    for folder, topics in (("faqs", ("salary", "offer")), ("jobs", ("python", "cloud")), ("resumes", ("alice",))):
+        (data / folder).mkdir(parents=True)
+        for topic in topics:
+            (data / folder / f"{topic}.txt").write_text(paragraphs(topic, f"{topic} tips") * 5)
+    (data / "resumes" / "corrupt.pdf").write_bytes(b"%PDF-1.4 not really a pdf")
+
+    serial, parallel = FakeVectorstore(), FakeVectorstore()
+    ingest(serial, str(data), str(tmp_path / "serial.json"), workers=1)
+    counts = ingest(parallel, str(data), str(tmp_path / "parallel.json"), workers=3)
+
+    assert counts["files_added"] == 5 and counts["files_failed"] == 1
+    assert list(parallel.docs) == list(serial.docs)  # same chunks, added in the same order
+    # The failed file is not recorded, so the next run tries it again
+    assert ingest(parallel, str(data), str(tmp_path / "parallel.json"), workers=3)["files_failed"] == 1
@@ -0,0 +1,98 @@
+import asyncio
+
+from app.services.job_cache import JobSearchCache, normalize_job_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_coalesces_concurrent_misses_and_serves_stale_while_refreshing():
+    clock = FakeClock()
+    cache = JobSearchCache(ttl=10, stale_ttl=100, negative_ttl=5, clock=clock)
+    calls = []
+
+    async def fetch():
+        calls.append(clock.now)
+        await asyncio.sleep(0.01)
+        return [{"title": f"job {len(calls)}"}]
+
+    async def scenario():
+        key = normalize_job_query("Python  Developer", "Bangalore ", 3)
+        assert key == normalize_job_query("python developer", "bangalore", 3)
+
+        results = await asyncio.gather(*[cache.get(key, fetch) for _ in range(20)])
+        assert len(calls) == 1 and all(r == [{"title": "job 1"}] for r in results)
+
+        clock.now = 15  # expired but within the stale window
+        assert await cache.get(key, fetch) == [{"title": "job 1"}]
+        await asyncio.sleep(0.05)
+        assert await cache.get(key, fetch) == [{"title": "job 2"}]
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["stale_hits"], stats["refreshes"]) == (1, 19, 1, 1)
+
+
+def test_negative_results_expire_quickly_and_size_is_bounded():
+    clock = FakeClock()
+    cache = JobSearchCache(ttl=10, negative_ttl=5, max_entries=2, clock=clock)
+    calls = []
+
+    async def empty():
+        calls.append(1)
+        return []
+
+    async def scenario():
+        key = normalize_job_query("rare role", "nowhere", 5)
+        await cache.get(key, empty)
+        await cache.get(key, empty)
+        clock.now = 6
+        await cache.get(key, empty)
+        for role in ("a", "b", "c"):
+            await cache.get(normalize_job_query(role, "x", 5), empty)
+
+    asyncio.run(scenario())
+    assert len(calls) == 5
+    assert cache.stats()["negative_hits"] == 1
+    assert len(cache) == 2 and cache.stats()["evictions"] == 2
+
+
+def test_failures_are_not_cached_and_stale_entries_survive_a_failed_refresh():
+    clock = FakeClock()
+    cache = JobSearchCache(ttl=10, stale_ttl=100, negative_ttl=5, clock=clock)
+    outcomes = [RuntimeError("provider down"), [{"title": "job"}]] + [RuntimeError("provider down")] * 2
+
+    async def fetch():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def scenario():
+        key = normalize_job_query("python developer", "bangalore", 3)
+        try:
+            await cache.get(key, fetch)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("the failure should reach the caller")
+        assert len(cache) == 0
+
+        assert await cache.get(key, fetch) == [{"title": "job"}]
+        clock.now = 15  # expired; the background refresh fails
+        assert await cache.get(key, fetch) == [{"title": "job"}]
+        await asyncio.sleep(0.01)
+        # The entry is kept, and the next read tries another refresh
+        assert await cache.get(key, fetch) == [{"title": "job"}]
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert outcomes == []
+    stats = cache.stats()
+    assert (stats["misses"], stats["failures"], stats["refreshes"], stats["stale_hits"]) == (2, 3, 2, 2)
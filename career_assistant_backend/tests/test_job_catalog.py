@@ -0,0 +1,34 @@
+import json
+import os
+
+from app.services import job_catalog
+from app.services.job_catalog import JobCatalog
+
+
+def test_ranked_lookup_write_back_and_reload(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_catalog, "RELOAD_CHECK_INTERVAL", 0)
+    seed = tmp_path / "matched_jobs.json"
+    seed.write_text(json.dumps({"matched_jobs": [
+        {"title": "Software Engineer", "company": "Google", "matched_skills": ["SQL", "Python"]},
+        {"title": "Backend Developer", "company": "Startup", "matched_skills": ["Docker"]},
+    ]}))
+    cache = tmp_path / "cached_jobs.jsonl"
+    catalog = JobCatalog(str(seed), str(cache))
+
+    assert [j["title"] for j in catalog.search("python developer")] == ["Backend Developer", "Software Engineer"]
+    assert catalog.search("designer") == []
+
+    api_jobs = [
+        {"title": "Python Developer", "company": "Acme", "location": "Bangalore, Karnataka", "url": "u1"},
+        {"title": "Python Developer", "company": "Beta", "location": "Pune, Maharashtra", "url": "u2"},
+    ]
+    assert catalog.add_jobs(api_jobs) == 2
+    assert catalog.add_jobs(api_jobs) == 0  # unchanged jobs are not logged twice
+    assert [j["company"] for j in catalog.search("python developer", "pune", limit=2)] == ["Beta", "Acme"]
+
+    # A fresh catalog rebuilds the same index from the seed file and the write-back log
+    assert len(JobCatalog(str(seed), str(cache))) == 4
+
+    seed.write_text(json.dumps({"matched_jobs": []}))
+    os.utime(seed, ns=(0, 0))
+    assert len(catalog) == 2
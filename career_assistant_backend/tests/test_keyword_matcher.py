@@ -0,0 +1,31 @@
+from app.utils.keyword_matcher import KeywordMatcher
+
+
+def test_matches_whole_words_only():
+    matcher = KeywordMatcher({"greeting": ["hi"], "job": ["hiring", "job"]})
+    assert matcher.matches("We are hiring") == {"job"}
+    assert matcher.matches("Hi! Any job?") == {"greeting", "job"}
+
+
+def test_multi_word_and_overlapping_keywords():
+    matcher = KeywordMatcher({"level": ["entry level"], "word": ["level"]})
+    assert matcher.matches("an entry level role") == {"level", "word"}
+    assert not matcher.search("")
+
+
+def test_empty_keyword_lists_match_nothing():
+    for matcher in (KeywordMatcher({}), KeywordMatcher({"job": []}), KeywordMatcher({"job": [""]})):
+        assert matcher.matches("any job at all") == set()
+        assert not matcher.search("any job at all")
+
+
+def test_job_queries_keep_the_inflections_the_substring_check_caught():
+    from app.routers.query import is_job_query
+
+    for question in ("I have been working in retail for years", "I worked as a cashier",
+                     "I was recruited last year", "Are recruiters active now?", "Any remote roles?",
+                     "What does a healthy workplace look like?"):
+        assert is_job_query(question), question
+    # The substring check also fired inside unrelated words
+    for question in ("How do I grow my network?", "Help with my homework", "Say hi"):
+        assert not is_job_query(question), question
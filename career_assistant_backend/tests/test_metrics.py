@@ -0,0 +1,41 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.metrics import MetricsMiddleware, MetricsRegistry
+
+
+def test_spans_counters_and_middleware_render_as_prometheus_text():
+    registry = MetricsRegistry(namespace="test", buckets=(0.1, 1.0))
+    registry.observe("/query/query", "llm", 0.05)
+    registry.observe("/query/query", "llm", 0.5)
+    with pytest.raises(RuntimeError):
+        with registry.span("/query/query", "embedding", upstream="openai"):
+            raise RuntimeError("timeout")
+    registry.register_cache("answer", lambda: {"hits": 3, "misses": 1, "size": 2, "hit_rate": 0.75})
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, registry=registry)
+
+    @app.get("/history/{session_id}")
+    def history(session_id: str):
+        return {"session_id": session_id}
+
+    client = TestClient(app)
+    client.get("/history/a")
+    client.get("/history/b")
+    client.get("/missing")
+
+    text = registry.render()
+    assert 'test_stage_duration_seconds_bucket{route="/query/query",stage="llm",le="0.1"} 1' in text
+    assert 'test_stage_duration_seconds_bucket{route="/query/query",stage="llm",le="+Inf"} 2' in text
+    assert 'test_stage_duration_seconds_count{route="/query/query",stage="llm"} 2' in text
+    assert 'test_stage_errors_total{route="/query/query",stage="embedding"} 1.0' in text
+    assert 'test_upstream_errors_total{upstream="openai"} 1.0' in text
+    assert 'test_cache_events_total{cache="answer",event="hits"} 3' in text
+    assert 'test_cache_entries{cache="answer"} 2' in text
+    assert "hit_rate" not in text
+    # Requests are labelled by route template, not by raw path
+    assert 'test_http_requests_total{method="GET",route="/history/{session_id}",status="200"} 2.0' in text
+    assert 'test_http_requests_total{method="GET",route="unmatched",status="404"} 1.0' in text
+    assert 'test_stage_duration_seconds_count{route="/history/{session_id}",stage="total"} 2' in text
@@ -0,0 +1,54 @@
+import asyncio
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake import FakeListLLM
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from app.routers import query as query_router
+from app.services.answer_cache import SemanticAnswerCache
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.queries = 0
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.queries += 1
+        return self._vector(text)
+
+    @staticmethod
+    def _vector(text):
+        return [float(text.count(word)) + 0.01 for word in ("resume", "salary", "interview")]
+
+
+def test_a_cache_miss_embeds_and_retrieves_once(monkeypatch):
+    embeddings = CountingEmbeddings()
+    vectorstore = InMemoryVectorStore(embeddings)
+    vectorstore.add_documents([
+        Document(page_content=f"{topic} advice", metadata={"source": "guides", "filename": f"{topic}.txt"})
+        for topic in ("resume", "salary", "interview", "resume salary")
+    ])
+    retrievals = []
+    search = vectorstore.similarity_search_by_vector
+    monkeypatch.setattr(vectorstore, "similarity_search_by_vector",
+                        lambda *args, **kwargs: retrievals.append(1) or search(*args, **kwargs))
+
+    monkeypatch.setattr(query_router, "get_vectorstore", lambda: vectorstore)
+    monkeypatch.setattr(query_router, "get_embeddings", lambda: embeddings)
+    monkeypatch.setattr(query_router, "get_vectorstore_version", lambda: "v1")
+    monkeypatch.setattr(query_router, "get_llm", lambda: FakeListLLM(responses=["Keep it to one page."]))
+    monkeypatch.setattr(query_router, "get_chat_history", lambda db, session_id, question: [])
+    monkeypatch.setattr(query_router, "answer_cache", SemanticAnswerCache())
+
+    response = asyncio.run(query_router._handle_rag_query("How long should my resume be?", "s", db=None))
+    assert response["answer"] == "Keep it to one page."
+    assert "guides / resume.txt" in response["sources"]
+    assert embeddings.queries == 1 and len(retrievals) == 1
+
+    # The same question is then answered from the cache
+    assert asyncio.run(query_router._handle_rag_query("How long should my resume be?", "s", db=None)) == response
+    assert embeddings.queries == 2 and len(retrievals) == 2
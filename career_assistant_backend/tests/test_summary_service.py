@@ -0,0 +1,41 @@
+from langchain_community.llms.fake import FakeListLLM
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.chat_history import ChatHistory
+from app.models.conversation_summary import ConversationSummary
+from app.services.summary_service import RECENT_MESSAGES, get_conversation_context, update_summary
+
+
+def make_db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[ChatHistory.__table__, ConversationSummary.__table__])
+    return sessionmaker(bind=engine)()
+
+
+def add_turns(db, session_id, start, count):
+    for i in range(start, start + count):
+        db.add(ChatHistory(session_id=session_id, role="user", message=f"question {i}"))
+        db.add(ChatHistory(session_id=session_id, role="assistant", message=f"answer {i}"))
+    db.commit()
+
+
+def test_folds_only_messages_outside_the_recent_window():
+    db = make_db()
+    add_turns(db, "s1", 0, RECENT_MESSAGES // 2)
+    llm = FakeListLLM(responses=["summary one", "summary two"])
+    assert not update_summary(db, "s1", llm)
+
+    add_turns(db, "s1", 10, 1)
+    assert update_summary(db, "s1", llm)
+    summary, recent = get_conversation_context(db, "s1")
+    assert summary == "summary one"
+    assert len(recent) == RECENT_MESSAGES
+    assert recent[-1].message == "answer 10"
+
+    add_turns(db, "s1", 20, 1)
+    assert update_summary(db, "s1", llm)
+    summary, recent = get_conversation_context(db, "s1")
+    assert summary == "summary two"
+    assert [m.message for m in recent][:2] == ["question 2", "answer 2"]
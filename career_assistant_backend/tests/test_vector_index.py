@@ -0,0 +1,138 @@
+import hashlib
+import os
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.rag import ingest as ingest_module
+from app.rag import vector_index
+from app.rag.ingest import ingest
+from app.rag.vector_index import IndexUpdate, MmapVectorIndex, current_version, open_index, write_index
+
+
+def _seed(text):
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], "little")
+
+
+class TopicEmbeddings(Embeddings):
+    """Texts on the same topic (first word) land close together."""
+
+    def __init__(self, dim=32):
+        self.dim = dim
+        self.embedded = 0
+
+    def _vector(self, text):
+        topic, _, rest = text.partition(" ")
+        base = np.random.default_rng(_seed(topic)).standard_normal(self.dim)
+        noise = np.random.default_rng(_seed(rest)).standard_normal(self.dim)
+        return (base + 0.3 * noise).tolist()
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def test_flat_and_ivf_indexes_agree_and_versions_are_pruned(tmp_path):
+    embeddings = TopicEmbeddings()
+    texts = [f"topic{i % 40} note {i}" for i in range(2000)]
+    metadatas = [{"source": "faqs" if i < 1000 else "jobs"} for i in range(2000)]
+    root = str(tmp_path / "index")
+
+    flat = MmapVectorIndex.from_texts(texts, embeddings, metadatas, path=root, mode="flat")
+    ivf = MmapVectorIndex.from_texts(texts, embeddings, metadatas, path=root, mode="ivf")
+    assert flat.info["ivf"] is None and ivf.info["ivf"]["nlist"] > 1
+    assert os.path.basename(ivf.directory) == current_version(root)
+
+    query = "topic7 note 7"
+    exact = [doc.page_content for doc in flat.similarity_search(query, k=10)]
+    assert all(text.startswith("topic7 ") for text in exact)
+    approximate = [doc.page_content for doc in ivf.similarity_search(query, k=10)]
+    assert len(set(exact) & set(approximate)) >= 8
+
+    filtered = flat.similarity_search_with_score(query, k=3, filter={"source": "jobs"})
+    assert len(filtered) == 3 and all(doc.metadata["source"] == "jobs" for doc, _ in filtered)
+    assert filtered[0][1] >= filtered[-1][1]
+
+    # A reader keeps working on its version while newer ones are published
+    for _ in range(3):
+        MmapVectorIndex.from_texts(texts[:10], embeddings, path=root)
+    assert [doc.page_content for doc in flat.similarity_search(query, k=10)] == exact
+    assert len(open_index(root, embeddings)) == 10
+    versions = [name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name))]
+    assert len(versions) == 2
+
+
+def test_updates_copy_kept_vectors_and_ingest_publishes_versions(tmp_path, monkeypatch):
+    embeddings = TopicEmbeddings()
+    root = str(tmp_path / "index")
+    texts = ["alpha one", "beta two", "gamma three"]
+    write_index(root, lambda writer: writer.add(["a", "b", "c"], texts, [{}, {}, {}], embeddings.embed_documents(texts)))
+    update = IndexUpdate(root, embeddings)
+    update.delete(["b"])
+    update.add_documents([Document(page_content="delta four", metadata={"n": 4})], ids=["d"])
+    assert sorted(update.get()["ids"]) == ["a", "c", "d"]
+    embeddings.embedded = 0
+    version = update.commit()
+    assert embeddings.embedded == 0  # kept rows are copied, not embedded again
+    index = open_index(root, embeddings)
+    assert os.path.basename(index.directory) == version
+    assert sorted(index.ids()) == ["a", "c", "d"]
+    assert index.similarity_search("delta four", k=1)[0].metadata == {"n": 4}
+
+    monkeypatch.setattr(ingest_module, "CHUNK_SIZE", 200)
+    monkeypatch.setattr(ingest_module, "CHUNK_OVERLAP", 0)
+    data = tmp_path / "data" / "faqs"
+    data.mkdir(parents=True)
+    (data / "a.txt").write_text("salary tips " * 40 + "\n\n" + "interview tips " * 40)
+    manifest = str(tmp_path / "index" / "ingest_manifest.json")
+
+    # The index above was built outside ingest, so its chunks are replaced
+    first = ingest(IndexUpdate(root, embeddings), str(tmp_path / "data"), manifest, workers=1)
+    index = open_index(root, embeddings)
+    assert first["added"] == len(index) > 0 and "a" not in index.ids()
+    assert all(doc.metadata["filename"] == "a.txt" for doc in index.similarity_search("salary", k=2))
+
+    # Nothing changed: nothing embedded and the same version is kept
+    embeddings.embedded = 0
+    version = current_version(root)
+    assert ingest(IndexUpdate(root, embeddings), str(tmp_path / "data"), manifest, workers=1)["added"] == 0
+    assert embeddings.embedded == 0 and current_version(root) == version
+    assert not [name for name in os.listdir(root) if name.endswith(".staging")]
+
+
+def test_add_texts_publishes_a_version_and_crashed_updates_are_cleaned_up(tmp_path):
+    embeddings = TopicEmbeddings()
+    root = str(tmp_path / "index")
+    texts = [f"topic{i % 5} note {i}" for i in range(50)]
+    index = MmapVectorIndex.from_texts(texts, embeddings, ids=[str(i) for i in range(50)], path=root, mode="ivf")
+    # ids.json follows the rows ivf reordered
+    assert index.ids() == [index.document(row).id for row in range(len(index))]
+
+    assert index.add_texts(["topic9 new note"], [{"n": 1}], ids=["new"]) == ["new"]
+    assert len(index) == 50  # this view keeps its version
+    latest = open_index(root, embeddings)
+    assert len(latest) == 51 and latest.similarity_search("topic9 new note", k=1)[0].metadata == {"n": 1}
+
+    try:
+        with IndexUpdate(root, embeddings) as update:
+            update.add_documents([Document(page_content="topic1 lost")], ids=["lost"])
+            raise RuntimeError("ingest crashed")
+    except RuntimeError:
+        pass
+    assert not [name for name in os.listdir(root) if name.endswith(".staging")]
+
+    # A staging dir left by a killed process is swept once it is old enough
+    abandoned = IndexUpdate(root, embeddings)
+    old = os.path.getmtime(abandoned._staging_dir) - 2 * vector_index.STALE_BUILD_AGE
+    for name in os.listdir(abandoned._staging_dir) + [""]:
+        os.utime(os.path.join(abandoned._staging_dir, name), (old, old))
+    fresh = IndexUpdate(root, embeddings)
+    latest.add_texts(["topic3 another"])
+    assert os.listdir(root).count(os.path.basename(abandoned._staging_dir)) == 0
+    assert os.path.isdir(fresh._staging_dir)
+    fresh.close()
+    abandoned._staging.close()
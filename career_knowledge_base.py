@@ -3,6 +3,15 @@ Career Knowledge Base for RAG Pipeline
 Contains structured career information for retrieval
 """
 
+import os
+from typing import Dict, List
+
+from knowledge_store import (
+    InMemoryKnowledgeBackend,
+    KnowledgeBackend,
+    open_knowledge_backend,
+)
+
 CAREER_KNOWLEDGE_BASE = {
     "job_search": [
         {
@@ -119,30 +128,40 @@ CAREER_KNOWLEDGE_BASE = {
     ]
 }
 
+def _default_backend() -> KnowledgeBackend:
+    """Backend named by CAREER_KNOWLEDGE_SOURCE, or the built-in knowledge base"""
+    source = os.getenv("CAREER_KNOWLEDGE_SOURCE")
+    if source:
+        return open_knowledge_backend(source)
+    return InMemoryKnowledgeBackend(CAREER_KNOWLEDGE_BASE)
+
+_backend = _default_backend()
+
+def get_knowledge_backend() -> KnowledgeBackend:
+    """Get the backend serving knowledge lookups"""
+    return _backend
+
+def set_knowledge_backend(backend: KnowledgeBackend):
+    """Serve knowledge lookups from another backend"""
+    global _backend
+    _backend = backend
+
+def load_knowledge_base(knowledge_base: Dict[str, List[Dict]]):
+    """Replace the knowledge base with in-memory data and index it"""
+    set_knowledge_backend(InMemoryKnowledgeBackend(knowledge_base))
+
 def get_knowledge_by_category(category):
     """Get all knowledge entries for a specific category"""
-    return CAREER_KNOWLEDGE_BASE.get(category, [])
+    return _backend.get_by_category(category)
 
 def search_knowledge(query, category=None):
     """Search knowledge base for relevant content"""
-    query_lower = query.lower()
-    results = []
-    
-    for cat, entries in CAREER_KNOWLEDGE_BASE.items():
-        if category and cat != category:
-            continue
-            
-        for entry in entries:
-            # Check if query matches keywords or content
-            if (any(keyword in query_lower for keyword in entry["keywords"]) or
-                any(word in entry["content"].lower() for word in query_lower.split())):
-                results.append(entry)
-    
-    return results
+    return _backend.search(query, category)
+
+def search_knowledge_ranked(query, category=None, top_k=3):
+    """Search knowledge base and return the top_k entries ranked by BM25"""
+    return [entry for _, entry in _backend.search_ranked(query, category, top_k)]
 
 def get_all_knowledge():
     """Get all knowledge entries"""
-    all_entries = []
-    for entries in CAREER_KNOWLEDGE_BASE.values():
-        all_entries.extend(entries)
-    return all_entries
+    return _backend.get_all()
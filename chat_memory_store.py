@@ -0,0 +1,156 @@
+"""
+Shared storage backends for ChatMemory
+Lets several worker processes see the same conversation sessions
+"""
+
+import json
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# (role, content, timestamp, metadata) as persisted for one message
+MessageRow = Tuple[str, str, float, Optional[Dict]]
+# session_id -> (new message rows, latest preferences)
+SessionWrites = Dict[str, Tuple[List[MessageRow], Dict]]
+
+
+class ChatMemoryStore:
+    """Interface for the storage behind ChatMemory's local cache"""
+
+    def load(self, session_id: str, limit: int) -> Optional[Tuple[List[MessageRow], Dict]]:
+        """Return the last `limit` messages and the preferences of a session, or None"""
+        raise NotImplementedError
+
+    def write(self, writes: SessionWrites, keep: int):
+        """Append new messages, replace preferences and keep only the last `keep` messages"""
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class InMemoryChatMemoryStore(ChatMemoryStore):
+    """Process-local store, for single-worker deployments and tests"""
+
+    def __init__(self):
+        self._sessions: Dict[str, Tuple[List[MessageRow], Dict]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id, limit):
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is None:
+                return None
+            rows, preferences = record
+            return list(rows[-limit:]) if limit else [], json.loads(json.dumps(preferences))
+
+    def write(self, writes, keep):
+        with self._lock:
+            for session_id, (rows, preferences) in writes.items():
+                stored_rows, _ = self._sessions.get(session_id, ([], {}))
+                self._sessions[session_id] = ((stored_rows + rows)[-keep:], preferences)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteChatMemoryStore(ChatMemoryStore):
+    """Store in a SQLite file in WAL mode, shared by every worker on the host"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            session_id TEXT PRIMARY KEY,
+            preferences TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp REAL NOT NULL,
+            metadata TEXT
+        );
+        CREATE INDEX IF NOT EXISTS chat_messages_session ON chat_messages (session_id, id);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connect().executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Per-thread connection; WAL lets readers run alongside a writer"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._connections.append(conn)
+        return conn
+
+    def load(self, session_id, limit):
+        conn = self._connect()
+        session = conn.execute(
+            "SELECT preferences FROM chat_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if session is None:
+            return None
+        rows = conn.execute(
+            "SELECT role, content, timestamp, metadata FROM chat_messages "
+            "WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, limit)
+        ).fetchall()
+        messages = [
+            (role, content, timestamp, json.loads(metadata) if metadata else None)
+            for role, content, timestamp, metadata in reversed(rows)
+        ]
+        return messages, json.loads(session[0])
+
+    def write(self, writes, keep):
+        conn = self._connect()
+        with conn:
+            for session_id, (rows, preferences) in writes.items():
+                conn.executemany(
+                    "INSERT INTO chat_messages (session_id, role, content, timestamp, metadata) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (session_id, role, content, timestamp, json.dumps(metadata) if metadata else None)
+                        for role, content, timestamp, metadata in rows
+                    ]
+                )
+                conn.execute(
+                    "INSERT INTO chat_sessions (session_id, preferences) VALUES (?, ?) "
+                    "ON CONFLICT (session_id) DO UPDATE SET preferences = excluded.preferences",
+                    (session_id, json.dumps(preferences))
+                )
+                # Drop messages older than the newest `keep`
+                conn.execute(
+                    "DELETE FROM chat_messages WHERE session_id = ? AND id < ("
+                    "SELECT id FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (session_id, session_id, keep - 1)
+                )
+
+    def delete(self, session_id):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+
+    def close(self):
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
+        self._local = threading.local()
+
+
+def open_chat_memory_store(source: str = None) -> ChatMemoryStore:
+    """Open a SQLite store at `source`, or an in-memory store when no path is given"""
+    if not source:
+        return InMemoryChatMemoryStore()
+    return SQLiteChatMemoryStore(source)
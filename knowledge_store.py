@@ -0,0 +1,1030 @@
+"""
+Knowledge storage backends for the career knowledge base
+In-memory, JSONL and SQLite FTS5 sources behind one interface, with
+incremental updates and hot reload of file-backed sources
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+TERM_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Query words too common to say anything about relevance
+STOP_WORDS = frozenset("""
+a an and are as at be but by can could do does for from get how i if in into is it its
+me my of on or should so than that the their them there these this to was we what when
+where which who why will with would you your more most some any about ask want need
+""".split())
+
+# BM25 parameters; keyword matches count KEYWORD_BOOST times a content match
+BM25_K1 = 1.2
+BM25_B = 0.75
+KEYWORD_BOOST = 2.0
+
+# Pending changes layered over a shared index before a background merge folds them in
+MERGE_THRESHOLD = 256
+
+
+class KnowledgeIndex:
+    """Inverted index over knowledge entries, updated incrementally on upsert and remove.
+
+    Answers the same matches as a full scan: an entry matches when one of its
+    keywords occurs in the lowercased query, or when any query word occurs
+    anywhere in the lowercased content.
+
+    An index shared with reader threads must not be changed: writers layer
+    their changes over it in a KnowledgeSnapshot, which folds them into a
+    copy() now and then.
+    """
+
+    GRAM_SIZE = 3
+    WORD_CACHE_SIZE = 10000
+
+    def __init__(self, knowledge_base: Dict[str, List[Dict]]):
+        self.entries: List[Optional[Dict]] = []       # position -> entry, None once removed
+        self.categories: List[Optional[str]] = []     # position -> category
+        self.positions: Dict[str, int] = {}           # entry id -> position
+        self.category_positions: Dict[str, Dict[int, None]] = {}
+        self.phrase_index: Dict[str, Set[int]] = {}   # keyword -> positions
+        self.phrase_lengths: List[int] = []
+        self._phrase_length_counts: Dict[int, int] = {}
+        self.token_index: Dict[str, Set[int]] = {}    # content token -> positions
+        self.gram_index: Dict[str, Set[str]] = {}     # trigram -> content tokens
+        self.short_index: Dict[str, Set[int]] = {}    # 1-2 char substring -> positions
+        self._token_shorts: Dict[str, frozenset] = {} # content token -> its 1-2 char substrings
+        self._word_cache: Dict[str, Set[int]] = {}
+
+        # BM25 statistics per field: term -> {position: term frequency}
+        self.content_terms: Dict[str, Dict[int, int]] = {}
+        self.keyword_terms: Dict[str, Dict[int, int]] = {}
+        self.content_lengths: List[int] = []
+        self.keyword_lengths: List[int] = []
+        self._total_content_length = 0
+        self._total_keyword_length = 0
+        self._bm25_dirty = True
+
+        for category, entries in knowledge_base.items():
+            for entry in entries:
+                self.upsert(entry, category)
+        self.prepare()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def copy(self) -> "KnowledgeIndex":
+        """Independent copy to change while readers keep using this index"""
+        clone = KnowledgeIndex.__new__(KnowledgeIndex)
+        clone.entries = list(self.entries)
+        clone.categories = list(self.categories)
+        clone.positions = dict(self.positions)
+        clone.category_positions = {category: dict(positions) for category, positions in self.category_positions.items()}
+        clone.phrase_index = {keyword: set(postings) for keyword, postings in self.phrase_index.items()}
+        clone.phrase_lengths = list(self.phrase_lengths)
+        clone._phrase_length_counts = dict(self._phrase_length_counts)
+        clone.token_index = {token: set(postings) for token, postings in self.token_index.items()}
+        clone.gram_index = {gram: set(tokens) for gram, tokens in self.gram_index.items()}
+        clone.short_index = {substring: set(postings) for substring, postings in self.short_index.items()}
+        clone._token_shorts = dict(self._token_shorts)
+        clone._word_cache = {}
+        clone.content_terms = {term: dict(postings) for term, postings in self.content_terms.items()}
+        clone.keyword_terms = {term: dict(postings) for term, postings in self.keyword_terms.items()}
+        clone.content_lengths = list(self.content_lengths)
+        clone.keyword_lengths = list(self.keyword_lengths)
+        clone._total_content_length = self._total_content_length
+        clone._total_keyword_length = self._total_keyword_length
+        clone._bm25_dirty = True
+        return clone
+
+    def upsert(self, entry: Dict, category: str = None):
+        """Add an entry, or replace the entry with the same id in place"""
+        category = category or entry["category"]
+        position = self.positions.get(entry["id"])
+        if position is None:
+            position = len(self.entries)
+            self.entries.append(None)
+            self.categories.append(None)
+            self.content_lengths.append(0)
+            self.keyword_lengths.append(0)
+        else:
+            self._unindex_entry(position)
+
+        self._index_entry(position, entry, category)
+        self.entries[position] = entry
+        self.categories[position] = category
+        self.positions[entry["id"]] = position
+        self.category_positions.setdefault(category, {})[position] = None
+        self._word_cache = {}
+
+    def reserve(self, length: int):
+        """Extend the position lists with empty slots up to length, so the next new entry lands there"""
+        while len(self.entries) < length:
+            self.entries.append(None)
+            self.categories.append(None)
+            self.content_lengths.append(0)
+            self.keyword_lengths.append(0)
+
+    def remove(self, entry_id: str) -> bool:
+        """Remove an entry by id; returns False when it was not indexed"""
+        position = self.positions.pop(entry_id, None)
+        if position is None:
+            return False
+        self._unindex_entry(position)
+        self.entries[position] = None
+        self.categories[position] = None
+        self._word_cache = {}
+        return True
+
+    def _index_entry(self, position: int, entry: Dict, category: str):
+        """Add one entry's keywords and content tokens to the index"""
+        for keyword in entry["keywords"]:
+            postings = self.phrase_index.get(keyword)
+            if postings is None:
+                postings = self.phrase_index[keyword] = set()
+                self._count_phrase_length(len(keyword), 1)
+            postings.add(position)
+
+        tokens = set(entry["content"].lower().split())
+        for token in tokens:
+            postings = self.token_index.get(token)
+            if postings is None:
+                postings = self.token_index[token] = set()
+                self._index_token(token)
+            postings.add(position)
+        for substring in self._short_substrings(tokens):
+            self.short_index.setdefault(substring, set()).add(position)
+
+        content_length = self._add_terms(self.content_terms, position, entry["content"])
+        keyword_length = self._add_terms(self.keyword_terms, position, " ".join(entry["keywords"]))
+        self.content_lengths[position] = content_length
+        self.keyword_lengths[position] = keyword_length
+        self._total_content_length += content_length
+        self._total_keyword_length += keyword_length
+        self._bm25_dirty = True
+
+    def _unindex_entry(self, position: int):
+        """Drop every posting of the entry currently stored at position"""
+        entry, category = self.entries[position], self.categories[position]
+        self.category_positions[category].pop(position, None)
+        if not self.category_positions[category]:
+            del self.category_positions[category]
+
+        for keyword in entry["keywords"]:
+            postings = self.phrase_index.get(keyword)
+            if postings is not None:
+                postings.discard(position)
+                if not postings:
+                    del self.phrase_index[keyword]
+                    self._count_phrase_length(len(keyword), -1)
+
+        tokens = set(entry["content"].lower().split())
+        for substring in self._short_substrings(tokens):
+            postings = self.short_index.get(substring)
+            if postings is not None:
+                postings.discard(position)
+                if not postings:
+                    del self.short_index[substring]
+        for token in tokens:
+            postings = self.token_index.get(token)
+            if postings is not None:
+                postings.discard(position)
+                if not postings:
+                    del self.token_index[token]
+                    self._unindex_token(token)
+
+        for field_terms, text in ((self.content_terms, entry["content"]),
+                                  (self.keyword_terms, " ".join(entry["keywords"]))):
+            for term in set(TERM_PATTERN.findall(text.lower())):
+                postings = field_terms.get(term)
+                if postings is not None and postings.pop(position, None) is not None and not postings:
+                    del field_terms[term]
+        self._total_content_length -= self.content_lengths[position]
+        self._total_keyword_length -= self.keyword_lengths[position]
+        self.content_lengths[position] = 0
+        self.keyword_lengths[position] = 0
+        self._bm25_dirty = True
+
+    def _count_phrase_length(self, length: int, delta: int):
+        """Track how many keywords have each length to keep phrase_lengths current"""
+        count = self._phrase_length_counts.get(length, 0) + delta
+        if count:
+            self._phrase_length_counts[length] = count
+        else:
+            self._phrase_length_counts.pop(length, None)
+        if count in (0, 1):
+            self.phrase_lengths = sorted(self._phrase_length_counts)
+
+    def _short_substrings(self, tokens: Set[str]) -> Set[str]:
+        """Distinct one and two character substrings of the given indexed tokens"""
+        return set().union(*(self._token_shorts[token] for token in tokens))
+
+    @staticmethod
+    def _add_terms(field_terms: Dict[str, Dict[int, int]], position: int, text: str) -> int:
+        """Record term frequencies of one field and return its length in terms"""
+        terms = TERM_PATTERN.findall(text.lower())
+        for term in terms:
+            postings = field_terms.setdefault(term, {})
+            postings[position] = postings.get(position, 0) + 1
+        return len(terms)
+
+    def prepare(self):
+        """Precompute IDF tables and average field lengths; call before sharing the index"""
+        if not self._bm25_dirty:
+            return
+        count = len(self.positions)
+        self.content_idf = self._idf_table(self.content_terms, count)
+        self.keyword_idf = self._idf_table(self.keyword_terms, count)
+        self.avg_content_length = (self._total_content_length / count) if count else 0.0
+        self.avg_keyword_length = (self._total_keyword_length / count) if count else 0.0
+        self._bm25_dirty = False
+
+    @staticmethod
+    def _idf_table(field_terms: Dict[str, Dict[int, int]], count: int) -> Dict[str, float]:
+        return {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in field_terms.items()
+        }
+
+    @staticmethod
+    def _score_field(scores: Dict[int, float], terms: Iterable[str], field_terms: Dict[str, Dict[int, int]],
+                     idf: Dict[str, float], lengths: List[int], avg_length: float, weight: float):
+        """Accumulate the BM25 contribution of one field into scores"""
+        for term in terms:
+            postings = field_terms.get(term)
+            term_idf = idf.get(term)
+            if not postings or term_idf is None:
+                continue
+            term_idf *= weight
+            for position, tf in tuple(postings.items()):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[position] / avg_length)
+                scores[position] = scores.get(position, 0.0) + term_idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+    def rank(self, query: str, category=None, top_k: int = 3) -> List[Tuple[float, Dict]]:
+        """Return the top_k (score, entry) pairs by BM25 over content and keywords"""
+        # Only an index changed since prepare() gets here dirty, never a published snapshot
+        self.prepare()
+        terms = set(TERM_PATTERN.findall(query.lower())) - STOP_WORDS
+        scores: Dict[int, float] = {}
+        self._score_field(scores, terms, self.content_terms, self.content_idf,
+                          self.content_lengths, self.avg_content_length, 1.0)
+        self._score_field(scores, terms, self.keyword_terms, self.keyword_idf,
+                          self.keyword_lengths, self.avg_keyword_length, KEYWORD_BOOST)
+
+        entries = self.entries
+        candidates = (
+            (score, -position) for position, score in scores.items()
+            if entries[position] is not None and (not category or self.categories[position] == category)
+        )
+        return [
+            (score, entries[-negated]) for score, negated in heapq.nlargest(top_k, candidates)
+        ]
+
+    def _index_token(self, token: str):
+        """Register a new content token under each of its trigrams"""
+        self._token_shorts[token] = frozenset(
+            token[start:start + size] for size in (1, 2) for start in range(len(token) - size + 1)
+        )
+        for start in range(len(token) - self.GRAM_SIZE + 1):
+            self.gram_index.setdefault(token[start:start + self.GRAM_SIZE], set()).add(token)
+
+    def _unindex_token(self, token: str):
+        del self._token_shorts[token]
+        for start in range(len(token) - self.GRAM_SIZE + 1):
+            gram = token[start:start + self.GRAM_SIZE]
+            tokens = self.gram_index.get(gram)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self.gram_index[gram]
+
+    def _match_phrases(self, query_lower: str) -> Set[int]:
+        """Entries having a keyword that is a substring of the query"""
+        matches = set()
+        for length in self.phrase_lengths:
+            if length > len(query_lower):
+                break
+            for start in range(len(query_lower) - length + 1):
+                postings = self.phrase_index.get(query_lower[start:start + length])
+                if postings:
+                    matches |= postings
+        return matches
+
+    def _match_word(self, word: str) -> Set[int]:
+        """Entries whose lowercased content contains the word as a substring"""
+        cached = self._word_cache.get(word)
+        if cached is not None:
+            return cached
+
+        if len(word) < self.GRAM_SIZE:
+            matches = set(self.short_index.get(word, ()))
+        else:
+            # A whitespace-free word occurs in the content only inside a single
+            # content token, so intersect trigram postings to find those tokens
+            grams = sorted(
+                (self.gram_index.get(word[start:start + self.GRAM_SIZE], set())
+                 for start in range(len(word) - self.GRAM_SIZE + 1)),
+                key=len
+            )
+            candidates = set(grams[0])
+            for tokens in grams[1:]:
+                if not candidates:
+                    break
+                candidates &= tokens
+            matches = set()
+            for token in candidates:
+                matches |= self.token_index.get(token, set()) if word in token else set()
+
+        if len(self._word_cache) >= self.WORD_CACHE_SIZE:
+            self._word_cache = {}
+        self._word_cache[word] = matches
+        return matches
+
+    def match_positions(self, query_lower: str) -> Set[int]:
+        """Positions of the entries a lowercased query matches"""
+        positions = self._match_phrases(query_lower)
+        for word in set(query_lower.split()):
+            positions |= self._match_word(word)
+        return positions
+
+    def search(self, query: str, category=None) -> List[Dict]:
+        """Return matching entries in index order"""
+        positions = self.match_positions(query.lower())
+        entries = self.entries
+        return [
+            entries[position] for position in sorted(positions)
+            if entries[position] is not None and (not category or self.categories[position] == category)
+        ]
+
+    def get_by_category(self, category: str) -> List[Dict]:
+        return [self.entries[position] for position in sorted(self.category_positions.get(category, ()))]
+
+    def get_all(self) -> List[Dict]:
+        return [entry for entry in self.entries if entry is not None]
+
+
+class Change(NamedTuple):
+    """One entry's state in a snapshot's pending changes; entry is None once removed"""
+    entry_id: str
+    entry: Optional[Dict]
+    category: Optional[str]
+    content_lower: str
+    content_terms: Dict[str, int]   # term -> frequency, as in KnowledgeIndex.content_terms
+    keyword_terms: Dict[str, int]
+    content_length: int
+    keyword_length: int
+
+    @classmethod
+    def upsert(cls, entry: Dict) -> "Change":
+        content_terms = TERM_PATTERN.findall(entry["content"].lower())
+        keyword_terms = TERM_PATTERN.findall(" ".join(entry["keywords"]).lower())
+        return cls(entry["id"], entry, entry["category"], entry["content"].lower(),
+                   _frequencies(content_terms), _frequencies(keyword_terms),
+                   len(content_terms), len(keyword_terms))
+
+    @classmethod
+    def removal(cls, entry_id: str) -> "Change":
+        return cls(entry_id, None, None, "", {}, {}, 0, 0)
+
+    def matches(self, query_lower: str, words: Set[str]) -> bool:
+        """The KnowledgeIndex.search rule, checked directly against this entry"""
+        return (any(keyword in query_lower for keyword in self.entry["keywords"])
+                or any(word in self.content_lower for word in words))
+
+
+def _frequencies(terms: List[str]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for term in terms:
+        counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+class KnowledgeSnapshot:
+    """Immutable view of the knowledge: a shared KnowledgeIndex plus pending changes.
+
+    Writers never touch the base index. apply() returns a new snapshot whose
+    change set holds the upserted and removed entries by position, so a write
+    costs as much as the changes pending, not the corpus. Searches consult
+    the base, hide the positions a change replaced, and check the changed
+    entries directly. merged() folds the changes into a new base; the
+    backends run it in the background once MERGE_THRESHOLD changes pile up.
+    """
+
+    def __init__(self, base: KnowledgeIndex, changes: Dict[int, Change] = None, next_position: int = None):
+        self.base = base
+        self.changes: Dict[int, Change] = changes or {}
+        self.next_position = max(next_position or 0, len(base.entries))
+
+        self._ids: Dict[str, Optional[int]] = {}  # changed entry id -> position, None when removed
+        for position, change in self.changes.items():
+            if change.entry is None:
+                self._ids.setdefault(change.entry_id, None)
+            else:
+                self._ids[change.entry_id] = position
+        self._live = sorted((position, change) for position, change in self.changes.items()
+                            if change.entry is not None)
+        # Base positions whose entry was replaced or removed
+        self.shadowed = frozenset(position for position in self.changes
+                                  if position < len(base.entries) and base.entries[position] is not None)
+
+        self.count = len(base) - len(self.shadowed) + len(self._live)
+        self.total_content_length = (base._total_content_length + sum(c.content_length for _, c in self._live)
+                                     - sum(base.content_lengths[p] for p in self.shadowed))
+        self.total_keyword_length = (base._total_keyword_length + sum(c.keyword_length for _, c in self._live)
+                                     - sum(base.keyword_lengths[p] for p in self.shadowed))
+
+    def __len__(self):
+        return self.count
+
+    def position(self, entry_id: str) -> Optional[int]:
+        """Current position of an entry, None when it is not present"""
+        if entry_id in self._ids:
+            return self._ids[entry_id]
+        return self.base.positions.get(entry_id)
+
+    def __contains__(self, entry_id: str) -> bool:
+        return self.position(entry_id) is not None
+
+    def apply(self, upserts: Iterable[Dict] = (), removals: Iterable[str] = ()) -> "KnowledgeSnapshot":
+        """New snapshot with the entries upserted, then the ids removed"""
+        changes = dict(self.changes)
+        ids: Dict[str, Optional[int]] = {}
+        next_position = self.next_position
+        lookup = lambda entry_id: ids[entry_id] if entry_id in ids else self.position(entry_id)  # noqa: E731
+        for entry in upserts:
+            position = lookup(entry["id"])
+            if position is None:
+                position, next_position = next_position, next_position + 1
+            changes[position] = Change.upsert(entry)
+            ids[entry["id"]] = position
+        for entry_id in removals:
+            position = lookup(entry_id)
+            if position is not None:
+                changes[position] = Change.removal(entry_id)
+                ids[entry_id] = None
+        return KnowledgeSnapshot(self.base, changes, next_position)
+
+    def merged(self) -> KnowledgeIndex:
+        """A prepared index holding the base with every change applied, at the same positions"""
+        index = self.base.copy()
+        for position in sorted(self.changes):
+            change = self.changes[position]
+            if change.entry is None:
+                if index.positions.get(change.entry_id) == position:
+                    index.remove(change.entry_id)
+                continue
+            if change.entry_id not in index.positions:
+                index.reserve(position)
+            index.upsert(change.entry)
+        index.reserve(self.next_position)
+        index.prepare()
+        return index
+
+    def rebased(self, merged: KnowledgeIndex, folded: Dict[int, Change]) -> "KnowledgeSnapshot":
+        """This snapshot over `merged`, which already holds the `folded` changes"""
+        changes = {position: change for position, change in self.changes.items() if folded.get(position) is not change}
+        return KnowledgeSnapshot(merged, changes, self.next_position)
+
+    def _entry(self, position: int) -> Dict:
+        change = self.changes.get(position)
+        return change.entry if change is not None else self.base.entries[position]
+
+    def _category(self, position: int) -> Optional[str]:
+        change = self.changes.get(position)
+        return change.category if change is not None else self.base.categories[position]
+
+    def search(self, query: str, category=None) -> List[Dict]:
+        """Return matching entries in index order"""
+        if not self.changes:
+            return self.base.search(query, category)
+        query_lower = query.lower()
+        positions = self.base.match_positions(query_lower) - self.shadowed
+        words = set(query_lower.split())
+        positions.update(position for position, change in self._live if change.matches(query_lower, words))
+        return [
+            self._entry(position) for position in sorted(positions)
+            if self._entry(position) is not None and (not category or self._category(position) == category)
+        ]
+
+    def rank(self, query: str, category=None, top_k: int = 3) -> List[Tuple[float, Dict]]:
+        """Return the top_k (score, entry) pairs by BM25 over content and keywords"""
+        if not self.changes:
+            return self.base.rank(query, category, top_k)
+        terms = set(TERM_PATTERN.findall(query.lower())) - STOP_WORDS
+        count, base, shadowed = self.count, self.base, self.shadowed
+        fields = (
+            (base.content_terms, base.content_lengths, self.total_content_length, 1.0,
+             lambda change: (change.content_terms, change.content_length)),
+            (base.keyword_terms, base.keyword_lengths, self.total_keyword_length, KEYWORD_BOOST,
+             lambda change: (change.keyword_terms, change.keyword_length)),
+        )
+        scores: Dict[int, float] = {}
+        for field_terms, lengths, total_length, weight, change_field in fields:
+            avg_length = total_length / count if count else 0.0
+            changed_fields = [(position, *change_field(change)) for position, change in self._live]
+            for term in terms:
+                postings = field_terms.get(term, {})
+                hits = [(position, tf, lengths[position]) for position, tf in postings.items()
+                        if position not in shadowed]
+                hits += [(position, terms_of[term], length) for position, terms_of, length in changed_fields
+                         if term in terms_of]
+                if not hits:
+                    continue
+                # Document frequency over this snapshot, as the IDF tables of a merged index would hold it
+                term_idf = weight * math.log(1 + (count - len(hits) + 0.5) / (len(hits) + 0.5))
+                for position, tf, length in hits:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    scores[position] = scores.get(position, 0.0) + term_idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        candidates = (
+            (score, -position) for position, score in scores.items()
+            if not category or self._category(position) == category
+        )
+        return [
+            (score, self._entry(-negated)) for score, negated in heapq.nlargest(top_k, candidates)
+        ]
+
+    def get_by_category(self, category: str) -> List[Dict]:
+        positions = set(self.base.category_positions.get(category, ())) - self.shadowed
+        positions.update(position for position, change in self._live if change.category == category)
+        return [self._entry(position) for position in sorted(positions)]
+
+    def get_all(self) -> List[Dict]:
+        base = ((position, entry) for position, entry in enumerate(self.base.entries)
+                if entry is not None and position not in self.shadowed)
+        changed = ((position, change.entry) for position, change in self._live)
+        return [entry for _, entry in heapq.merge(base, changed, key=lambda item: item[0])]
+
+
+def short_substrings(text: str) -> Set[str]:
+    """Distinct one and two character substrings of the whitespace-separated words of text"""
+    return {
+        token[start:start + size]
+        for token in set(text.lower().split())
+        for size in (1, 2)
+        for start in range(len(token) - size + 1)
+    }
+
+
+class KnowledgeBackend:
+    """Interface shared by all knowledge sources"""
+
+    def search(self, query: str, category: str = None) -> List[Dict]:
+        raise NotImplementedError
+
+    def search_ranked(self, query: str, category: str = None, top_k: int = 3) -> List[Tuple[float, Dict]]:
+        raise NotImplementedError
+
+    def get_by_category(self, category: str) -> List[Dict]:
+        raise NotImplementedError
+
+    def get_all(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def upsert(self, entry: Dict):
+        raise NotImplementedError
+
+    def upsert_many(self, entries: Iterable[Dict]):
+        for entry in entries:
+            self.upsert(entry)
+
+    def delete(self, entry_id: str) -> bool:
+        raise NotImplementedError
+
+    @property
+    def version(self) -> int:
+        """Counter that changes whenever the visible knowledge changes"""
+        raise NotImplementedError
+
+
+class InMemoryKnowledgeBackend(KnowledgeBackend):
+    """Knowledge held in process memory and answered from a KnowledgeIndex.
+
+    Readers take the current KnowledgeSnapshot with one attribute read and
+    never lock. Writers build the next snapshot under a lock, at the cost of
+    the pending changes, and swap it in; once `merge_threshold` changes are
+    pending a background thread folds them into a new index.
+    """
+
+    def __init__(self, knowledge_base: Dict[str, List[Dict]] = None, merge_threshold: int = MERGE_THRESHOLD):
+        self._index = KnowledgeSnapshot(KnowledgeIndex(knowledge_base or {}))
+        self.merge_threshold = merge_threshold
+        self._write_lock = threading.Lock()
+        self._merging = threading.Lock()
+        self._version = 0
+
+    def _publish(self, snapshot: KnowledgeSnapshot):
+        """Swap in a changed snapshot; call with _write_lock held"""
+        self._index = snapshot
+        self._version += 1
+        if len(snapshot.changes) >= self.merge_threshold and self._merging.acquire(blocking=False):
+            threading.Thread(target=self._merge_in_background, daemon=True).start()
+
+    def merge_changes(self):
+        """Fold the pending changes into a new index now"""
+        with self._merging:
+            self._merge()
+
+    def _merge(self):
+        # The copy is built without the write lock; writes meanwhile stay pending on the merged index
+        snapshot = self._index
+        if not snapshot.changes:
+            return
+        merged = snapshot.merged()
+        with self._write_lock:
+            current = self._index
+            if current.base is snapshot.base:  # not replaced by a reload meanwhile
+                self._index = current.rebased(merged, snapshot.changes)
+
+    def _merge_in_background(self):
+        try:
+            self._merge()
+        except Exception as e:
+            print(f"Failed to merge knowledge changes: {e}")
+        finally:
+            self._merging.release()
+
+    def search(self, query, category=None):
+        return self._index.search(query, category)
+
+    def search_ranked(self, query, category=None, top_k=3):
+        return self._index.rank(query, category, top_k)
+
+    def get_by_category(self, category):
+        return self._index.get_by_category(category)
+
+    def get_all(self):
+        return self._index.get_all()
+
+    def upsert(self, entry):
+        self.upsert_many([entry])
+
+    def upsert_many(self, entries):
+        with self._write_lock:
+            self._publish(self._index.apply(upserts=entries))
+
+    def delete(self, entry_id):
+        with self._write_lock:
+            if entry_id not in self._index:
+                return False
+            self._publish(self._index.apply(removals=[entry_id]))
+            return True
+
+    @property
+    def version(self):
+        return self._version
+
+
+class JSONLKnowledgeBackend(InMemoryKnowledgeBackend):
+    """Knowledge loaded from a JSONL file and reloaded when the file changes.
+
+    Each line is an entry ({"id", "category", "content", "keywords"}) or a
+    tombstone ({"id", "deleted": true}); later lines win. Updates append to
+    the file, and a changed mtime triggers a rebuild in a background thread
+    that swaps the new index in once it is ready.
+    """
+
+    def __init__(self, path: str, reload_interval: float = 2.0, merge_threshold: int = MERGE_THRESHOLD):
+        super().__init__(merge_threshold=merge_threshold)
+        self.path = path
+        self.reload_interval = reload_interval
+        self._file_signature = None
+        self._next_check = 0.0
+        self._reloading = threading.Lock()
+        self._reload()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_entries(self) -> Dict[str, List[Dict]]:
+        latest: Dict[str, Dict] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    row = json.loads(line)
+                    if row.get("deleted"):
+                        latest.pop(row["id"], None)
+                    else:
+                        latest[row["id"]] = row
+
+        knowledge_base: Dict[str, List[Dict]] = {}
+        for entry in latest.values():
+            knowledge_base.setdefault(entry["category"], []).append(entry)
+        return knowledge_base
+
+    def _reload(self):
+        """Rebuild the index from the file and swap it in"""
+        # Under the write lock so an upsert can't land between reading the file and the swap;
+        # readers keep using the previous index meanwhile
+        with self._write_lock:
+            signature = self._signature()
+            self._publish(KnowledgeSnapshot(KnowledgeIndex(self._read_entries())))
+            self._file_signature = signature
+
+    def _reload_in_background(self):
+        try:
+            self._reload()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Failed to reload knowledge from {self.path}: {e}")
+        finally:
+            self._reloading.release()
+
+    def maybe_reload(self):
+        """Start a background reload if the file changed since the last check"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+        if self._signature() == self._file_signature:
+            return
+        if self._reloading.acquire(blocking=False):
+            threading.Thread(target=self._reload_in_background, daemon=True).start()
+
+    def search(self, query, category=None):
+        self.maybe_reload()
+        return super().search(query, category)
+
+    def search_ranked(self, query, category=None, top_k=3):
+        self.maybe_reload()
+        return super().search_ranked(query, category, top_k)
+
+    def get_by_category(self, category):
+        self.maybe_reload()
+        return super().get_by_category(category)
+
+    def get_all(self):
+        self.maybe_reload()
+        return super().get_all()
+
+    def _append(self, rows: List[Dict]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        self._file_signature = self._signature()
+
+    def upsert_many(self, entries):
+        entries = list(entries)
+        with self._write_lock:
+            self._append(entries)
+            self._publish(self._index.apply(upserts=entries))
+
+    def delete(self, entry_id):
+        with self._write_lock:
+            if entry_id not in self._index:
+                return False
+            self._append([{"id": entry_id, "deleted": True}])
+            self._publish(self._index.apply(removals=[entry_id]))
+            return True
+
+    def compact(self):
+        """Rewrite the file without superseded lines and tombstones"""
+        with self._write_lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in self._index.get_all():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, self.path)
+            self._file_signature = self._signature()
+
+
+class SQLiteKnowledgeBackend(KnowledgeBackend):
+    """Knowledge stored in a SQLite file with FTS5 indexes.
+
+    A trigram FTS table answers the substring matches of search(), and a
+    unicode61 FTS table ranks search_ranked() with the built-in bm25().
+    Trigrams can't answer one or two character words, so those are looked
+    up in knowledge_shorts, which holds the short substrings of each entry.
+    Other processes may write to the same file; readers always see the
+    latest committed data.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS knowledge (
+            rowid INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            category TEXT NOT NULL,
+            content TEXT NOT NULL,
+            keywords TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS knowledge_category ON knowledge (category, rowid);
+        CREATE TABLE IF NOT EXISTS knowledge_keywords (
+            keyword TEXT NOT NULL,
+            entry_rowid INTEGER NOT NULL,
+            PRIMARY KEY (keyword, entry_rowid)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS knowledge_keywords_entry ON knowledge_keywords (entry_rowid);
+        CREATE TABLE IF NOT EXISTS knowledge_shorts (
+            substring TEXT NOT NULL,
+            entry_rowid INTEGER NOT NULL,
+            PRIMARY KEY (substring, entry_rowid)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS knowledge_shorts_entry ON knowledge_shorts (entry_rowid);
+        CREATE TABLE IF NOT EXISTS knowledge_meta (version INTEGER NOT NULL);
+        INSERT INTO knowledge_meta (version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM knowledge_meta);
+        CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_fts USING fts5(
+            content, keywords, content='knowledge', content_rowid='rowid'
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_trigram USING fts5(
+            content, content='knowledge', content_rowid='rowid', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS knowledge_ai AFTER INSERT ON knowledge BEGIN
+            INSERT INTO knowledge_fts (rowid, content, keywords) VALUES (new.rowid, new.content, new.keywords);
+            INSERT INTO knowledge_trigram (rowid, content) VALUES (new.rowid, new.content);
+            UPDATE knowledge_meta SET version = version + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS knowledge_au AFTER UPDATE ON knowledge BEGIN
+            INSERT INTO knowledge_fts (knowledge_fts, rowid, content, keywords)
+                VALUES ('delete', old.rowid, old.content, old.keywords);
+            INSERT INTO knowledge_trigram (knowledge_trigram, rowid, content)
+                VALUES ('delete', old.rowid, old.content);
+            INSERT INTO knowledge_fts (rowid, content, keywords) VALUES (new.rowid, new.content, new.keywords);
+            INSERT INTO knowledge_trigram (rowid, content) VALUES (new.rowid, new.content);
+            UPDATE knowledge_meta SET version = version + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS knowledge_ad AFTER DELETE ON knowledge BEGIN
+            INSERT INTO knowledge_fts (knowledge_fts, rowid, content, keywords)
+                VALUES ('delete', old.rowid, old.content, old.keywords);
+            INSERT INTO knowledge_trigram (knowledge_trigram, rowid, content)
+                VALUES ('delete', old.rowid, old.content);
+            DELETE FROM knowledge_keywords WHERE entry_rowid = old.rowid;
+            DELETE FROM knowledge_shorts WHERE entry_rowid = old.rowid;
+            UPDATE knowledge_meta SET version = version + 1;
+        END;
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        # Distinct keyword lengths, cached together with the version they were read at
+        self._phrase_lengths: Tuple[int, List[int]] = (-1, [])
+        with self._connect() as conn:
+            # Files created before knowledge_shorts existed: replace the delete trigger and fill the table
+            migrate = (self._has_table(conn, "knowledge") and not self._has_table(conn, "knowledge_shorts"))
+            if migrate:
+                conn.execute("DROP TRIGGER IF EXISTS knowledge_ad")
+            conn.executescript(self.SCHEMA)
+            if migrate:
+                for rowid, content in conn.execute("SELECT rowid, content FROM knowledge").fetchall():
+                    self._index_shorts(conn, rowid, content)
+
+    @staticmethod
+    def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+    @staticmethod
+    def _index_shorts(conn: sqlite3.Connection, rowid: int, content: str):
+        conn.execute("DELETE FROM knowledge_shorts WHERE entry_rowid = ?", (rowid,))
+        conn.executemany(
+            "INSERT INTO knowledge_shorts (substring, entry_rowid) VALUES (?, ?)",
+            [(substring, rowid) for substring in short_substrings(content)]
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Per-thread connection; WAL lets readers run alongside a writer"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _phrase_lengths_for(self, conn: sqlite3.Connection) -> List[int]:
+        """Distinct keyword lengths, re-read only after the data changed"""
+        version = conn.execute("SELECT version FROM knowledge_meta").fetchone()[0]
+        cached_version, lengths = self._phrase_lengths
+        if cached_version != version:
+            lengths = [
+                row[0] for row in conn.execute(
+                    "SELECT DISTINCT length(keyword) FROM knowledge_keywords ORDER BY 1")
+            ]
+            self._phrase_lengths = (version, lengths)
+        return lengths
+
+    @staticmethod
+    def _row_to_entry(row: sqlite3.Row) -> Dict:
+        return {
+            "id": row["id"],
+            "content": row["content"],
+            "keywords": json.loads(row["keywords"]),
+            "category": row["category"],
+        }
+
+    @staticmethod
+    def _quote(term: str) -> str:
+        return '"' + term.replace('"', '""') + '"'
+
+    def _fetch(self, conn, where: str, params: list, category: str = None) -> List[Dict]:
+        sql = f"SELECT * FROM knowledge WHERE ({where})"
+        if category:
+            sql += " AND category = ?"
+            params = params + [category]
+        return [self._row_to_entry(row) for row in conn.execute(sql + " ORDER BY rowid", params)]
+
+    def search(self, query, category=None):
+        conn = self._connect()
+        query_lower = query.lower()
+        substrings = {
+            query_lower[start:start + length]
+            for length in self._phrase_lengths_for(conn)
+            for start in range(len(query_lower) - length + 1)
+        }
+
+        words = set(query_lower.split())
+        long_words = sorted(w for w in words if len(w) >= 3)
+        short_words = sorted(w for w in words if len(w) < 3)
+
+        # Collect matching rowids with a UNION so each source can use its own index.
+        # Lists are bound as one JSON array each, so a long query never runs into
+        # SQLite's limit on bound parameters
+        sources, params = [], []
+        if substrings:
+            sources.append("SELECT entry_rowid FROM knowledge_keywords WHERE keyword IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(sorted(substrings)))
+        if long_words:
+            sources.append("SELECT rowid FROM knowledge_trigram WHERE knowledge_trigram MATCH ?")
+            params.append(" OR ".join(self._quote(w) for w in long_words))
+        if short_words:
+            sources.append("SELECT entry_rowid FROM knowledge_shorts WHERE substring IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(short_words))
+
+        if not sources:
+            return []
+        return self._fetch(conn, "rowid IN (" + " UNION ".join(sources) + ")", params, category)
+
+    def search_ranked(self, query, category=None, top_k=3):
+        conn = self._connect()
+        terms = set(TERM_PATTERN.findall(query.lower())) - STOP_WORDS
+        if not terms:
+            return []
+        sql = (
+            "SELECT k.*, bm25(knowledge_fts, 1.0, ?) AS score FROM knowledge_fts "
+            "JOIN knowledge k ON k.rowid = knowledge_fts.rowid WHERE knowledge_fts MATCH ?"
+        )
+        params = [KEYWORD_BOOST, " OR ".join(self._quote(t) for t in terms)]
+        if category:
+            sql += " AND k.category = ?"
+            params.append(category)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(top_k)
+        # bm25() returns lower-is-better scores; negate for a common scale
+        return [(-row["score"], self._row_to_entry(row)) for row in conn.execute(sql, params)]
+
+    def get_by_category(self, category):
+        return self._fetch(self._connect(), "category = ?", [category])
+
+    def get_all(self):
+        return self._fetch(self._connect(), "1", [])
+
+    def upsert(self, entry):
+        self.upsert_many([entry])
+
+    def upsert_many(self, entries):
+        conn = self._connect()
+        with conn:
+            for entry in entries:
+                conn.execute(
+                    "INSERT INTO knowledge (id, category, content, keywords) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET category = excluded.category, "
+                    "content = excluded.content, keywords = excluded.keywords",
+                    (entry["id"], entry["category"], entry["content"], json.dumps(entry["keywords"]))
+                )
+                rowid = conn.execute("SELECT rowid FROM knowledge WHERE id = ?", (entry["id"],)).fetchone()[0]
+                conn.execute("DELETE FROM knowledge_keywords WHERE entry_rowid = ?", (rowid,))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO knowledge_keywords (keyword, entry_rowid) VALUES (?, ?)",
+                    [(keyword, rowid) for keyword in entry["keywords"]]
+                )
+                self._index_shorts(conn, rowid, entry["content"])
+
+    def delete(self, entry_id):
+        conn = self._connect()
+        with conn:
+            deleted = conn.execute("DELETE FROM knowledge WHERE id = ?", (entry_id,)).rowcount
+        return bool(deleted)
+
+    @property
+    def version(self):
+        return self._connect().execute("SELECT version FROM knowledge_meta").fetchone()[0]
+
+
+def open_knowledge_backend(source: str) -> KnowledgeBackend:
+    """Open a knowledge backend for a .jsonl or SQLite (.db/.sqlite/.sqlite3) file"""
+    if source.endswith(".jsonl"):
+        return JSONLKnowledgeBackend(source)
+    if source.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteKnowledgeBackend(source)
+    raise ValueError(f"Unsupported knowledge source: {source}")
@@ -3,89 +3,408 @@ RAG-based Chatbot with Memory for Career Assistant
 Implements Retrieval-Augmented Generation with conversation memory
 """
 
+import atexit
+import itertools
 import json
-import uuid
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Any
-from career_knowledge_base import search_knowledge, get_knowledge_by_category
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Sequence, Tuple
+from career_knowledge_base import (
+    search_knowledge,
+    search_knowledge_ranked,
+    get_knowledge_by_category,
+    get_all_knowledge,
+    get_knowledge_backend,
+)
+from semantic_retriever import SemanticRetriever, reciprocal_rank_fusion
+from chat_memory_store import ChatMemoryStore, open_chat_memory_store
+from career_assistant_backend.app.utils.keyword_matcher import KeywordMatcher
+
+INDUSTRIES = ["tech", "technology", "software", "finance", "healthcare", "marketing", "sales"]
+
+# Preference signals in user messages, labelled "<preference>:<value>"
+PREFERENCE_MATCHER = KeywordMatcher({
+    "experience:entry": ["intern", "interns", "internship", "internships", "entry level", "beginner", "beginners"],
+    "experience:senior": ["senior", "seniors", "seniority", "experienced", "5 years",
+                          "lead", "leads", "leader", "leaders", "leadership", "leading"],
+    "experience:mid": ["junior", "2 years", "3 years"],
+    "location:remote": ["remote", "remotely"],
+    "location:india": ["bangalore", "mumbai", "delhi", "hyderabad", "chennai"],
+    **{f"industry:{industry}": [industry] for industry in INDUSTRIES},
+})
+
+# Topics that add targeted suggestions to a response
+TOPIC_MATCHER = KeywordMatcher({
+    "interview": ["interview", "interviews", "interviewed", "interviewer", "interviewers", "interviewing"],
+    "resume": ["resume", "resumes"],
+    "salary": ["salary", "salaries"],
+})
+
+class StoredMessage:
+    """Compact in-memory record of one conversation message"""
+    
+    __slots__ = ("id", "role", "content", "timestamp", "metadata")
+    
+    def __init__(self, message_id: int, role: str, content: str, timestamp: float, metadata: Dict = None):
+        self.id = message_id
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp
+        self.metadata = metadata  # None when empty
+    
+    def to_dict(self) -> Dict:
+        """Convert to the message dict shape returned by the public API"""
+        return {
+            "id": str(self.id),
+            "role": self.role,
+            "content": self.content,
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat(),
+            "metadata": self.metadata or {}
+        }
+
+# Marks a session that has to be read from the store before it can be used
+_UNREAD = object()
 
 class ChatMemory:
-    """Manages conversation memory and context"""
+    """Manages conversation memory and context.
+    
+    Sessions are evicted when idle for longer than session_ttl seconds, when
+    more than max_sessions are live (least recently used first), or when the
+    approximate size of all stored messages exceeds max_bytes. Each limit is
+    optional. Expiry is lazy: every add_message checks a few of the least
+    recently used sessions, and reads drop an expired session they touch.
     
-    def __init__(self, max_messages=10):
+    With a store, the sessions held here act as a read-through, write-behind
+    cache: a missing session is loaded from the store, new messages are
+    queued and written in batches every flush_interval seconds (or once
+    flush_batch messages are waiting), and a cached session is re-read after
+    revalidate_after seconds so turns served by other workers show up.
+    Store reads happen outside the lock, so a slow read only holds up its own
+    session. While the store is failing at most max_pending messages stay
+    queued; older ones are dropped and counted in dropped_writes.
+    """
+    
+    INDUSTRIES = INDUSTRIES
+    
+    # Approximate per-message cost beyond its content, for the byte budget
+    MESSAGE_OVERHEAD_BYTES = 120
+    # Idle sessions checked for expiry on each add_message
+    EXPIRY_CHECKS_PER_ADD = 4
+    
+    def __init__(self, max_messages=10, max_sessions: int = None, session_ttl: float = None,
+                 max_bytes: int = None, store: ChatMemoryStore = None, flush_interval: float = 0.5,
+                 flush_batch: int = 256, revalidate_after: float = 2.0, max_pending: int = 10000):
         self.max_messages = max_messages
-        self.conversations = {}  # session_id -> conversation history
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.max_bytes = max_bytes
+        # session_id -> deque of StoredMessage, oldest dropped first; ordered least recently used first
+        self.conversations = OrderedDict()
+        self.preferences = {}  # session_id -> preferences folded from user messages
+        self._last_used = {}  # session_id -> monotonic time of last access
+        self._session_bytes = {}  # session_id -> approximate bytes held
+        self.total_bytes = 0
+        self.evictions = {"ttl": 0, "lru": 0, "bytes": 0}
+        self._message_ids = itertools.count(1)
+        self._lock = threading.RLock()
+        
+        # Write-behind state, only used with a store
+        self.store = store
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.revalidate_after = revalidate_after
+        self.max_pending = max_pending
+        self.dropped_writes = 0
+        self._loaded_at = {}  # session_id -> monotonic time the session was read from the store
+        self._pending = {}  # session_id -> [message rows, latest preferences] not yet written
+        self._pending_count = 0
+        self._flushing = set()
+        self._flush_wakeup = threading.Event()
+        self._closed = False
+        if store is not None:
+            threading.Thread(target=self._flush_loop, name="chat-memory-flush", daemon=True).start()
+            atexit.register(self.close)
     
     def add_message(self, session_id: str, role: str, content: str, metadata: Dict = None):
         """Add a message to conversation history"""
-        if session_id not in self.conversations:
-            self.conversations[session_id] = []
-        
-        message = {
-            "id": str(uuid.uuid4()),
-            "role": role,  # 'user' or 'assistant'
-            "content": content,
-            "timestamp": datetime.now().isoformat(),
-            "metadata": metadata or {}
-        }
+        with self._session(session_id) as (messages, now):
+            if messages is None:
+                messages = self._new_session(session_id, now)
+            
+            # role is 'user' or 'assistant'; interned so every message shares one string
+            message = StoredMessage(next(self._message_ids), sys.intern(role), content,
+                                    time.time(), metadata or None)
+            self._append(session_id, messages, message)
+            
+            # Fold the new message into the session's preferences
+            if role == "user":
+                self._fold_preferences(self.preferences[session_id], content)
+            
+            if self.store is not None:
+                self._queue_write(session_id, message)
+            
+            self._enforce_limits(now)
+    
+    def _new_session(self, session_id: str, now: float) -> deque:
+        # The deque keeps only the most recent max_messages messages
+        messages = self.conversations[session_id] = deque(maxlen=self.max_messages)
+        self.preferences[session_id] = self._empty_preferences()
+        self._last_used[session_id] = now
+        self._loaded_at[session_id] = now
+        self._session_bytes[session_id] = 0
+        return messages
+    
+    def _append(self, session_id: str, messages: deque, message: StoredMessage):
+        """Append to a session's ring buffer, keeping the byte accounting current"""
+        size = len(message.content) + self.MESSAGE_OVERHEAD_BYTES
+        if len(messages) == messages.maxlen:
+            size -= len(messages[0].content) + self.MESSAGE_OVERHEAD_BYTES
+        self._session_bytes[session_id] += size
+        self.total_bytes += size
+        messages.append(message)
+    
+    @contextmanager
+    def _session(self, session_id: str):
+        """Hold the lock with (messages or None, now) for a session.
+        
+        A session that has to come from the store is read with the lock
+        released, then checked again and installed once it is re-taken.
+        """
+        record = _UNREAD
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                messages = self._touch(session_id, now, record)
+                if messages is not _UNREAD:
+                    yield messages, now
+                    return
+            record = self.store.load(session_id, self.max_messages)
+    
+    def _touch(self, session_id: str, now: float, record=_UNREAD):
+        """Mark a session as just used; returns its messages, or None if absent or expired.
         
-        self.conversations[session_id].append(message)
+        With a store, a session missing here is installed from `record`, or
+        _UNREAD is returned when the caller still has to read it.
+        """
+        messages = self.conversations.get(session_id)
+        if messages is not None:
+            if self.session_ttl is not None and now - self._last_used[session_id] > self.session_ttl:
+                self._evict(session_id, "ttl")
+                messages = None
+            elif (self.store is not None and now - self._loaded_at[session_id] > self.revalidate_after
+                  and session_id not in self._pending and session_id not in self._flushing):
+                # Another worker may have extended the session since it was cached
+                self._drop(session_id)
+                messages = None
         
-        # Keep only recent messages
-        if len(self.conversations[session_id]) > self.max_messages:
-            self.conversations[session_id] = self.conversations[session_id][-self.max_messages:]
+        if messages is None:
+            if self.store is None or record is _UNREAD:
+                return None if self.store is None else _UNREAD
+            return self._install(session_id, now, record)
+        
+        self.conversations.move_to_end(session_id)
+        self._last_used[session_id] = now
+        return messages
+    
+    def _install(self, session_id: str, now: float, record):
+        """Put a session read from the store into the local cache"""
+        if record is None:
+            return None
+        rows, preferences = record
+        messages = self._new_session(session_id, now)
+        for role, content, timestamp, metadata in rows:
+            self._append(session_id, messages, StoredMessage(
+                next(self._message_ids), sys.intern(role), content, timestamp, metadata or None))
+        self.preferences[session_id].update(preferences)
+        return messages
+    
+    def _drop(self, session_id: str):
+        del self.conversations[session_id]
+        self.preferences.pop(session_id, None)
+        self._last_used.pop(session_id, None)
+        self._loaded_at.pop(session_id, None)
+        self.total_bytes -= self._session_bytes.pop(session_id, 0)
+    
+    def _evict(self, session_id: str, reason: str):
+        self._drop(session_id)
+        self.evictions[reason] += 1
+    
+    def _queue_write(self, session_id: str, message: StoredMessage):
+        pending = self._pending.setdefault(session_id, [[], None])
+        pending[0].append((message.role, message.content, message.timestamp, message.metadata))
+        preferences = self.preferences[session_id]
+        pending[1] = {**preferences, "interests": list(preferences["interests"])}
+        self._pending_count += 1
+        self._trim_pending()
+        if self._pending_count >= self.flush_batch:
+            self._flush_wakeup.set()
+    
+    def _trim_pending(self):
+        """Drop the oldest queued messages beyond max_pending, e.g. while the store is down"""
+        excess = self._pending_count - self.max_pending
+        for rows, _ in self._pending.values():
+            if excess <= 0:
+                break
+            dropped = min(excess, len(rows))
+            # The session's latest preferences are still written
+            del rows[:dropped]
+            excess -= dropped
+            self._pending_count -= dropped
+            self.dropped_writes += dropped
+    
+    def flush(self):
+        """Write every queued message to the store in one batch"""
+        if self.store is None:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._pending_count = 0
+            self._flushing = set(pending)
+        if not pending:
+            return
+        try:
+            self.store.write({session_id: tuple(write) for session_id, write in pending.items()},
+                             keep=self.max_messages)
+        except Exception as e:
+            print(f"Failed to write chat memory, will retry: {e}")
+            with self._lock:
+                for session_id, (rows, preferences) in pending.items():
+                    queued = self._pending.setdefault(session_id, [[], preferences])
+                    queued[0][:0] = rows
+                    self._pending_count += len(rows)
+                self._trim_pending()
+        finally:
+            with self._lock:
+                self._flushing = set()
+    
+    def _flush_loop(self):
+        while not self._closed:
+            self._flush_wakeup.wait(self.flush_interval)
+            self._flush_wakeup.clear()
+            self.flush()
+    
+    def close(self):
+        """Flush queued writes and release the store"""
+        if self.store is None or self._closed:
+            return
+        self._closed = True
+        self._flush_wakeup.set()
+        self.flush()
+        self.store.close()
+    
+    def _enforce_limits(self, now: float):
+        """Evict expired, surplus and over-budget sessions, least recently used first"""
+        if self.session_ttl is not None:
+            for _ in range(self.EXPIRY_CHECKS_PER_ADD):
+                oldest = next(iter(self.conversations))
+                if now - self._last_used[oldest] <= self.session_ttl:
+                    break
+                self._evict(oldest, "ttl")
+        
+        if self.max_sessions is not None:
+            while len(self.conversations) > self.max_sessions:
+                self._evict(next(iter(self.conversations)), "lru")
+        
+        if self.max_bytes is not None:
+            while self.total_bytes > self.max_bytes and len(self.conversations) > 1:
+                self._evict(next(iter(self.conversations)), "bytes")
+    
+    def get_stats(self) -> Dict:
+        """Live session count, approximate bytes held and evictions by reason"""
+        return {
+            "live_sessions": len(self.conversations),
+            "total_bytes": self.total_bytes,
+            "evictions": dict(self.evictions),
+            "pending_writes": self._pending_count,
+            "dropped_writes": self.dropped_writes
+        }
     
     def get_conversation_context(self, session_id: str, max_messages: int = 5) -> List[Dict]:
         """Get recent conversation context"""
-        if session_id not in self.conversations:
-            return []
-        
-        return self.conversations[session_id][-max_messages:]
+        with self._session(session_id) as (messages, _):
+            if messages is None:
+                return []
+            
+            return [message.to_dict() for message in list(messages)[-max_messages:]]
     
-    def get_user_preferences(self, session_id: str) -> Dict:
-        """Extract user preferences from conversation history"""
-        if session_id not in self.conversations:
-            return {}
-        
-        preferences = {
+    @staticmethod
+    def _empty_preferences() -> Dict:
+        return {
             "interests": [],
             "experience_level": None,
             "industry": None,
             "location": None
         }
+    
+    def _fold_preferences(self, preferences: Dict, content: str):
+        """Update preferences with what a single user message reveals"""
+        labels = PREFERENCE_MATCHER.matches(content)
+        if not labels:
+            return
         
-        # Analyze conversation for preferences
-        for message in self.conversations[session_id]:
-            if message["role"] == "user":
-                content = message["content"].lower()
-                
-                # Extract experience level
-                if any(word in content for word in ["intern", "internship", "entry level", "beginner"]):
-                    preferences["experience_level"] = "entry"
-                elif any(word in content for word in ["senior", "experienced", "5 years", "lead"]):
-                    preferences["experience_level"] = "senior"
-                elif any(word in content for word in ["junior", "2 years", "3 years"]):
-                    preferences["experience_level"] = "mid"
-                
-                # Extract industry interests
-                industries = ["tech", "technology", "software", "finance", "healthcare", "marketing", "sales"]
-                for industry in industries:
-                    if industry in content:
-                        preferences["interests"].append(industry)
-                
-                # Extract location
-                if "remote" in content:
-                    preferences["location"] = "remote"
-                elif any(city in content for city in ["bangalore", "mumbai", "delhi", "hyderabad", "chennai"]):
-                    preferences["location"] = "india"
-        
-        return preferences
+        # Extract experience level
+        if "experience:entry" in labels:
+            preferences["experience_level"] = "entry"
+        elif "experience:senior" in labels:
+            preferences["experience_level"] = "senior"
+        elif "experience:mid" in labels:
+            preferences["experience_level"] = "mid"
+        
+        # Extract industry interests
+        for industry in self.INDUSTRIES:
+            if f"industry:{industry}" in labels and industry not in preferences["interests"]:
+                preferences["interests"].append(industry)
+        
+        # Extract location
+        if "location:remote" in labels:
+            preferences["location"] = "remote"
+        elif "location:india" in labels:
+            preferences["location"] = "india"
+    
+    def get_user_preferences(self, session_id: str) -> Dict:
+        """Get user preferences extracted from conversation history"""
+        with self._session(session_id) as (messages, _):
+            if messages is None:
+                return {}
+            preferences = self.preferences[session_id]
+            
+            return {**preferences, "interests": list(preferences["interests"])}
+    
+    def rebuild_preferences(self, session_id: str) -> Dict:
+        """Recompute preferences from the messages currently held for a session.
+        
+        Use after messages were evicted or history was reloaded; otherwise
+        preferences keep what earlier, since-dropped messages revealed.
+        """
+        with self._session(session_id) as (messages, _):
+            if messages is None:
+                return {}
+            
+            preferences = self._empty_preferences()
+            for message in messages:
+                if message.role == "user":
+                    self._fold_preferences(preferences, message.content)
+            self.preferences[session_id] = preferences
+            return {**preferences, "interests": list(preferences["interests"])}
 
 class RAGChatbot:
     """RAG-based chatbot with memory and context awareness"""
     
-    def __init__(self):
-        self.memory = ChatMemory()
+    RETRIEVAL_MODES = ("keyword", "semantic", "hybrid")
+    
+    def __init__(self, retrieval_mode: str = "hybrid", memory: ChatMemory = None):
+        if retrieval_mode not in self.RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {retrieval_mode}")
+        self.memory = memory or ChatMemory()
+        self.retrieval_mode = retrieval_mode
+        self._semantic = None
+        self._semantic_key = None
         self.system_prompt = """You are a helpful career assistant AI. You provide personalized career advice based on the user's context and conversation history. 
         
         Guidelines:
@@ -97,31 +416,107 @@ class RAGChatbot:
         - Ask follow-up questions when appropriate
         """
     
-    def retrieve_relevant_knowledge(self, query: str, user_preferences: Dict) -> List[Dict]:
+    def semantic_retriever(self) -> SemanticRetriever:
+        """Get the semantic retriever, refitting it when the knowledge base changed"""
+        backend = get_knowledge_backend()
+        key = (id(backend), backend.version)
+        if key != self._semantic_key:
+            self._semantic = SemanticRetriever().fit(get_all_knowledge())
+            self._semantic_key = key
+        return self._semantic
+    
+    def retrieve_relevant_knowledge(self, query: str, user_preferences: Dict, top_k: int = 3,
+                                    category: str = None) -> List[Dict]:
         """Retrieve relevant knowledge based on query and user context"""
-        # Search knowledge base
-        knowledge_results = search_knowledge(query)
+        knowledge_results = self.retrieve_relevant_knowledge_batch([query], top_k, category)[0]
         
         # Filter by user preferences if available
         if user_preferences.get("experience_level"):
             # Could add experience-specific filtering here
             pass
         
-        # Return top 3 most relevant results
-        return knowledge_results[:3]
+        return knowledge_results
+    
+    def retrieve_relevant_knowledge_batch(self, queries: Sequence[str], top_k: int = 3,
+                                          category: str = None) -> List[List[Dict]]:
+        """Retrieve relevant knowledge for many queries, embedding them together"""
+        rankings = [[] for _ in queries]
+        
+        # Rank knowledge base entries by BM25
+        if self.retrieval_mode in ("keyword", "hybrid"):
+            for query, query_rankings in zip(queries, rankings):
+                query_rankings.append(search_knowledge_ranked(query, category, top_k * 2))
+        
+        # Rank by local embedding similarity, one matrix product for the whole batch
+        if self.retrieval_mode in ("semantic", "hybrid"):
+            semantic_results = self.semantic_retriever().search_batch(queries, top_k * 2, category)
+            for results, query_rankings in zip(semantic_results, rankings):
+                query_rankings.append([entry for _, entry in results])
+        
+        batch_results = []
+        for query, query_rankings in zip(queries, rankings):
+            knowledge_results = reciprocal_rank_fusion(query_rankings, top_k)
+            
+            # Fall back to partial-word matches when nothing ranked
+            if not knowledge_results:
+                knowledge_results = search_knowledge(query, category)[:top_k]
+            batch_results.append(knowledge_results)
+        
+        return batch_results
     
     def generate_response(self, query: str, session_id: str) -> Dict:
         """Generate response using RAG pipeline"""
         
-        # Get conversation context
-        context = self.memory.get_conversation_context(session_id)
-        
         # Get user preferences
         user_preferences = self.memory.get_user_preferences(session_id)
         
         # Retrieve relevant knowledge
         relevant_knowledge = self.retrieve_relevant_knowledge(query, user_preferences)
         
+        return self._respond(query, session_id, relevant_knowledge, user_preferences)
+    
+    def generate_responses(self, batch: Sequence[Tuple[str, str]], max_workers: int = 8) -> List[Dict]:
+        """Generate responses for (session_id, query) pairs.
+        
+        Retrieval runs once for the whole batch. Different sessions are
+        handled concurrently, while each session's queries are answered in
+        batch order, so every result matches what generate_response would
+        return for the same sequence of calls.
+        """
+        relevant_knowledge = self.retrieve_relevant_knowledge_batch([query for _, query in batch])
+        
+        sessions: Dict[str, List[int]] = {}
+        for position, (session_id, _) in enumerate(batch):
+            sessions.setdefault(session_id, []).append(position)
+        
+        responses: List[Dict] = [None] * len(batch)
+        
+        def respond_in_order(positions: List[int]):
+            for position in positions:
+                session_id, query = batch[position]
+                responses[position] = self._respond(query, session_id, relevant_knowledge[position])
+        
+        if len(sessions) <= 1 or max_workers <= 1:
+            for positions in sessions.values():
+                respond_in_order(positions)
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(sessions))) as executor:
+                # list() re-raises the first exception from any session
+                list(executor.map(respond_in_order, sessions.values()))
+        
+        return responses
+    
+    def _respond(self, query: str, session_id: str, relevant_knowledge: List[Dict],
+                 user_preferences: Dict = None) -> Dict:
+        """Answer one query from already retrieved knowledge and record the turn"""
+        
+        # Get conversation context
+        context = self.memory.get_conversation_context(session_id)
+        
+        # Get user preferences
+        if user_preferences is None:
+            user_preferences = self.memory.get_user_preferences(session_id)
+        
         # Add user message to memory
         self.memory.add_message(session_id, "user", query)
         
@@ -169,19 +564,20 @@ class RAGChatbot:
             ])
         
         # Add context-aware suggestions
-        if "interview" in query.lower():
+        topics = TOPIC_MATCHER.matches(query)
+        if "interview" in topics:
             suggestions.extend([
                 "Practice with mock interviews",
                 "Prepare specific examples using the STAR method",
                 "Research the company thoroughly"
             ])
-        elif "resume" in query.lower():
+        elif "resume" in topics:
             suggestions.extend([
                 "Tailor your resume for each application",
                 "Use action verbs and quantify achievements",
                 "Keep it to 1-2 pages maximum"
             ])
-        elif "salary" in query.lower():
+        elif "salary" in topics:
             suggestions.extend([
                 "Research market rates for your role",
                 "Consider total compensation package",
@@ -213,5 +609,12 @@ class RAGChatbot:
             "recent_topics": [msg["content"][:50] + "..." for msg in context[-3:] if msg["role"] == "user"]
         }
 
+def _default_memory() -> ChatMemory:
+    """Memory backed by the shared store at CHAT_MEMORY_STORE, if one is configured"""
+    source = os.getenv("CHAT_MEMORY_STORE")
+    if source:
+        return ChatMemory(store=open_chat_memory_store(source))
+    return ChatMemory()
+
 # Global chatbot instance
-rag_chatbot = RAGChatbot()
+rag_chatbot = RAGChatbot(memory=_default_memory())
@@ -0,0 +1,176 @@
+"""
+Local semantic retrieval for the career knowledge base
+Hashed TF-IDF vectors kept in one L2-normalized NumPy matrix and searched
+with a single matrix product; runs offline on CPU
+"""
+
+import re
+import zlib
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from knowledge_store import STOP_WORDS
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Everyday phrasings mapped onto the vocabulary used by the knowledge base
+CONCEPT_SYNONYMS: Dict[str, List[str]] = {
+    "money": ["salary", "compensation", "pay"],
+    "pay": ["salary", "compensation"],
+    "paid": ["salary", "compensation"],
+    "raise": ["salary", "negotiation"],
+    "wage": ["salary", "compensation"],
+    "wages": ["salary", "compensation"],
+    "earn": ["salary", "compensation"],
+    "package": ["compensation", "benefits"],
+    "offer": ["negotiation", "compensation"],
+    "cv": ["resume"],
+    "hired": ["job", "application", "interview"],
+    "hire": ["job", "application"],
+    "employer": ["company"],
+    "employers": ["company"],
+    "boss": ["manager"],
+    "promotion": ["growth", "career", "goals"],
+    "promoted": ["growth", "career", "goals"],
+    "study": ["learning", "courses"],
+    "learn": ["learning", "courses", "skills"],
+    "upskill": ["learning", "skills", "certifications"],
+    "contacts": ["networking", "connections"],
+    "mentor": ["mentors", "networking"],
+    "wfh": ["remote", "work"],
+    "home": ["remote"],
+    "coding": ["technical", "leetcode"],
+    "programming": ["coding", "technical"],
+    "nervous": ["interview", "practice"],
+}
+
+
+class HashingVectorizer:
+    """Map text to hashed word and character n-gram features with signed buckets"""
+
+    def __init__(self, n_features: int = 1024, char_ngram: int = 4, char_weight: float = 0.5):
+        self.n_features = n_features
+        self.char_ngram = char_ngram
+        self.char_weight = char_weight
+
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        digest = zlib.crc32(feature.encode("utf-8"))
+        return digest % self.n_features, (1.0 if digest & 0x80000000 else -1.0)
+
+    def words(self, text: str, expand: bool = False) -> List[str]:
+        words = [w for w in WORD_PATTERN.findall(text.lower()) if w not in STOP_WORDS]
+        if expand:
+            words += [synonym for w in words for synonym in CONCEPT_SYNONYMS.get(w, ())]
+        return words
+
+    def features(self, text: str, expand: bool = False) -> Dict[int, float]:
+        """Return bucket -> signed term weight for one text"""
+        counts: Dict[int, float] = {}
+        n = self.char_ngram
+        for word in self.words(text, expand):
+            bucket, sign = self._bucket("w:" + word)
+            counts[bucket] = counts.get(bucket, 0.0) + sign
+            padded = f" {word} "
+            for start in range(len(padded) - n + 1):
+                bucket, sign = self._bucket("c:" + padded[start:start + n])
+                counts[bucket] = counts.get(bucket, 0.0) + sign * self.char_weight
+        return counts
+
+
+class SemanticRetriever:
+    """Cosine-similarity search over knowledge entries in a dense embedding matrix"""
+
+    def __init__(self, vectorizer: HashingVectorizer = None, min_score: float = 0.1):
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.min_score = min_score
+        self.entries: List[Dict] = []
+        self.matrix = np.zeros((0, self.vectorizer.n_features), dtype=np.float32)
+        self.idf = np.ones(self.vectorizer.n_features, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def fit(self, entries: Sequence[Dict]):
+        """Embed every entry (content plus keywords) into the matrix"""
+        n_features = self.vectorizer.n_features
+        doc_features = [
+            self.vectorizer.features(entry["content"] + " " + " ".join(entry["keywords"]))
+            for entry in entries
+        ]
+
+        df = np.zeros(n_features, dtype=np.float32)
+        for features in doc_features:
+            df[list(features)] += 1
+        idf = np.log((1 + len(entries)) / (1 + df)).astype(np.float32) + 1
+
+        matrix = np.zeros((len(entries), n_features), dtype=np.float32)
+        for row, features in enumerate(doc_features):
+            if features:
+                matrix[row, list(features)] = list(features.values())
+        matrix *= idf
+        self.matrix = self._normalize(matrix)
+        self.idf = idf
+        self.entries = list(entries)
+        return self
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_queries(self, queries: Sequence[str]) -> np.ndarray:
+        """Embed queries, expanded with concept synonyms, as L2-normalized rows"""
+        vectors = np.zeros((len(queries), self.vectorizer.n_features), dtype=np.float32)
+        for row, query in enumerate(queries):
+            features = self.vectorizer.features(query, expand=True)
+            if features:
+                vectors[row, list(features)] = list(features.values())
+        return self._normalize(vectors * self.idf)
+
+    def search_batch(self, queries: Sequence[str], top_k: int = 3,
+                     category: str = None) -> List[List[Tuple[float, Dict]]]:
+        """Return the top_k (score, entry) pairs for every query in one matrix product"""
+        if not queries:
+            return []
+        if not self.entries:
+            return [[] for _ in queries]
+
+        scores = self.embed_queries(queries) @ self.matrix.T
+        if category:
+            mask = np.array([entry["category"] != category for entry in self.entries])
+            scores[:, mask] = -np.inf
+
+        k = min(top_k, len(self.entries))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        return [
+            [
+                (float(score), self.entries[index])
+                for index, score in zip(indices, row_scores)
+                if score >= self.min_score
+            ]
+            for indices, row_scores in zip(top, top_scores)
+        ]
+
+    def search(self, query: str, top_k: int = 3, category: str = None) -> List[Tuple[float, Dict]]:
+        """Return the top_k (score, entry) pairs for one query"""
+        return self.search_batch([query], top_k, category)[0]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Dict]], top_k: int, k: int = 60) -> List[Dict]:
+    """Blend several ranked entry lists into one by reciprocal rank fusion"""
+    scores: Dict[str, float] = {}
+    entries: Dict[str, Dict] = {}
+    for ranking in rankings:
+        for rank, entry in enumerate(ranking):
+            scores[entry["id"]] = scores.get(entry["id"], 0.0) + 1.0 / (k + rank + 1)
+            entries.setdefault(entry["id"], entry)
+    best = sorted(scores, key=lambda entry_id: -scores[entry_id])[:top_k]
+    return [entries[entry_id] for entry_id in best]
+
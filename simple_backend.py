@@ -1,5 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from career_assistant_backend.app.utils.keyword_matcher import KeywordMatcher
+from career_assistant_backend.app.utils.metrics import MetricsMiddleware, metrics
 
 app = FastAPI()
 print(">>> Running simple_backend.py from:", __file__)
@@ -14,6 +18,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Time every request as the "total" stage of its route
+app.add_middleware(MetricsMiddleware, registry=metrics)
 
 # ----------------------
 # Expanded Job Data
@@ -51,12 +57,16 @@ SAMPLE_JOBS = [
 # ----------------------
 # Utility
 # ----------------------
+CHAT_INTENTS = KeywordMatcher({
+    "job": ["job", "jobs", "jobless", "hiring", "career", "careers", "internship", "internships",
+            "role", "roles", "vacancy", "vacancies"],
+    "greeting": ["hello", "hi", "hey"],
+    "thanks": ["thank", "thanks", "thanked", "thankful", "thanking"],
+    "bye": ["bye", "goodbye"],
+})
+
 def is_job_query(message: str) -> bool:
-    if not message:
-        return False
-    keywords = ["job", "jobs", "hiring", "career", "internship", "role", "vacancy"]
-    lower = message.lower()
-    return any(k in lower for k in keywords)
+    return "job" in CHAT_INTENTS.matches(message)
 
 # ----------------------
 # Endpoints
@@ -79,12 +89,13 @@ async def search_jobs(payload: dict):
     query = (payload.get("query") or "").strip().lower()
     if not query:
         return {"jobs": SAMPLE_JOBS}
-    matches = [
-        job for job in SAMPLE_JOBS
-        if query in job.get("title", "").lower()
-        or query in job.get("company", "").lower()
-        or any(query in tag.lower() for tag in job.get("tags", []))
-    ]
+    with metrics.span("/jobs/search", "filter"):
+        matches = [
+            job for job in SAMPLE_JOBS
+            if query in job.get("title", "").lower()
+            or query in job.get("company", "").lower()
+            or any(query in tag.lower() for tag in job.get("tags", []))
+        ]
     return {"jobs": matches}
 
 @app.post("/chatbot/session/new")
@@ -97,16 +108,21 @@ async def chatbot_message(payload: dict):
     if not user_message:
         return {"reply": "Please type something 🙂"}
 
-    if is_job_query(user_message):
+    with metrics.span("/chatbot/message", "intents"):
+        intents = CHAT_INTENTS.matches(user_message)
+    if "job" in intents:
         jobs_list = "\n".join([f"{job['title']} at {job['company']}" for job in SAMPLE_JOBS])
         return {"reply": f"Here are some jobs you might like:\n{jobs_list}"}
 
-    msg = user_message.lower()
-    if "hello" in msg or "hi" in msg:
+    if "greeting" in intents:
         return {"reply": "Hi there! 👋 How can I help you today?"}
-    if "thank" in msg:
+    if "thanks" in intents:
         return {"reply": "You're welcome! 😊"}
-    if "bye" in msg:
+    if "bye" in intents:
         return {"reply": "Goodbye! Have a great day!"}
 
     return {"reply": "I'm sorry, I don't understand. Can you rephrase your question?"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,145 @@
+import threading
+import time
+
+from chat_memory_store import InMemoryChatMemoryStore
+from rag_chatbot import ChatMemory
+
+
+class SlowStore(InMemoryChatMemoryStore):
+    """Store whose reads of one session block until released"""
+
+    def __init__(self, slow_session):
+        super().__init__()
+        self.slow_session = slow_session
+        self.reading = threading.Event()
+        self.release = threading.Event()
+
+    def load(self, session_id, limit):
+        if session_id == self.slow_session:
+            self.reading.set()
+            self.release.wait(5)
+        return super().load(session_id, limit)
+
+
+class FailingStore(InMemoryChatMemoryStore):
+    def write(self, writes, keep):
+        raise OSError("database is locked")
+
+
+def test_a_slow_store_read_does_not_block_other_sessions():
+    store = SlowStore("slow")
+    store.write({"slow": ([("user", "hello from another worker", 0.0, None)], {"interests": []})}, keep=10)
+    memory = ChatMemory(store=store, flush_interval=60)
+    slow = threading.Thread(target=lambda: memory.get_conversation_context("slow"))
+    slow.start()
+    try:
+        assert store.reading.wait(5)
+        started = time.monotonic()
+        memory.add_message("fast", "user", "hi")
+        assert memory.get_conversation_context("fast")[0]["content"] == "hi"
+        assert time.monotonic() - started < 1
+    finally:
+        store.release.set()
+        slow.join()
+    assert memory.get_conversation_context("slow")[0]["content"] == "hello from another worker"
+    memory.close()
+
+
+def test_pending_writes_are_capped_while_the_store_is_down():
+    memory = ChatMemory(store=FailingStore(), flush_interval=60, max_pending=5)
+    for i in range(4):
+        memory.add_message(f"s{i}", "user", f"message {i}")
+    memory.flush()
+    for i in range(4, 8):
+        memory.add_message(f"s{i}", "user", f"message {i}")
+    memory.flush()
+
+    stats = memory.get_stats()
+    assert stats["pending_writes"] == 5 and stats["dropped_writes"] == 3
+    memory.close()
+
+
+CONVERSATION = [
+    "Hi, I'm looking for an internship in software",
+    "Something remote would be best",
+    "Actually I have 5 years of experience in finance and tech",
+    "Any openings in Bangalore?",
+]
+
+
+def test_incremental_preferences_match_a_rebuild():
+    memory = ChatMemory(max_messages=20)
+    for message in CONVERSATION:
+        memory.add_message("s", "user", message)
+        memory.add_message("s", "assistant", "Remote senior roles in healthcare are common")
+
+    incremental = memory.get_user_preferences("s")
+    assert incremental == {"interests": ["software", "tech", "finance"], "experience_level": "senior",
+                           "industry": None, "location": "india"}
+    assert memory.rebuild_preferences("s") == incremental
+    assert memory.get_user_preferences("missing") == {}
+
+
+def test_rebuild_forgets_what_dropped_messages_revealed():
+    memory = ChatMemory(max_messages=2)
+    for message in CONVERSATION:
+        memory.add_message("s", "user", message)
+
+    assert memory.get_user_preferences("s")["interests"] == ["software", "tech", "finance"]
+    # Only the last two messages are still held
+    assert memory.rebuild_preferences("s") == {"interests": ["tech", "finance"], "experience_level": "senior",
+                                               "industry": None, "location": "india"}
+
+
+def test_ring_buffer_keeps_the_latest_messages_and_their_size():
+    memory = ChatMemory(max_messages=3)
+    for i in range(7):
+        memory.add_message("s", "user" if i % 2 == 0 else "assistant", f"message {i}", {"n": i} if i == 6 else None)
+
+    context = memory.get_conversation_context("s", max_messages=10)
+    assert [m["content"] for m in context] == ["message 4", "message 5", "message 6"]
+    assert [m["role"] for m in context] == ["user", "assistant", "user"]
+    assert context[0]["metadata"] == {} and context[-1]["metadata"] == {"n": 6}
+    assert [m["content"] for m in memory.get_conversation_context("s", max_messages=2)] == ["message 5", "message 6"]
+    assert memory.get_stats()["total_bytes"] == 3 * (len("message 0") + ChatMemory.MESSAGE_OVERHEAD_BYTES)
+
+
+def test_surplus_sessions_are_evicted_least_recently_used_first():
+    memory = ChatMemory(max_sessions=3)
+    for session in ("a", "b", "c"):
+        memory.add_message(session, "user", "hello")
+    memory.get_conversation_context("a")  # a is now the most recently used
+    memory.add_message("d", "user", "hello")
+    memory.add_message("e", "user", "hello")
+
+    assert list(memory.conversations) == ["a", "d", "e"]
+    assert memory.get_stats()["evictions"] == {"ttl": 0, "lru": 2, "bytes": 0}
+    assert memory.get_conversation_context("b") == [] and memory.get_user_preferences("b") == {}
+
+
+def test_idle_sessions_expire_after_the_ttl():
+    memory = ChatMemory(session_ttl=0.05)
+    memory.add_message("idle", "user", "hello")
+    memory.add_message("read", "user", "hello")
+    time.sleep(0.1)
+
+    # A read drops the expired session it touches
+    assert memory.get_conversation_context("read") == []
+    # A write checks the least recently used sessions
+    memory.add_message("new", "user", "hello")
+    assert list(memory.conversations) == ["new"]
+    assert memory.get_stats()["evictions"]["ttl"] == 2
+
+
+def test_byte_budget_evicts_oldest_sessions_but_keeps_the_active_one():
+    size = len("x" * 100) + ChatMemory.MESSAGE_OVERHEAD_BYTES
+    memory = ChatMemory(max_bytes=3 * size)
+    for session in ("a", "b", "c", "d"):
+        memory.add_message(session, "user", "x" * 100)
+
+    assert list(memory.conversations) == ["b", "c", "d"]
+    assert memory.get_stats()["total_bytes"] == 3 * size
+    # One session larger than the budget stays, alone
+    memory.add_message("big", "user", "x" * (4 * size))
+    assert list(memory.conversations) == ["big"]
+    assert memory.get_stats()["evictions"]["bytes"] == 4
@@ -0,0 +1,187 @@
+import json
+import os
+import random
+import statistics
+import threading
+import time
+
+import pytest
+
+import career_knowledge_base
+from career_knowledge_base import CAREER_KNOWLEDGE_BASE, search_knowledge, set_knowledge_backend
+from knowledge_store import InMemoryKnowledgeBackend, JSONLKnowledgeBackend, KnowledgeIndex, SQLiteKnowledgeBackend
+
+ENTRIES = [entry for entries in CAREER_KNOWLEDGE_BASE.values() for entry in entries]
+
+QUERIES = [
+    ("How do I write a good resume?", None),
+    ("salary negotiation tips", None),
+    ("networking on LinkedIn", "job_search"),
+    ("interview", "interview_prep"),
+    ("remote work", None),
+    ("ai", None),
+    ("a b", None),
+    pytest.param("Tell me about the tech industry and career growth " * 80, None, id="long-question"),
+    ("xyzzy", None),
+    ("", None),
+]
+
+
+def full_scan(query, category=None):
+    """The original lookup: a keyword in the query, or a query word in the content"""
+    query_lower = query.lower()
+    return [
+        entry for entry in ENTRIES
+        if (not category or entry["category"] == category)
+        and (any(keyword in query_lower for keyword in entry["keywords"])
+             or any(word in entry["content"].lower() for word in query_lower.split()))
+    ]
+
+
+@pytest.fixture(params=["memory", "jsonl", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryKnowledgeBackend(CAREER_KNOWLEDGE_BASE)
+    if request.param == "jsonl":
+        path = tmp_path / "knowledge.jsonl"
+        path.write_text("".join(json.dumps(entry) + "\n" for entry in ENTRIES))
+        return JSONLKnowledgeBackend(str(path), reload_interval=0)
+    backend = SQLiteKnowledgeBackend(str(tmp_path / "knowledge.db"))
+    backend.upsert_many(ENTRIES)
+    return backend
+
+
+@pytest.fixture
+def served(backend):
+    previous = career_knowledge_base.get_knowledge_backend()
+    set_knowledge_backend(backend)
+    yield backend
+    set_knowledge_backend(previous)
+
+
+def ids(entries):
+    return [entry["id"] for entry in entries]
+
+
+@pytest.mark.parametrize("query,category", QUERIES)
+def test_search_knowledge_matches_a_full_scan(served, query, category):
+    assert ids(search_knowledge(query, category)) == ids(full_scan(query, category))
+
+
+def test_upsert_and_delete_change_results(backend):
+    version = backend.version
+    backend.upsert({"id": "new_001", "category": "job_search", "content": "Zeppelin hobbyists impress recruiters.",
+                    "keywords": ["zeppelin"]})
+    backend.upsert({**ENTRIES[0], "content": "Rewritten advice about cover letters.", "keywords": ["cover letter"]})
+    assert backend.version != version
+    assert ids(backend.search("zeppelin")) == ["new_001"]
+    assert ENTRIES[0]["id"] in ids(backend.search("cover letters"))
+    assert ENTRIES[0]["id"] not in ids(backend.search("job search"))
+    assert backend.search_ranked("zeppelin")[0][1]["id"] == "new_001"
+
+    assert backend.delete("new_001") and not backend.delete("new_001")
+    assert backend.search("zeppelin") == []
+    assert len(backend.get_all()) == len(ENTRIES)
+
+
+def test_jsonl_reloads_changes_written_by_another_process(tmp_path):
+    path = tmp_path / "knowledge.jsonl"
+    path.write_text("".join(json.dumps(entry) + "\n" for entry in ENTRIES))
+    backend = JSONLKnowledgeBackend(str(path), reload_interval=0)
+    with open(path, "a") as f:
+        f.write(json.dumps({"id": ENTRIES[0]["id"], "deleted": True}) + "\n")
+    os.utime(path, ns=(0, 1))  # a new mtime even within the filesystem's timestamp resolution
+
+    backend.maybe_reload()
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and thread.daemon:
+            thread.join(timeout=5)
+    assert ENTRIES[0]["id"] not in ids(backend.get_all())
+
+
+def test_readers_see_whole_snapshots_while_writers_swap_indexes():
+    backend = InMemoryKnowledgeBackend(CAREER_KNOWLEDGE_BASE)
+    on = [{"id": f"extra_{i}", "category": "extra", "content": f"mentoring topic{i} guidance",
+           "keywords": [f"topic{i}"]} for i in range(50)]
+    off = [{**entry, "content": "unrelated"} for entry in on]
+    base = len(backend.search("mentoring guidance"))
+    base_ranked = len(backend.search_ranked("mentoring guidance", top_k=100))
+    errors, stop = [], threading.Event()
+
+    def read():
+        while not stop.is_set():
+            try:
+                # Each batch is published at once, so readers see all of it or none
+                assert len(backend.search("mentoring guidance")) in (base, base + len(on))
+                assert len(backend.search_ranked("mentoring guidance", top_k=100)) in (base_ranked, base_ranked + len(on))
+            except Exception as e:  # collected and reported below
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for _ in range(30):
+            backend.upsert_many(on)
+            backend.upsert_many(off)
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+    assert errors == []
+
+
+def synthetic_entries(count, rng, start=0):
+    words = [f"w{i}" for i in range(300)] + ["resume", "salary", "interview", "remote", "a", "ok"]
+    return [{"id": f"e{i}", "category": f"c{i % 3}", "content": " ".join(rng.choice(words) for _ in range(12)),
+             "keywords": [rng.choice(words), f"k{i}"]} for i in range(start, start + count)]
+
+
+def test_pending_changes_answer_like_an_index_changed_in_place():
+    rng = random.Random(7)
+    entries = synthetic_entries(200, rng)
+    backend = InMemoryKnowledgeBackend({"all": entries}, merge_threshold=10 ** 9)
+    reference = KnowledgeIndex({"all": entries})
+    queries = ["salary w1 interview", "remote ok", "a", "w2", "k5 resume", "xyzzy", ""]
+
+    def check():
+        reference.prepare()
+        for query in queries:
+            assert ids(backend.search(query)) == ids(reference.search(query))
+            assert ids(backend.search(query, "c1")) == ids(reference.search(query, "c1"))
+            assert ([(score, entry["id"]) for score, entry in backend.search_ranked(query, top_k=10)]
+                    == [(score, entry["id"]) for score, entry in reference.rank(query, top_k=10)])
+        assert ids(backend.get_all()) == ids(reference.get_all())
+        assert ids(backend.get_by_category("c2")) == ids(reference.get_by_category("c2"))
+
+    for round_ in range(3):
+        for _ in range(60):
+            if rng.random() < 0.3:
+                entry_id = f"e{rng.randrange(260)}"
+                assert backend.delete(entry_id) == reference.remove(entry_id)
+            else:
+                entry = synthetic_entries(1, rng, start=rng.randrange(260))[0]
+                backend.upsert(entry)
+                reference.upsert(entry)
+        check()
+        backend.merge_changes()
+        assert backend._index.changes == {}
+        check()
+
+
+def test_write_cost_does_not_grow_with_the_corpus():
+    def median_write_seconds(size):
+        rng = random.Random(size)
+        backend = InMemoryKnowledgeBackend({"all": synthetic_entries(size, rng)}, merge_threshold=10 ** 9)
+        timings = []
+        for entry in synthetic_entries(60, rng, start=size // 2):
+            started = time.perf_counter()
+            backend.upsert(entry)
+            backend.delete(entry["id"])
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
+
+    small, large = median_write_seconds(500), median_write_seconds(5000)
+    # Copying the whole index per write made this ten times slower
+    assert large < 3 * small + 0.001
@@ -0,0 +1,30 @@
+import pytest
+
+from rag_chatbot import ChatMemory, RAGChatbot
+
+PROMPTS = [
+    "How do I ask for more money?",
+    "Tips for a technical interview with coding rounds",
+    "How should I format my resume for ATS?",
+    "I'm a senior engineer looking for remote work",
+    "I'm an intern in Bangalore, how do I prepare?",
+    "How do I negotiate my salary offer?",
+]
+
+
+@pytest.mark.parametrize("mode", RAGChatbot.RETRIEVAL_MODES)
+def test_batch_responses_equal_sequential_responses(mode):
+    batch = [(f"session-{i % 4}", PROMPTS[i % len(PROMPTS)]) for i in range(30)]
+    sequential = RAGChatbot(mode, ChatMemory())
+    batched = RAGChatbot(mode, ChatMemory())
+
+    expected = [sequential.generate_response(query, session_id) for session_id, query in batch]
+    assert batched.generate_responses(batch, max_workers=4) == expected
+    for session_id in {session_id for session_id, _ in batch}:
+        assert ([m["content"] for m in batched.memory.get_conversation_context(session_id, 20)]
+                == [m["content"] for m in sequential.memory.get_conversation_context(session_id, 20)])
+        assert batched.memory.get_user_preferences(session_id) == sequential.memory.get_user_preferences(session_id)
+
+
+def test_empty_batch():
+    assert RAGChatbot("keyword", ChatMemory()).generate_responses([]) == []